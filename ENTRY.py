@@ -1,13 +1,14 @@
+from gate_startup import start_gate
 import cv2
-import easyocr
 import numpy as np
-import time
 import mysql.connector
 import re
-
-# Load Haar Cascade
-plate_cascade = cv2.CascadeClassifier("haarcascade_russian_plate_number.xml")
-reader = easyocr.Reader(['en'])
+from gate_journal import GateJournal
+from gate_preview import GateView
+from ocr_cache import CachedReader
+from parking_lots import LOT_ID, next_free_slot
+from plate_detector import create_plate_detector
+from plate_preprocess import create_preprocessor
 
 # MySQL Configuration
 DB_CONFIG = {
@@ -17,6 +18,18 @@ DB_CONFIG = {
     "database": "smart_parking",
 }
 
+# Built by setup() from main(), so importing this module loads no cascade and opens no files
+plate_detector = None   # Haar cascade unless PLATE_DETECTOR selects another backend
+journal = None          # local gate event journal; a background thread writes it to MySQL
+
+# Function to build the detector and journal this gate uses
+def setup():
+    global plate_detector, journal
+    if journal is not None:
+        return
+    plate_detector = create_plate_detector(scale_factor=1.1, min_neighbors=5, min_size=(100, 50))
+    journal = GateJournal(db_config=DB_CONFIG)
+
 # Validate Indian format: AA00BB0000
 def validate_plate_format(text):
     pattern = r"^[A-Z]{2}[0-9]{2}[A-Z]{2}[0-9]{4}$"
@@ -45,23 +58,17 @@ def is_green_plate(plate):
     mask = cv2.inRange(hsv, np.array([30,40,40]), np.array([90,255,255]))
     return np.sum(mask == 255) / (plate.shape[0] * plate.shape[1]) > 0.3
 
-def preprocess_plate(plate):
-    gray = cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (3, 3), 0)
-    return cv2.equalizeHist(blur)
+# Preprocessing pipeline (gray -> blur -> equalize unless PLATE_PREPROCESS overrides)
+plate_preprocessor = create_preprocessor("equalize")
 
 def find_next_slot(is_ev):
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor()
-        prefix = "EV" if is_ev else "A"
-        limit = 5 if is_ev else 9
-        cursor.execute(f"SELECT slot_number FROM SmartParking WHERE slot_number LIKE '{prefix}%' AND exit_time IS NULL")
-        occupied = {row[0] for row in cursor.fetchall()}
-        for i in range(1, limit + 1):
-            slot = f"{prefix}{i}"
-            if slot not in occupied:
-                return slot
+        cursor.execute("SELECT slot_number FROM SmartParking WHERE lot_id = %s AND exit_time IS NULL", (LOT_ID,))
+        occupied = {row[0] for row in cursor.fetchall()} | journal.pending_slots()
+        # Own zone first, then the other one, as entry01.py falls back between EV and regular slots
+        return next_free_slot(LOT_ID, occupied, is_ev, spill=True)
     except mysql.connector.Error as err:
         print(f"❌ DB error: {err}")
     finally:
@@ -70,10 +77,13 @@ def find_next_slot(is_ev):
     return None
 
 def is_vehicle_already_parked(vehicle_number):
+    known, slot = journal.pending_vehicle_slot(vehicle_number)
+    if known:
+        return slot
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor()
-        cursor.execute("SELECT slot_number FROM SmartParking WHERE vehicle_number = %s AND exit_time IS NULL", (vehicle_number,))
+        cursor.execute("SELECT slot_number FROM SmartParking WHERE lot_id = %s AND vehicle_number = %s AND exit_time IS NULL", (LOT_ID, vehicle_number))
         result = cursor.fetchone()
         return result[0] if result else None
     except mysql.connector.Error as err:
@@ -83,78 +93,77 @@ def is_vehicle_already_parked(vehicle_number):
         conn.close()
 
 def save_to_database(vehicle_number, is_ev, slot_number):
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO SmartParking (vehicle_number, is_ev, slot_number, entry_time, exit_time)
-            VALUES (%s, %s, %s, NOW(), NULL)
-        """, (vehicle_number, int(is_ev), slot_number))
-        conn.commit()
-        print(f"✅ Saved {vehicle_number} in slot {slot_number}")
-    except mysql.connector.Error as err:
-        print(f"❌ DB error: {err}")
-    finally:
-        cursor.close()
-        conn.close()
+    journal.record_entry(vehicle_number, is_ev, slot_number)
+    print(f"✅ Saved {vehicle_number} in slot {slot_number}")
 
-# Start webcam
-cap = cv2.VideoCapture(0)
-cap.set(3, 1920)
-cap.set(4, 1080)
-time.sleep(2)
-
-plate_texts, green_flags = [], []
-frame_limit = 5
-
-while len(plate_texts) < frame_limit:
-    ret, frame = cap.read()
-    if not ret:
-        continue
-
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    plates = plate_cascade.detectMultiScale(gray, 1.1, 5, minSize=(100, 50))
-
-    for x, y, w, h in plates:
-        plate_img = frame[y:y+h, x:x+w]
-        processed = preprocess_plate(plate_img)
-        ocr_result = reader.readtext(processed, detail=0, allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
-
-        for raw_text in ocr_result:
-            cleaned = correct_plate_text(raw_text.upper())
-            if validate_plate_format(cleaned):
-                plate_texts.append(cleaned)
-                green_flags.append(is_green_plate(plate_img))
-                cv2.putText(frame, f"Detected: {cleaned}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,255,0), 2)
-                cv2.rectangle(frame, (x,y), (x+w,y+h), (0,255,0), 2)
-                break
-
-    cv2.imshow("License Plate Detection", frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
-
-# Final decision block
-if plate_texts:
-    final_plate = max(set(plate_texts), key=plate_texts.count)
-    is_ev = max(set(green_flags), key=green_flags.count)
-
-    print(f"\n🚗 Final Plate: {final_plate}")
-    print(f"⚡ EV Detected: {'Yes ✅' if is_ev else 'No ❌'}")
-
-    if not validate_plate_format(final_plate):
-        print("❌ Invalid plate format. Skipping entry.")
-    else:
-        existing_slot = is_vehicle_already_parked(final_plate)
-        if existing_slot:
-            print(f"🚧 Vehicle is already parked at slot: {existing_slot}")
+def main():
+    setup()
+
+    # Load the OCR model while the webcam starts, then warm it up
+    reader, cap, startup_timer = start_gate(0, 1920, 1080)
+    reader = CachedReader(reader)  # repeated identical crops skip readtext
+    journal.start()
+
+    plate_texts, green_flags = [], []
+    frame_limit = 5
+
+    # Local window, or headless with an optional MJPEG preview (GATE_HEADLESS, GATE_PREVIEW_PORT)
+    view = GateView("License Plate Detection")
+
+    while len(plate_texts) < frame_limit:
+        ret, frame = cap.read()
+        if not ret:
+            continue
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        plates = plate_detector.detect(frame, gray)
+
+        for x, y, w, h in plates:
+            plate_img = frame[y:y+h, x:x+w]
+            processed = plate_preprocessor.process(plate_img)
+            ocr_result = reader.readtext(processed, detail=0, allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+
+            for raw_text in ocr_result:
+                cleaned = correct_plate_text(raw_text.upper())
+                if validate_plate_format(cleaned):
+                    plate_texts.append(cleaned)
+                    green_flags.append(is_green_plate(plate_img))
+                    view.text(f"Detected: {cleaned}", x, y - 10, 0.8)
+                    view.box(x, y, w, h)
+                    break
+
+        if view.show(frame):
+            break
+
+    cap.release()
+    view.close()
+
+    # Final decision block
+    if plate_texts:
+        final_plate = max(set(plate_texts), key=plate_texts.count)
+        is_ev = max(set(green_flags), key=green_flags.count)
+
+        print(f"\n🚗 Final Plate: {final_plate}")
+        print(f"⚡ EV Detected: {'Yes ✅' if is_ev else 'No ❌'}")
+
+        if not validate_plate_format(final_plate):
+            print("❌ Invalid plate format. Skipping entry.")
         else:
-            slot = find_next_slot(is_ev)
-            if slot:
-                save_to_database(final_plate, is_ev, slot)
+            existing_slot = is_vehicle_already_parked(final_plate)
+            if existing_slot:
+                print(f"🚧 Vehicle is already parked at slot: {existing_slot}")
             else:
-                print("❌ No available slots.")
-else:
-    print("❌ No valid plate detected.")
+                slot = find_next_slot(is_ev)
+                if slot:
+                    save_to_database(final_plate, is_ev, slot)
+                else:
+                    print("❌ No available slots.")
+    else:
+        print("❌ No valid plate detected.")
+
+    startup_timer.report_first_decision()
+    journal.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
+from gate_startup import start_gate
 import cv2
-import easyocr
 import numpy as np
 import time
 import mysql.connector
 from collections import Counter
+from ocr_cache import CachedReader
+from parking_lots import LOT_ID, lot_slots
+from plate_detector import create_plate_detector
+from plate_preprocess import create_preprocessor
+from gate_preview import GateView
 
-# Load Haar Cascade for plate detection
-plate_cascade = cv2.CascadeClassifier("haarcascade_russian_plate_number.xml")
-
-# Initialize EasyOCR Reader with optimized settings
-reader = easyocr.Reader(['en'], gpu=False)  # Disable GPU if not available
+# Load plate detector (Haar cascade unless PLATE_DETECTOR selects another backend)
+plate_detector = create_plate_detector(
+    scale_factor=1.05,  # Reduced from 1.1 for better detection
+    min_neighbors=3,    # Reduced from 5
+    min_size=(100, 30), # Minimum plate size
+    flags=cv2.CASCADE_SCALE_IMAGE
+)
 
 # MySQL Database Configuration
 DB_CONFIG = {
@@ -35,19 +42,8 @@ def is_green_plate(plate):
     mask = cv2.inRange(hsv, lower_green, upper_green)
     return (np.count_nonzero(mask) / mask.size > 0.3)
 
-def preprocess_plate(plate):
-    """Optimized plate preprocessing"""
-    if plate is None or plate.size == 0:
-        return None
-    
-    # Convert to grayscale and enhance contrast
-    gray = cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY)
-    gray = cv2.resize(gray, None, fx=1.5, fy=1.5, interpolation=cv2.INTER_CUBIC)
-    
-    # Apply adaptive thresholding
-    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                 cv2.THRESH_BINARY_INV, 11, 2)
-    return thresh
+# Plate preprocessing: 1.5x upscale as before, then adaptive threshold
+plate_preprocessor = create_preprocessor("adaptive", scale=1.5)
 
 def validate_and_correct_plate(text):
     """Validate and correct Indian plate format"""
@@ -85,23 +81,18 @@ def find_next_slot(is_ev):
         connection = mysql.connector.connect(**DB_CONFIG)
         cursor = connection.cursor(buffered=True)
         
+        cursor.execute("SELECT slot_number FROM SmartParking WHERE lot_id = %s AND exit_time IS NULL", (LOT_ID,))
+        occupied = {row[0] for row in cursor.fetchall()}
         if is_ev:
-            cursor.execute("SELECT slot_number FROM SmartParking WHERE slot_number LIKE 'EV%' AND exit_time IS NULL")
-            occupied = {row[0] for row in cursor.fetchall()}
-            for i in range(1, 6):
-                if f"EV{i}" not in occupied:
-                    return f"EV{i}"
+            for slot in lot_slots(LOT_ID, "EV"):
+                if slot not in occupied:
+                    return slot
         else:
-            # Check A6-A9 first
-            cursor.execute("SELECT slot_number FROM SmartParking WHERE slot_number LIKE 'A%' AND exit_time IS NULL")
-            occupied = {row[0] for row in cursor.fetchall()}
-            for i in range(6, 10):
-                if f"A{i}" not in occupied:
-                    return f"A{i}"
-            # Then check A1-A5
-            for i in range(1, 6):
-                if f"A{i}" not in occupied:
-                    return f"A{i}"
+            # Check the slots after the fifth first (A6-A9 in the main lot), then the rest
+            regular = lot_slots(LOT_ID, "regular")
+            for slot in regular[5:] + regular[:5]:
+                if slot not in occupied:
+                    return slot
         return None
     except mysql.connector.Error as err:
         print(f"Database error: {err}")
@@ -112,14 +103,16 @@ def find_next_slot(is_ev):
             connection.close()
 
 def main():
-    # Initialize video capture with reduced resolution for better performance
-    cap = cv2.VideoCapture(0)
-    cap.set(3, 1280)  # Reduced from 1920 for better performance
-    cap.set(4, 720)   # Reduced from 1080
+    # Load the OCR model while the camera opens (reduced resolution for better performance)
+    reader, cap, startup_timer = start_gate(0, 1280, 720, gpu=False)  # Disable GPU if not available
+    reader = CachedReader(reader)
     
     plate_candidates = []
     green_detections = []
     start_time = time.time()
+
+    # Local window, or headless with an optional MJPEG preview (GATE_HEADLESS, GATE_PREVIEW_PORT)
+    view = GateView("License Plate Detection")
     
     print("Starting license plate detection...")
     
@@ -132,14 +125,8 @@ def main():
         # Convert to grayscale for detection
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
-        # Detect plates with optimized parameters
-        plates = plate_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.05,  # Reduced from 1.1 for better detection
-            minNeighbors=3,    # Reduced from 5
-            minSize=(100, 30), # Minimum plate size
-            flags=cv2.CASCADE_SCALE_IMAGE
-        )
+        # Detect plates with the configured backend
+        plates = plate_detector.detect(frame, gray)
         
         # Process detected plates
         if len(plates) > 0:
@@ -147,7 +134,7 @@ def main():
             plate_img = frame[y:y+h, x:x+w]
             
             # Preprocess and read plate
-            processed = preprocess_plate(plate_img)
+            processed = plate_preprocessor.process(plate_img)
             if processed is not None:
                 results = reader.readtext(
                     processed,
@@ -168,9 +155,8 @@ def main():
                         green_detections.append(is_green_plate(plate_img))
                         
                         # Visual feedback
-                        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                        cv2.putText(frame, plate_text, (x, y-10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                        view.box(x, y, w, h)
+                        view.text(plate_text, x, y - 10, 0.8)
             
             # Break after 4 seconds of detection
             if time.time() - start_time >= 4:
@@ -182,13 +168,12 @@ def main():
                 break
         
         # Show frame
-        cv2.imshow("License Plate Detection", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if view.show(frame):
             break
     
     # Release resources
     cap.release()
-    cv2.destroyAllWindows()
+    view.close()
     
     # Process results
     if plate_candidates:
@@ -214,5 +199,7 @@ def main():
     else:
         print("\nNo valid plates detected")
 
+    startup_timer.report_first_decision()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,14 +1,18 @@
+from gate_startup import start_gate
 import cv2
-import easyocr
-import numpy as np
 import time
+from datetime import datetime
 import mysql.connector
-
-# Load Haar Cascade for plate detection
-plate_cascade = cv2.CascadeClassifier("haarcascade_russian_plate_number.xml")
-
-# Initialize EasyOCR Reader
-reader = easyocr.Reader(['en'])
+from exit_matcher import ExitMatcher
+from evidence_store import EvidenceStore
+from gate_journal import GateJournal
+from gate_preview import BLUE, GateView
+from parking_billing import TARIFF
+from parking_lots import LOT_ID
+from ocr_cache import CachedReader
+from plate_detector import create_plate_detector
+from plate_preprocess import create_preprocessor
+from plate_quality import CropSelector
 
 # MySQL Database Configuration
 DB_CONFIG = {
@@ -18,17 +22,31 @@ DB_CONFIG = {
     "database": "smart_parking",
 }
 
-# Function to preprocess plate for better OCR
-def preprocess_plate(plate):
-    if plate is None or plate.size == 0:
-        return None
-    gray = cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY)  
-    blurred = cv2.GaussianBlur(gray, (3, 3), 0)  
-    enhanced = cv2.equalizeHist(blurred)  
-    return enhanced
+# Built by setup() from main(), so importing this module loads no cascade and opens no files
+plate_detector = None   # Haar cascade unless PLATE_DETECTOR selects another backend
+evidence = None         # frames and crops behind each decision, encoded on a background thread
+journal = None          # local gate event journal; a background thread writes it to MySQL
+exit_matcher = None     # active plates kept in memory; OCR reads are matched against them
+
+# Function to build the detector, evidence store, journal and matcher this gate uses
+def setup():
+    global plate_detector, evidence, journal, exit_matcher
+    if journal is not None:
+        return
+    plate_detector = create_plate_detector(scale_factor=1.1, min_neighbors=5, min_size=(100, 50))
+    evidence = EvidenceStore()
+    journal = GateJournal(db_config=DB_CONFIG, on_applied=evidence.link)
+    exit_matcher = ExitMatcher(DB_CONFIG, journal)
+
+# Preprocessing pipeline for better OCR (gray -> blur -> equalize unless PLATE_PREPROCESS overrides)
+plate_preprocessor = create_preprocessor("equalize")
 
 # Function to check if a vehicle is parked and get slot number
 def get_parked_vehicle_slot(vehicle_number):
+    # Events still in the journal are newer than anything in MySQL
+    known, slot = journal.pending_vehicle_slot(vehicle_number)
+    if known:
+        return slot
     try:
         connection = mysql.connector.connect(**DB_CONFIG)
         cursor = connection.cursor(buffered=True)
@@ -36,8 +54,8 @@ def get_parked_vehicle_slot(vehicle_number):
         print(f"🔍 Checking parking status for: {vehicle_number}")
         
         cursor.execute(
-            "SELECT slot_number FROM SmartParking WHERE vehicle_number = %s AND exit_time IS NULL",
-            (vehicle_number,)
+            "SELECT slot_number FROM SmartParking WHERE lot_id = %s AND vehicle_number = %s AND exit_time IS NULL",
+            (LOT_ID, vehicle_number)
         )
         result = cursor.fetchone()
         
@@ -55,59 +73,84 @@ def get_parked_vehicle_slot(vehicle_number):
         cursor.close()
         connection.close()
 
-# Function to completely remove a vehicle from the database
+# Function to price the stay being closed; the matcher's active set already holds its entry time
+def quote_fee(vehicle_number, exit_time):
+    stay = exit_matcher.stay(vehicle_number)
+    if stay is None:
+        print(f"⚠️ No entry time cached for {vehicle_number}; fee will be settled from history.")
+        return None
+    entry_time, is_ev = stay
+    fee = TARIFF.price(entry_time, exit_time, is_ev)
+    print(f"💰 Parking fee for {vehicle_number}: ₹{fee:.2f} (parked since {entry_time:%Y-%m-%d %H:%M})")
+    return fee
+
+# Function to record an exit; the journal writer moves the stay to SmartParkingHistory in the background
 def remove_from_database(vehicle_number):
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        cursor = connection.cursor()
-        
-        print(f"🛠 Removing vehicle: {vehicle_number} from the database.")
-        
-        # DELETE the vehicle record from the database
-        cursor.execute(
-            "DELETE FROM SmartParking WHERE vehicle_number = %s AND exit_time IS NULL",
-            (vehicle_number,)
-        )
-        connection.commit()
+    exit_time = datetime.now()
+    quote_fee(vehicle_number, exit_time)
+    print(f"🛠 Archiving vehicle: {vehicle_number} to parking history.")
+    # The journal's unflushed events overlay the matcher's active set, as in get_parked_vehicle_slot
+    known, slot = journal.pending_vehicle_slot(vehicle_number)
+    parked = slot is not None if known else vehicle_number in exit_matcher.active
+    event_id = journal.record_exit(vehicle_number, exit_time)
+    if parked:
+        print(f"✅ Vehicle {vehicle_number} has exited; archive queued in the gate journal.")
+    else:
+        print(f"⚠️ No active parking record found for {vehicle_number}. Check OCR result or database records.")
+    return event_id
 
-        # Check if any row was deleted
-        if cursor.rowcount > 0:
-            print(f"✅ Vehicle {vehicle_number} has exited and record removed from database.")
-        else:
-            print(f"⚠️ No active parking record found for {vehicle_number}. Check OCR result or database records.")
+def main():
+    setup()
 
-    except mysql.connector.Error as err:
-        print(f"❌ Database error: {err}")
-    finally:
-        cursor.close()
-        connection.close()
+    # Load the OCR model while the webcam starts, then warm it up
+    reader, cap, startup_timer = start_gate(0, 1920, 1080)
+    reader = CachedReader(reader)  # repeated identical crops skip readtext
+    journal.start()
+    evidence.start()
+
+    exit_matcher.refresh()
+
+    plate_texts = []
+    exit_match = None
+    captured_images = 0
+    max_images = 5  
+
+    # Keep only the best-scoring crops; the rest never reach easyocr
+    crop_selector = CropSelector()
+
+    # Local window, or headless with an optional MJPEG preview (GATE_HEADLESS, GATE_PREVIEW_PORT)
+    view = GateView("Number Plate Detection")
 
-# Open webcam
-cap = cv2.VideoCapture(0)
-cap.set(3, 1920)  
-cap.set(4, 1080)  
+    while captured_images < max_images:
+        ret, frame = cap.read()
+        if not ret or frame is None or frame.size == 0:
+            print("⚠️ Error: Could not read frame from camera.")
+            continue  
 
-time.sleep(2)  
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        plates = plate_detector.detect(frame, gray)
 
-plate_texts = []
-captured_images = 0
-max_images = 5  
+        if len(plates) > 0:
+            for x, y, w, h in plates:
+                score = crop_selector.offer(frame[y:y+h, x:x+w], gray[y:y+h, x:x+w], frame=frame)
+                view.box(x, y, w, h)
+                view.text(f"Quality: {score:.2f}", x, y - 20)
 
-while captured_images < max_images:
-    ret, frame = cap.read()
-    if not ret or frame is None or frame.size == 0:
-        print("⚠️ Error: Could not read frame from camera.")
-        continue  
+            x, y, w, h = plates[0]
+            view.text(f"Capturing {captured_images+1}/{max_images}", x, y - 60, 0.8, BLUE)
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    plates = plate_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(100, 50))
+            captured_images += 1
+            time.sleep(0.25)  
 
-    if len(plates) > 0:
-        x, y, w, h = plates[0]  
-        plate = frame[y:y+h, x:x+w]
+        if view.show(frame):
+            break
 
+    print(f"📷 {crop_selector.seen} crops scored, {crop_selector.dropped} dropped before OCR")
+
+    # OCR only the top-K crops
+    for score, plate, _ in crop_selector.best():
         # Preprocess plate before OCR
-        processed_plate = preprocess_plate(plate)
+        processed_plate = plate_preprocessor.process(plate)
 
         # OCR for number plate text
         result = reader.readtext(processed_plate, detail=0, allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
@@ -117,37 +160,50 @@ while captured_images < max_images:
             if len(best_text) >= 6:  
                 plate_texts.append(best_text)
 
-        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        cv2.putText(frame, f"Capturing {captured_images+1}/{max_images}", (x, y - 10), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-        captured_images += 1
-        time.sleep(0.25)  
-
-    cv2.imshow("Number Plate Detection", frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-# Process the best detected plate
-if plate_texts:
-    final_plate_text = max(set(plate_texts), key=plate_texts.count)  
+                # Stop at the first read that singles out one parked vehicle
+                exit_match = exit_matcher.match(plate_texts)
+                if exit_match and exit_match.accepted:
+                    break
+
+    cache_stats = reader.stats()
+    print(f"🗂 OCR cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+          f"(hit rate {cache_stats['hit_rate']:.0%})")
+
+    # Process the best detected plate
+    if exit_match and exit_match.accepted:
+        print(f"\n🚗 Matched parked vehicle: {exit_match.vehicle_number} "
+              f"(distance {exit_match.distance:.2f}, margin {exit_match.margin:.2f})")
+        print(f"🚗 {exit_match.vehicle_number} is parked in slot {exit_match.slot_number}. Archiving to history...")
+        event_id = remove_from_database(exit_match.vehicle_number)
+        evidence.submit_selection(event_id, "exit", exit_match.vehicle_number, crop_selector.best(), LOT_ID)
+    elif plate_texts:
+        final_plate_text = max(set(plate_texts), key=plate_texts.count)  
+
+        print("\n🚗 Final Detected Plate Number:", final_plate_text)
+
+        # Check if vehicle is currently parked
+        existing_slot = get_parked_vehicle_slot(final_plate_text)
+        if existing_slot:
+
+            print(f"🚗 {final_plate_text} is parked in slot {existing_slot}. Archiving to history...")
+            event_id = remove_from_database(final_plate_text)
+            evidence.submit_selection(event_id, "exit", final_plate_text, crop_selector.best(), LOT_ID)
+        else:
+            print(f"⚠️ No active parking record found for {final_plate_text}. Possible issues:\n"
+                  f"  - No matching record in database\n"
+                  f"  - Vehicle already exited")
 
-    print("\n🚗 Final Detected Plate Number:", final_plate_text)
 
-    # Check if vehicle is currently parked
-    existing_slot = get_parked_vehicle_slot(final_plate_text)
-    if existing_slot:
-        
-        print(f"🚗 {final_plate_text} is parked in slot {existing_slot}. Removing from database...")
-        remove_from_database(final_plate_text)
     else:
-        print(f"⚠️ No active parking record found for {final_plate_text}. Possible issues:\n"
-              f"  - No matching record in database\n"
-              f"  - Vehicle already exited")
+        print("\n❌ No plate detected.")
+
+    startup_timer.report_first_decision()
 
+    cap.release()
+    view.close()
+    journal.stop()
+    evidence.stop()
 
-else:
-    print("\n❌ No plate detected.")
 
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+from parking_billing import Tariff, load_tariff
+
+
+def _clock(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _band_covers(band, when):
+    days = band.get("days", range(7))
+    start, end = _clock(band["start"]), _clock(band["end"])
+    minute = when.hour * 60 + when.minute
+    if start < end:
+        return when.weekday() in days and start <= minute < end
+    # Runs past midnight: the tail belongs to the day after a listed day
+    return ((when.weekday() in days and minute >= start)
+            or ((when.weekday() - 1) % 7 in days and minute < end))
+
+
+# Function to price one stay the straightforward way: walk it minute by minute
+def naive_fee(config, entry_time, exit_time, is_ev):
+    """Reference implementation the tariff engine is checked and timed against. Returns rupees."""
+    start = entry_time.replace(second=0, microsecond=0)
+    end = exit_time.replace(second=0, microsecond=0)
+    if end < exit_time:
+        end += timedelta(minutes=1)
+    if end - start <= timedelta(minutes=config["grace_minutes"]):
+        return 0.0
+
+    cap = 100 * 60 * (config["ev_daily_cap"] if is_ev else config["daily_cap"])
+    total, period, period_start = 0, 0, start
+    when = start
+    while when < end:
+        if when - period_start >= timedelta(days=1):
+            total += min(period, cap)
+            period, period_start = 0, when
+        rate = 0
+        for band in config["bands"]:
+            if _band_covers(band, when):
+                rate = band.get("ev_rate", band["rate"]) if is_ev else band["rate"]
+        period += int(round(100 * rate))
+        when += timedelta(minutes=1)
+    total += min(period, cap)
+
+    paise = -(-total // 60)
+    round_to = max(1, int(round(100 * config["round_to"])))
+    return -(-paise // round_to) * round_to / 100
+
+
+# Function to generate a month of synthetic stays
+def synthetic_month(rows, seed=7):
+    """Entries spread over 30 days; dwell is log-normal (median ~2h) with a tail of multi-day stays."""
+    rng = np.random.default_rng(seed)
+    month_start = np.datetime64("2026-09-01T00:00:00")
+    entry = month_start + rng.integers(0, 30 * 86400, rows).astype("timedelta64[s]")
+    dwell = np.exp(rng.normal(np.log(7200), 1.1, rows)).astype(np.int64)
+    dwell = np.clip(dwell, 60, 10 * 86400)
+    exit_ = entry + dwell.astype("timedelta64[s]")
+    is_ev = rng.random(rows) < 0.2
+    return entry, exit_, is_ev
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row and vectorised parking fee computation.")
+    parser.add_argument("--rows", type=int, default=100000, help="Stays in the synthetic month")
+    parser.add_argument("--naive-rows", type=int, default=2000, help="Stays priced by the minute-walking reference")
+    parser.add_argument("--tariff", help="Tariff JSON (default: PARKING_TARIFF or the built-in tariff)")
+    args = parser.parse_args()
+
+    config = load_tariff(args.tariff)
+    tariff = Tariff(config)
+    entry, exit_, is_ev = synthetic_month(args.rows)
+    entry_dt = entry.astype(datetime).tolist()
+    exit_dt = exit_.astype(datetime).tolist()
+    ev_list = is_ev.tolist()
+    sample = min(args.naive_rows, args.rows)
+
+    start = time.perf_counter()
+    naive = [naive_fee(config, entry_dt[i], exit_dt[i], ev_list[i]) for i in range(sample)]
+    naive_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = [tariff.price(e, x, ev) for e, x, ev in zip(entry_dt, exit_dt, ev_list)]
+    scalar_s = time.perf_counter() - start
+
+    tariff.price_batch(entry[:10], exit_[:10], is_ev[:10])  # warm-up
+    start = time.perf_counter()
+    batch = tariff.price_batch(entry, exit_, is_ev)
+    batch_s = time.perf_counter() - start
+
+    naive_us = 1e6 * naive_s / sample if sample else 0.0
+    results = [
+        ("naive", sample, naive_s, naive_us),
+        ("scalar", args.rows, scalar_s, 1e6 * scalar_s / args.rows),
+        ("batch", args.rows, batch_s, 1e6 * batch_s / args.rows),
+    ]
+    print(f"{'method':<8} {'rows':>8} {'seconds':>9} {'us/stay':>9} {'speedup':>9}")
+    for name, rows, seconds, us in results:
+        speedup = f"{naive_us / us:.0f}x" if us else "n/a"
+        print(f"{name:<8} {rows:>8} {seconds:>9.3f} {us:>9.2f} {speedup:>9}")
+    print(f"📅 A month of {args.rows} stays: naive ~{naive_us * args.rows / 1e6:.1f}s (projected), "
+          f"batch {batch_s:.3f}s")
+
+    mismatched = sum(1 for i in range(sample) if abs(naive[i] - scalar[i]) > 1e-9)
+    mismatched += int(np.count_nonzero(np.abs(np.array(scalar) - batch) > 1e-9))
+    if mismatched:
+        print(f"❌ {mismatched} fee(s) differ between implementations")
+    else:
+        print(f"✅ Fees agree (naive on {sample} stays, scalar and batch on all {args.rows}); "
+              f"total ₹{batch.sum():,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# MySQL Database Configuration (only used with --seed-mysql / --check-mysql)
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+REGULAR_SLOTS = [f"A{i}" for i in range(1, 10)]
+EV_SLOTS = [f"EV{i}" for i in range(1, 6)]
+STATES = ["KA", "KL", "TN", "MH", "DL", "AP", "TS", "GJ"]
+
+# Relative arrivals per hour of day (morning and evening peaks)
+HOURLY_PROFILE = [1, 1, 1, 1, 1, 2, 4, 8, 10, 9, 7, 6, 6, 6, 6, 7, 8, 10, 9, 6, 4, 3, 2, 1]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SmartParking (
+    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vehicle_number TEXT NOT NULL, is_ev INTEGER NOT NULL, slot_number TEXT NOT NULL,
+    entry_time TEXT NOT NULL, exit_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_active_slot ON SmartParking (slot_number, exit_time);
+CREATE TABLE IF NOT EXISTS SmartParkingHistory (
+    entry_id INTEGER, vehicle_number TEXT, is_ev INTEGER, slot_number TEXT,
+    entry_time TEXT, exit_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_vehicle ON SmartParkingHistory (vehicle_number, entry_time);
+"""
+
+
+def random_plate():
+    return (random.choice(STATES) + f"{random.randint(1, 99):02d}"
+            + "".join(random.choices(string.ascii_uppercase, k=2)) + f"{random.randint(0, 9999):04d}")
+
+
+# Function to generate realistic finished stays for the last `days` days
+def generate_history(days, stays_per_day):
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=days)
+    total_weight = sum(HOURLY_PROFILE)
+    entry_id = 0
+    for day in range(days):
+        for hour, weight in enumerate(HOURLY_PROFILE):
+            for _ in range(round(stays_per_day * weight / total_weight)):
+                entry_id += 1
+                is_ev = random.random() < 0.25
+                slot = random.choice(EV_SLOTS if is_ev else REGULAR_SLOTS)
+                entry_time = start + timedelta(days=day, hours=hour, seconds=random.randint(0, 3599))
+                dwell = timedelta(minutes=min(24 * 60, random.lognormvariate(4.2, 0.8)))
+                yield (entry_id, random_plate(), int(is_ev), slot, entry_time, entry_time + dwell)
+
+
+def seed_sqlite(path, days, stays_per_day):
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    rows = [(i, p, ev, s, e.isoformat(sep=" "), x.isoformat(sep=" "))
+            for i, p, ev, s, e, x in generate_history(days, stays_per_day)]
+    conn.executemany("INSERT INTO SmartParkingHistory VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def seed_mysql(days, stays_per_day, batch=5000):
+    import mysql.connector
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(entry_id), 0) FROM SmartParkingHistory")
+    offset = cursor.fetchone()[0] + 1_000_000
+    total, rows = 0, []
+    for i, p, ev, s, e, x in generate_history(days, stays_per_day):
+        rows.append((i + offset, p, ev, s, e, x))
+        if len(rows) >= batch:
+            cursor.executemany("INSERT IGNORE INTO SmartParkingHistory "
+                               "(entry_id, vehicle_number, is_ev, slot_number, entry_time, exit_time) "
+                               "VALUES (%s, %s, %s, %s, %s, %s)", rows)
+            conn.commit()
+            total, rows = total + len(rows), []
+    if rows:
+        cursor.executemany("INSERT IGNORE INTO SmartParkingHistory "
+                           "(entry_id, vehicle_number, is_ev, slot_number, entry_time, exit_time) "
+                           "VALUES (%s, %s, %s, %s, %s, %s)", rows)
+        conn.commit()
+        total += len(rows)
+    cursor.close()
+    conn.close()
+    return total
+
+
+class Recorder:
+    """Thread-safe latency/error recorder per operation."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, op, seconds, error=None):
+        with self._lock:
+            self.latencies[op].append(seconds)
+            if error:
+                self.errors[op] += 1
+                self.error_samples.setdefault(op, error)
+
+    def report(self, duration):
+        print(f"\n{'operation':<18} {'count':>7} {'rps':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'max ms':>8}")
+        for op in sorted(self.latencies):
+            values = sorted(self.latencies[op])
+            pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+            print(f"{op:<18} {len(values):>7} {len(values) / duration:>7.1f} {self.errors[op]:>7} "
+                  f"{pick(0.50):>8.1f} {pick(0.95):>8.1f} {pick(0.99):>8.1f} {values[-1] * 1000:>8.1f}")
+        for op, sample in self.error_samples.items():
+            print(f"  ⚠️ {op}: {sample}")
+
+
+# Function to fire `task` at a fixed rate regardless of how long earlier calls take
+def open_loop(pool, recorder, op, rate, duration, task, stop):
+    """Latency is measured from the scheduled send time, so a stalled server
+    shows up as queueing delay instead of silently lowering the request rate."""
+    if rate <= 0:
+        return
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    n = 0
+    while not stop.is_set():
+        scheduled = start + n * interval
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        def run(scheduled=scheduled):
+            try:
+                task()
+                recorder.record(op, time.perf_counter() - scheduled)
+            except Exception as err:
+                recorder.record(op, time.perf_counter() - scheduled, f"{type(err).__name__}: {err}")
+
+        pool.submit(run)
+        n += 1
+
+
+# ---- HTTP target -----------------------------------------------------------
+
+def http_call(url, data=None, json_body=None, timeout=10):
+    headers = {}
+    body = None
+    if json_body is not None:
+        body = json.dumps(json_body).encode()
+        headers["Content-Type"] = "application/json"
+    elif data is not None:
+        body = urllib.parse.urlencode(data).encode()
+    request = urllib.request.Request(url, data=body, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as err:
+        if err.code >= 500:
+            raise
+        return err.code, err.read()
+
+
+class HttpTarget:
+    def __init__(self, slots_url, search_url, dashboard_url):
+        self.slots_url = slots_url.rstrip("/")
+        self.search_url = search_url.rstrip("/")
+        self.dashboard_url = dashboard_url.rstrip("/")
+
+    def poll_status(self):
+        http_call(f"{self.slots_url}/get_parking_status")
+
+    def poll_entries(self):
+        http_call(f"{self.dashboard_url}/parking-entries")
+
+    def search(self):
+        http_call(f"{self.search_url}/search", data={"vehicle_number": random_plate()})
+
+    def gate(self):
+        # Read status, then race other gates for a free slot like a real gate would
+        status, body = http_call(f"{self.slots_url}/get_parking_status")
+        occupied = set(json.loads(body)) if status == 200 else set()
+        free = [s for s in REGULAR_SLOTS + EV_SLOTS if s not in occupied]
+        if free and random.random() < 0.6:
+            slot = random.choice(free[:3])
+            status, _ = http_call(f"{self.slots_url}/update_slot", json_body={
+                "slot_number": slot, "is_ev": slot.startswith("EV"),
+                "vehicle_number": random_plate(), "action": "entry"})
+        elif occupied:
+            slot = random.choice(sorted(occupied))
+            http_call(f"{self.slots_url}/update_slot", json_body={"slot_number": slot, "action": "exit"})
+
+
+# ---- SQLite stand-in (drives the gate allocator logic directly) -------------
+
+class SqliteTarget:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def poll_status(self):
+        self._conn().execute("SELECT entry_id, slot_number, is_ev, vehicle_number, entry_time, exit_time "
+                             "FROM SmartParking WHERE exit_time IS NULL").fetchall()
+
+    def poll_entries(self):
+        self._conn().execute("SELECT entry_id, vehicle_number, slot_number, entry_time, is_ev "
+                             "FROM SmartParking ORDER BY entry_time DESC").fetchall()
+
+    def search(self):
+        plate = random_plate()
+        self._conn().execute("SELECT * FROM SmartParking WHERE vehicle_number = ? UNION ALL "
+                             "SELECT * FROM SmartParkingHistory WHERE vehicle_number = ?", (plate, plate)).fetchall()
+
+    def gate(self):
+        conn = self._conn()
+        if random.random() < 0.6:
+            # Same check-then-insert sequence as find_next_slot() + save_to_database()
+            is_ev = random.random() < 0.25
+            prefix, slots = ("EV", EV_SLOTS) if is_ev else ("A", REGULAR_SLOTS)
+            occupied = {r[0] for r in conn.execute(
+                "SELECT slot_number FROM SmartParking WHERE slot_number LIKE ? AND exit_time IS NULL",
+                (f"{prefix}%",))}
+            slot = next((s for s in slots if s not in occupied), None)
+            if slot:
+                conn.execute("INSERT INTO SmartParking (vehicle_number, is_ev, slot_number, entry_time) "
+                             "VALUES (?, ?, ?, ?)", (random_plate(), int(is_ev), slot, datetime.now().isoformat()))
+        else:
+            row = conn.execute("SELECT entry_id FROM SmartParking WHERE exit_time IS NULL "
+                               "ORDER BY RANDOM() LIMIT 1").fetchone()
+            if row:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("INSERT INTO SmartParkingHistory SELECT entry_id, vehicle_number, is_ev, slot_number, "
+                             "entry_time, ? FROM SmartParking WHERE entry_id = ?", (datetime.now().isoformat(), row[0]))
+                conn.execute("DELETE FROM SmartParking WHERE entry_id = ?", (row[0],))
+                conn.execute("COMMIT")
+
+    def double_allocations(self):
+        return self._conn().execute(
+            "SELECT slot_number, COUNT(*) FROM SmartParking WHERE exit_time IS NULL "
+            "GROUP BY slot_number HAVING COUNT(*) > 1").fetchall()
+
+
+def mysql_double_allocations():
+    import mysql.connector
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT CONCAT(lot_id, '/', slot_number), COUNT(*) FROM SmartParking WHERE exit_time IS NULL "
+                   "GROUP BY lot_id, slot_number HAVING COUNT(*) > 1")
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the parking servers and allocator.")
+    parser.add_argument("--target", choices=["http", "sqlite"], default="sqlite")
+    parser.add_argument("--slots-url", default="http://localhost:9854")
+    parser.add_argument("--search-url", default="http://localhost:9871")
+    parser.add_argument("--dashboard-url", default="http://localhost:9843")
+    parser.add_argument("--sqlite-path", help="SQLite stand-in file (default: temporary)")
+    parser.add_argument("--dashboards", type=int, default=50, help="Simulated dashboards")
+    parser.add_argument("--poll-rps", type=float, default=1.0, help="Status polls per second per dashboard")
+    parser.add_argument("--search-rps", type=float, default=2.0, help="Total searches per second")
+    parser.add_argument("--gates", type=int, default=4, help="Simulated gates")
+    parser.add_argument("--gate-rps", type=float, default=0.5, help="Entries/exits per second per gate")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--seed-days", type=int, default=0, help="Days of history to seed first")
+    parser.add_argument("--stays-per-day", type=int, default=300)
+    parser.add_argument("--seed-mysql", action="store_true", help="Seed history into MySQL (http target)")
+    parser.add_argument("--check-mysql", action="store_true", help="Check MySQL for double allocations afterwards")
+    parser.add_argument("--workers", type=int, default=256, help="Max in-flight requests")
+    args = parser.parse_args()
+
+    if args.target == "sqlite":
+        path = args.sqlite_path or os.path.join(tempfile.mkdtemp(), "parking_bench.db")
+        sqlite3.connect(path).executescript(SQLITE_SCHEMA)
+        if args.seed_days:
+            print(f"🌱 Seeded {seed_sqlite(path, args.seed_days, args.stays_per_day)} stays into {path}")
+        target = SqliteTarget(path)
+    else:
+        if args.seed_mysql and args.seed_days:
+            print(f"🌱 Seeded {seed_mysql(args.seed_days, args.stays_per_day)} stays into MySQL")
+        target = HttpTarget(args.slots_url, args.search_url, args.dashboard_url)
+
+    recorder = Recorder()
+    stop = threading.Event()
+    loads = [
+        ("get_parking_status", args.dashboards * args.poll_rps, target.poll_status),
+        ("parking_entries", args.dashboards * args.poll_rps / 5, target.poll_entries),
+        ("search", args.search_rps, target.search),
+        ("gate_entry_exit", args.gates * args.gate_rps, target.gate),
+    ]
+    print(f"🚦 {args.duration:.0f}s against {args.target}: "
+          + ", ".join(f"{op} {rate:.1f}/s" for op, rate, _ in loads))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        schedulers = [threading.Thread(target=open_loop, args=(pool, recorder, op, rate, args.duration, task, stop))
+                      for op, rate, task in loads]
+        for t in schedulers:
+            t.start()
+        try:
+            for t in schedulers:
+                t.join()
+        except KeyboardInterrupt:
+            stop.set()
+    recorder.report(time.perf_counter() - started)
+
+    doubles = None
+    if args.target == "sqlite":
+        doubles = target.double_allocations()
+    elif args.check_mysql:
+        doubles = mysql_double_allocations()
+    if doubles is not None:
+        if doubles:
+            print("\n❌ Double-allocated slots: " + ", ".join(f"{slot} x{count}" for slot, count in doubles))
+        else:
+            print("\n✅ No double-allocated slots")
+
+
+if __name__ == "__main__":
+    main()
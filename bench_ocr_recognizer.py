@@ -0,0 +1,109 @@
+import argparse
+import multiprocessing
+import time
+
+from bench_plate_preprocess import ALLOWLIST, load_crops
+from ocr_recognizer import RECOGNIZER_MODES
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+# Function to load one recognizer backend and measure it over the crops (runs in its own process)
+def run_mode(mode, corpus_dir, repeats):
+    """Returns a dict of latency, accuracy and memory figures for `mode`."""
+    from gate_startup import load_reader, make_warmup_image
+    from plate_decoder import PlateDecoder
+
+    crops = load_crops(corpus_dir)
+    base_rss = _rss_mb()
+    started = time.perf_counter()
+    reader = load_reader(("en",), recognizer=mode, gpu=False)
+    load_s = time.perf_counter() - started
+    decoder = PlateDecoder(reader)
+    decoder.read(make_warmup_image())
+    reader.readtext(make_warmup_image(), detail=0, allowlist=ALLOWLIST)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for image, _label in crops:
+            decoder.read(image)
+    decode_ms = 1000 * (time.perf_counter() - start) / (repeats * len(crops))
+
+    correct, char_errors, chars = 0, 0, 0
+    start = time.perf_counter()
+    for image, label in crops:
+        result = reader.readtext(image, detail=0, allowlist=ALLOWLIST)
+        text = max(result, key=len).upper() if result else ""
+        decoded, _ = decoder.read(image)
+        text = decoded or text
+        correct += text == label
+        char_errors += edit_distance(text, label)
+        chars += len(label)
+    readtext_ms = 1000 * (time.perf_counter() - start) / len(crops)
+
+    rss = _rss_mb()
+    return {
+        "mode": mode if reader.recognizer_mode == mode else f"{mode}->{reader.recognizer_mode}",  # fell back
+        "load_s": load_s,
+        "decode_ms": decode_ms,
+        "readtext_ms": readtext_ms,
+        "accuracy": correct / len(crops),
+        "cer": char_errors / chars if chars else 0.0,
+        "rss_mb": rss - base_rss if rss is not None and base_rss is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR recognizer backends on labelled plate crops.")
+    parser.add_argument("corpus", help="Directory of plate crops with labels.csv (filename,text)")
+    parser.add_argument("--modes", default=",".join(RECOGNIZER_MODES), help="Comma-separated recognizer modes")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing passes over the corpus for the decoder path")
+    args = parser.parse_args()
+
+    crops = load_crops(args.corpus)
+    if not crops:
+        print("❌ No labelled crops found.")
+        return
+    print(f"🔤 {len(crops)} labelled crops; 'decode ms' is the gates' direct recognizer path")
+
+    # A fresh process per backend, so load time and memory are not shared between them
+    context = multiprocessing.get_context("spawn")
+    print(f"{'mode':<10} {'load s':>7} {'decode ms':>10} {'readtext ms':>12} {'accuracy':>9} {'CER':>6} {'RSS MB':>7}")
+    for mode in args.modes.split(","):
+        mode = mode.strip()
+        try:
+            with context.Pool(1) as pool:
+                r = pool.apply(run_mode, (mode, args.corpus, args.repeats))
+        except (ImportError, RuntimeError, ValueError) as err:
+            print(f"{mode:<10} ❌ {err}")
+            continue
+        rss = f"{r['rss_mb']:.0f}" if r["rss_mb"] is not None else "n/a"
+        print(f"{r['mode']:<10} {r['load_s']:>7.1f} {r['decode_ms']:>10.1f} {r['readtext_ms']:>12.1f} "
+              f"{r['accuracy']:>9.3f} {r['cer']:>6.3f} {rss:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import csv
+import os
+import time
+import cv2
+
+from plate_detector import create_plate_detector
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+# Function to load replay frames and their labelled plate boxes
+def load_corpus(corpus_dir):
+    """Load (path, [boxes]) pairs. Labels come from labels.csv: filename,x,y,w,h."""
+    labels = {}
+    labels_path = os.path.join(corpus_dir, "labels.csv")
+    if os.path.exists(labels_path):
+        with open(labels_path, newline="") as f:
+            for row in csv.DictReader(f):
+                box = tuple(int(row[k]) for k in ("x", "y", "w", "h"))
+                labels.setdefault(row["filename"], []).append(box)
+
+    corpus = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            corpus.append((os.path.join(corpus_dir, name), labels.get(name, [])))
+    return corpus
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+# Function to time one backend over the corpus and measure recall
+def run_backend(backend, frames, iou_threshold):
+    detector = create_plate_detector(backend)
+    matched, total_labels, total_detections = 0, 0, 0
+
+    start = time.perf_counter()
+    for frame, boxes in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        plates = detector.detect(frame, gray)
+        total_detections += len(plates)
+        total_labels += len(boxes)
+        matched += sum(1 for box in boxes if any(iou(box, p) >= iou_threshold for p in plates))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "frames": len(frames),
+        "fps": len(frames) / elapsed if elapsed else 0.0,
+        "ms_per_frame": 1000 * elapsed / len(frames) if frames else 0.0,
+        "detections": total_detections,
+        "recall": matched / total_labels if total_labels else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare plate detector backends on a replay corpus.")
+    parser.add_argument("corpus", help="Directory of replay frames with an optional labels.csv")
+    parser.add_argument("--backends", default="haar,dnn", help="Comma-separated backends to compare")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU threshold for a labelled plate to count as found")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    frames = [(cv2.imread(path), boxes) for path, boxes in corpus]
+    frames = [(frame, boxes) for frame, boxes in frames if frame is not None]
+    if not frames:
+        print("❌ No readable frames in corpus.")
+        return
+
+    print(f"{'backend':<8} {'frames':>7} {'fps':>8} {'ms/frame':>9} {'detections':>11} {'recall':>7}")
+    for backend in args.backends.split(","):
+        try:
+            r = run_backend(backend.strip(), frames, args.iou)
+        except (cv2.error, ImportError, ValueError) as err:
+            print(f"{backend:<8} ❌ {err}")
+            continue
+        recall = f"{r['recall']:.3f}" if r["recall"] is not None else "n/a"
+        print(f"{r['backend']:<8} {r['frames']:>7} {r['fps']:>8.1f} {r['ms_per_frame']:>9.2f} "
+              f"{r['detections']:>11} {recall:>7}")
+
+
+if __name__ == "__main__":
+    main()
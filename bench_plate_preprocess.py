@@ -0,0 +1,105 @@
+import argparse
+import csv
+import os
+import time
+import cv2
+
+from ocr_cache import OCR_CACHE_CONFIG, dhash
+from plate_preprocess import PlatePreprocessor
+
+ALLOWLIST = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+# Function to load labelled plate crops (labels.csv: filename,text)
+def load_crops(corpus_dir):
+    crops = []
+    with open(os.path.join(corpus_dir, "labels.csv"), newline="") as f:
+        for row in csv.DictReader(f):
+            image = cv2.imread(os.path.join(corpus_dir, row["filename"]))
+            if image is not None:
+                crops.append((image, row["text"].strip().upper()))
+    return crops
+
+
+# Function to measure preprocessing cost and OCR accuracy for one strategy
+def run_strategy(strategy, crops, reader, repeats):
+    preprocessor = PlatePreprocessor(strategy)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for image, _label in crops:
+            preprocessor.process(image)
+    us_per_crop = 1e6 * (time.perf_counter() - start) / (repeats * len(crops))
+
+    correct = None
+    if reader is not None:
+        correct = 0
+        for image, label in crops:
+            processed = preprocessor.process(image)
+            result = reader.readtext(processed, detail=0, allowlist=ALLOWLIST)
+            text = max(result, key=len).upper() if result else ""
+            correct += text == label
+    return preprocessor.strategy, us_per_crop, correct
+
+
+# Function to show how far apart the OCR cache's dHash puts same-plate and different-plate crops
+def hash_distances(crops):
+    """A safe OCR_CACHE_CONFIG max_distance sits below the smallest different-plate distance."""
+    hashes = [(dhash(image), label) for image, label in crops]
+    same, different, one_glyph = [], [], []
+    for i, (a, label_a) in enumerate(hashes):
+        for b, label_b in hashes[i + 1:]:
+            distance = (a ^ b).bit_count()
+            if label_a == label_b:
+                same.append(distance)
+            else:
+                different.append(distance)
+                if len(label_a) == len(label_b) and sum(x != y for x, y in zip(label_a, label_b)) == 1:
+                    one_glyph.append(distance)
+
+    def summary(values):
+        if not values:
+            return "no pairs"
+        values = sorted(values)
+        return (f"min {values[0]}, median {values[len(values) // 2]}, "
+                f"p95 {values[int(len(values) * 0.95)]}, max {values[-1]} ({len(values)} pairs)")
+
+    print(f"🔢 dHash distances (cache max_distance is {OCR_CACHE_CONFIG['max_distance']}):")
+    print(f"   same plate:       {summary(same)}")
+    print(f"   different plates: {summary(different)}")
+    print(f"   one glyph apart:  {summary(one_glyph)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plate preprocessing strategies.")
+    parser.add_argument("corpus", help="Directory of plate crops with labels.csv (filename,text)")
+    parser.add_argument("--strategies", default="none;equalize;adaptive;clahe;blur,adaptive",
+                        help="Semicolon-separated strategy specs")
+    parser.add_argument("--repeats", type=int, default=20, help="Timing passes over the corpus")
+    parser.add_argument("--no-ocr", action="store_true", help="Only time preprocessing, skip easyocr")
+    parser.add_argument("--hash-distances", action="store_true",
+                        help="Print OCR cache dHash distances between crops instead of benchmarking")
+    args = parser.parse_args()
+
+    crops = load_crops(args.corpus)
+    if not crops:
+        print("❌ No labelled crops found.")
+        return
+    if args.hash_distances:
+        hash_distances(crops)
+        return
+
+    reader = None
+    if not args.no_ocr:
+        import easyocr
+        reader = easyocr.Reader(['en'], gpu=False)
+
+    print(f"{'strategy':<20} {'us/crop':>9} {'accuracy':>9}")
+    for spec in args.strategies.split(";"):
+        name, us_per_crop, correct = run_strategy(spec, crops, reader, args.repeats)
+        accuracy = f"{correct / len(crops):.3f}" if correct is not None else "n/a"
+        print(f"{name:<20} {us_per_crop:>9.1f} {accuracy:>9}")
+
+
+if __name__ == "__main__":
+    main()
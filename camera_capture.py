@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import cv2
+
+CAPTURE_CONFIG = {
+    "backend": os.getenv("CAMERA_BACKEND", "ANY"),          # ANY, V4L2, DSHOW, MSMF, GSTREAMER, FFMPEG ...
+    "fourcc": os.getenv("CAMERA_FOURCC", "MJPG"),           # "" leaves the driver's default pixel format
+    "fps": float(os.getenv("CAMERA_FPS", "30")),
+    "buffer_size": int(os.getenv("CAMERA_BUFFER_SIZE", "1")),  # keep the driver queue short so frames are fresh
+    "threaded": os.getenv("CAMERA_THREADED", "1") != "0",
+    "log_interval": float(os.getenv("CAMERA_FPS_LOG_INTERVAL", "10")),  # 0 disables the periodic fps line
+}
+
+
+def fourcc_to_str(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+# Function to request a capture mode and report what the driver actually granted
+def configure_capture(cap, width=None, height=None, fps=None, fourcc=None, buffer_size=None):
+    """Apply FOURCC, resolution, FPS and buffer size, in the order UVC drivers expect.
+
+    The pixel format has to be chosen before the resolution: most webcams
+    only offer 1080p at full rate as MJPG, and setting the size first
+    locks them into uncompressed YUYV at a few fps.
+
+    Returns a dict of the granted settings.
+    """
+    fourcc = CAPTURE_CONFIG["fourcc"] if fourcc is None else fourcc
+    fps = CAPTURE_CONFIG["fps"] if fps is None else fps
+    buffer_size = CAPTURE_CONFIG["buffer_size"] if buffer_size is None else buffer_size
+
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    if buffer_size:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+    granted = {
+        "fourcc": fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+    requested = {"fourcc": fourcc, "width": width, "height": height, "fps": fps}
+    mismatched = [
+        f"{key} {requested[key]} -> {granted[key] or '?'}"
+        for key in requested
+        if requested[key] and granted[key] and granted[key] != requested[key]
+    ]
+    print(f"📷 Camera mode: {granted['width']}x{granted['height']} {granted['fourcc'] or '?'} "
+          f"@ {granted['fps']:.0f} fps")
+    if mismatched:
+        print(f"⚠️ Camera did not grant the requested mode: {', '.join(mismatched)}")
+    return granted
+
+
+class ThreadedCapture:
+    """Reads and decodes frames on a dedicated thread and hands out the newest one.
+
+    The MJPG decode and the driver wait then overlap with detection and OCR
+    on the caller's thread, and a slow consumer drops stale frames rather
+    than working through a backlog. Exposes the parts of the
+    cv2.VideoCapture interface the gate scripts use.
+    """
+
+    def __init__(self, cap, log_interval=None):
+        self.cap = cap
+        self.log_interval = CAPTURE_CONFIG["log_interval"] if log_interval is None else log_interval
+        self._frame = None
+        self._sequence = 0
+        self._delivered_sequence = 0
+        self._condition = threading.Condition()
+        self._running = True
+        self.captured = 0
+        self.delivered = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="camera-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        window_start, window_captured, window_delivered = time.monotonic(), 0, 0
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                self.failed += 1
+                time.sleep(0.01)
+                continue
+            with self._condition:
+                self._frame = frame
+                self._sequence += 1
+                self.captured += 1
+                self._condition.notify_all()
+
+            elapsed = time.monotonic() - window_start
+            if self.log_interval and elapsed >= self.log_interval:
+                captured = self.captured - window_captured
+                delivered = self.delivered - window_delivered
+                print(f"⏱ Camera {captured / elapsed:.1f} fps captured, {delivered / elapsed:.1f} fps processed")
+                window_start, window_captured, window_delivered = time.monotonic(), self.captured, self.delivered
+
+    def read(self, timeout=5.0):
+        """Return (ret, frame) for a frame newer than the last one returned."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._sequence > self._delivered_sequence or not self._running,
+                                            timeout):
+                return False, None
+            if self._sequence <= self._delivered_sequence:
+                return False, None
+            self._delivered_sequence = self._sequence
+            self.delivered += 1
+            return True, self._frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join(timeout=2.0)
+        self.cap.release()
+
+
+# Function to open a camera with the configured capture profile
+def open_capture(source=0, width=None, height=None, fps=None, fourcc=None, threaded=None):
+    """Open `source` (index or URL), negotiate the capture mode and optionally thread the reads."""
+    threaded = CAPTURE_CONFIG["threaded"] if threaded is None else threaded
+    backend = getattr(cv2, f"CAP_{CAPTURE_CONFIG['backend'].upper()}", cv2.CAP_ANY)
+    cap = cv2.VideoCapture(source, backend)
+    if isinstance(source, int):
+        configure_capture(cap, width, height, fps, fourcc)
+    return ThreadedCapture(cap) if threaded else cap
@@ -1,9 +1,22 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import mysql.connector
+from datetime import datetime
+import os
+from evidence_store import evidence_json, find_evidence, image_response
+import occupancy_log
+from overstay_alerts import OverstayMonitor, register_alert_route
+from parking_archive import archive_stays, migrate
+from parking_db import READ_ERRORS, ReadRouter
+from parking_export import CONTENT_TYPES, FORMATS, stream_export
+import parking_rollups
+from parking_lots import lot_slots, resolve_lot
+from response_cache import conditional_response, static_payload
+import sampling_profiler
 
 app = Flask(__name__)  # Corrected __name__
 CORS(app)  # Enable CORS for AJAX requests
+sampling_profiler.register_profile_route(app)  # GET /admin/profile?seconds=N
 
 # MySQL Database Configuration
 DB_CONFIG = {
@@ -13,21 +26,41 @@ DB_CONFIG = {
     "database": "smart_parking",
 }
 
+# Read-only endpoints go to the replica or read snapshot (DB_READ_FROM); writes stay on DB_CONFIG
+reads = ReadRouter(DB_CONFIG)
+
+# Overstay / EV charging-limit alerts at GET /api/alerts?lot=
+alerts = OverstayMonitor(lambda: reads.connect(active_only=True))
+register_alert_route(app, alerts)
+
 @app.route('/')
 def dashboard():
     """Render the dashboard HTML page."""
-    return render_template('dashboard01.html')
+    return conditional_response(static_payload(os.path.join(app.root_path, app.template_folder, 'dashboard01.html')), request.headers)
+
+# Lot for this request: ?lot=<id> or "lot_id" in the JSON body, else PARKING_LOT
+def request_lot(data=None):
+    return resolve_lot((data or {}).get('lot_id') or request.args.get('lot'))
 
 @app.route('/parking-entries', methods=['GET'])
 def get_parking_entries():
-    """Fetches the latest parking entries from MySQL, including EV slot status."""
+    """Fetches the latest parking entries from MySQL, including EV slot status (all lots unless ?lot=)."""
+    lot_id = request.args.get('lot')
+    if lot_id:
+        try:
+            resolve_lot(lot_id)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 404
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
+        connection = reads.connect(active_only=True)
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT entry_id, vehicle_number, slot_number, entry_time, is_ev FROM SmartParking ORDER BY entry_time DESC")
+        if lot_id:
+            cursor.execute("SELECT entry_id, lot_id, vehicle_number, slot_number, entry_time, is_ev FROM SmartParking WHERE lot_id = %s ORDER BY entry_time DESC", (lot_id,))
+        else:
+            cursor.execute("SELECT entry_id, lot_id, vehicle_number, slot_number, entry_time, is_ev FROM SmartParking ORDER BY entry_time DESC")
         entries = cursor.fetchall()
         return jsonify(entries)
-    except mysql.connector.Error as err:
+    except READ_ERRORS as err:
         return jsonify({"error": str(err)}), 500
     finally:
         if 'cursor' in locals():
@@ -45,21 +78,32 @@ def add_parking_entry():
 
     if not vehicle_number or not slot_number:
         return jsonify({"error": "Vehicle number and slot number are required"}), 400
+    try:
+        lot_id = request_lot(data)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    if slot_number not in lot_slots(lot_id):
+        return jsonify({"error": f"Unknown slot {slot_number} in lot {lot_id}"}), 400
 
     try:
         connection = mysql.connector.connect(**DB_CONFIG)
         cursor = connection.cursor()
 
-        # Check if the slot is already occupied
-        cursor.execute("SELECT COUNT(*) FROM SmartParking WHERE slot_number = %s AND is_ev = %s", (slot_number, is_ev))
+        # Check if the slot is already occupied (by any active stay, EV or not)
+        cursor.execute("SELECT COUNT(*) FROM SmartParking WHERE lot_id = %s AND slot_number = %s AND exit_time IS NULL FOR UPDATE", (lot_id, slot_number))
         slot_count = cursor.fetchone()[0]
 
         if slot_count > 0:
             return jsonify({"error": "Slot is already occupied"}), 400
 
-        sql = "INSERT INTO SmartParking (vehicle_number, slot_number, entry_time, is_ev) VALUES (%s, %s, NOW(), %s)"
-        cursor.execute(sql, (vehicle_number, slot_number, is_ev))
+        entry_time = datetime.now()
+        sql = "INSERT INTO SmartParking (lot_id, vehicle_number, slot_number, entry_time, is_ev) VALUES (%s, %s, %s, %s, %s)"
+        cursor.execute(sql, (lot_id, vehicle_number, slot_number, entry_time, is_ev))
+        entry_id = cursor.lastrowid
+        parking_rollups.record_entry(cursor, slot_number, entry_time, lot_id)
+        occupancy_log.record_entry(cursor, entry_id, lot_id, slot_number, vehicle_number, is_ev, entry_time)
         connection.commit()
+        alerts.on_entry(entry_id, lot_id, vehicle_number, slot_number, is_ev, entry_time)
         return jsonify({"message": "Entry added successfully"}), 201
     except mysql.connector.Error as err:
         return jsonify({"error": str(err)}), 500
@@ -71,12 +115,21 @@ def add_parking_entry():
 
 @app.route('/parking-entries/<int:entry_id>', methods=['DELETE'])
 def delete_parking_entry(entry_id):
-    """Deletes a parking entry from the database."""
+    """Ends a parking entry, moving it to history as an exit would."""
+    try:
+        lot_id = request_lot()
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
     try:
         connection = mysql.connector.connect(**DB_CONFIG)
         cursor = connection.cursor()
-        cursor.execute("DELETE FROM SmartParking WHERE entry_id = %s", (entry_id,))
+        # Close the stay like a gate exit: occupancy log, history and rollup exit deltas together
+        exit_time = datetime.now()
+        if not archive_stays(cursor, "entry_id = %s", (entry_id,), exit_time, lot_id):
+            connection.rollback()
+            return jsonify({"error": f"No entry {entry_id} in lot {lot_id}"}), 404
         connection.commit()
+        alerts.on_exit(entry_id, exit_time)
         return jsonify({"message": "Entry deleted successfully"}), 200
     except mysql.connector.Error as err:
         return jsonify({"error": str(err)}), 500
@@ -86,8 +139,102 @@ def delete_parking_entry(entry_id):
         if 'connection' in locals():
             connection.close()
 
+@app.route('/api/rollups', methods=['GET'])
+def get_rollups():
+    """Hourly occupancy, turnover and dwell per zone for ?start=&end=&zone=&lot= (default: last 24h, all lots)."""
+    try:
+        start, end = parking_rollups.parse_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start/end must be ISO timestamps"}), 400
+    lot_id = request.args.get('lot')
+    if lot_id:
+        try:
+            resolve_lot(lot_id)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 404
+    try:
+        connection = reads.connect()
+        cursor = connection.cursor()
+        return jsonify(parking_rollups.read_rollups(cursor, start, end, request.args.get('zone'), lot_id))
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'connection' in locals():
+            connection.close()
+
+@app.route('/api/occupancy/at', methods=['GET'])
+def get_occupancy_at():
+    """Who was in each slot at ?at=<ISO time> (&lot=, &slot=), rebuilt from the nearest snapshot."""
+    try:
+        moment = occupancy_log.parse_moment(request.args.get('at'))
+    except ValueError:
+        return jsonify({"error": "at must be an ISO timestamp"}), 400
+    try:
+        lot_id = request_lot()
+        occupancy_log.validate_slot(lot_id, request.args.get('slot'))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    try:
+        connection = reads.connect()
+        cursor = connection.cursor(dictionary=True)
+        return jsonify(occupancy_log.occupancy_at(cursor, lot_id, moment, request.args.get('slot')))
+    except READ_ERRORS as err:
+        return jsonify({"error": str(err)}), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'connection' in locals():
+            connection.close()
+
+@app.route('/api/evidence/<int:entry_id>', methods=['GET'])
+def get_evidence(entry_id):
+    """Frames and plate crops the gates stored for a stay's entry and exit decisions."""
+    records = find_evidence(entry_id)
+    if not records:
+        return jsonify({"error": f"No evidence stored for entry {entry_id}"}), 404
+    return jsonify(evidence_json(records))
+
+@app.route('/evidence/<digest>.jpg', methods=['GET'])
+def get_evidence_image(digest):
+    """Serves one stored image by its content digest."""
+    return image_response(digest, request.headers)
+
+@app.route('/export', methods=['GET'])
+def export_parking_history():
+    """Streams active and archived stays as CSV, NDJSON or Parquet with constant memory."""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    try:
+        connection = reads.connect()
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+
+    def generate():
+        try:
+            yield from stream_export(connection, fmt, request.args.get('since'), request.args.get('until'),
+                                     lot_id=request.args.get('lot'))
+        finally:
+            connection.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=CONTENT_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=parking_history.{fmt}"},
+    )
+
 if __name__ == '__main__':  # Corrected __name__
     from waitress import serve
+    sampling_profiler.install()
+    try:
+        migrate(DB_CONFIG)
+    except mysql.connector.Error as err:
+        print(f"⚠️ Schema check failed ({err}); entry and exit writes need it")
+    reads.start()
+    alerts.start()
     print("🚀 Server running on http://localhost:9843")
     serve(app, host="0.0.0.0", port=9843)
 
@@ -0,0 +1,402 @@
+import argparse
+import glob
+import hashlib
+import mmap
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+
+EVIDENCE_CONFIG = {
+    "root": os.getenv("EVIDENCE_DIR", "evidence"),
+    "gate": os.getenv("EVIDENCE_GATE", os.path.splitext(os.path.basename(sys.argv[0] or "gate"))[0] or "gate"),
+    "max_bytes": int(float(os.getenv("EVIDENCE_MAX_MB", "2048")) * 1024 * 1024),  # size budget for stored images
+    "capacity": int(os.getenv("EVIDENCE_INDEX_CAPACITY", "65536")),  # decisions kept in each gate's index
+    "frame_width": int(os.getenv("EVIDENCE_FRAME_WIDTH", "640")),    # frames are downscaled to this width
+    "jpeg_quality": int(os.getenv("EVIDENCE_JPEG_QUALITY", "85")),
+    "max_pending": int(os.getenv("EVIDENCE_MAX_PENDING", "32")),     # captures queued beyond this are dropped
+}
+
+MAX_OBJECTS = 4        # one frame + up to three plate crops per decision
+MAX_PROBES = 64        # entry_id lookups give up after this many slots
+MAGIC = b"PEVIDX1\0"
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Index file: header, then a ring of decision records, then an open-addressing
+# table mapping (entry_id, kind) to the ring position of its record.
+HEADER = struct.Struct("<8sIIQ")                  # magic, version, capacity, next seq
+RECORD = struct.Struct("<QQ16sd8s16s32sBB2x64s4I")  # seq, entry_id, event_id, captured_at, kind, plate, lot,
+                                                   # object count, has frame, object digests, object sizes
+SLOT = struct.Struct("<QQ")                       # key, seq
+HEADER_SIZE = 64
+KINDS = ("entry", "exit")
+
+
+def _table_size(capacity):
+    size = 1
+    while size < capacity * 2:
+        size *= 2
+    return size
+
+
+def _key(entry_id, kind):
+    return int(entry_id) * 2 + (kind == "exit")
+
+
+def _text(raw):
+    return raw.rstrip(b"\0").decode("utf-8", "replace")
+
+
+def object_path(root, digest):
+    return os.path.join(root, "objects", digest[:2], f"{digest}.jpg")
+
+
+class EvidenceIndex:
+    """Memory-mapped, fixed-size index of one gate's evidence records.
+
+    Records go into a ring of `capacity` slots, so the index never grows
+    and the oldest decisions are overwritten first. A hash table in the same
+    file maps (entry_id, kind) to a ring position; a slot whose record has
+    been overwritten is treated as free, so the table needs no deletes.
+    Only the owning gate writes; any process may open it read-only.
+    """
+
+    def __init__(self, path, capacity=None, writable=False):
+        self.path = path
+        if writable and not os.path.exists(path):
+            capacity = capacity or EVIDENCE_CONFIG["capacity"]
+            size = HEADER_SIZE + capacity * RECORD.size + _table_size(capacity) * SLOT.size
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, 1, capacity, 1).ljust(HEADER_SIZE, b"\0"))
+                f.truncate(size)
+
+        self._file = open(path, "r+b" if writable else "rb")
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+        magic, _, self.capacity, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an evidence index")
+        self._table_offset = HEADER_SIZE + self.capacity * RECORD.size
+        self._mask = _table_size(self.capacity) - 1
+
+    @property
+    def next_seq(self):
+        return HEADER.unpack_from(self._map, 0)[3]
+
+    def _record_offset(self, seq):
+        return HEADER_SIZE + (seq % self.capacity) * RECORD.size
+
+    def record(self, seq):
+        """Return the record stored under `seq` as a dict, or None if it has been overwritten."""
+        fields = RECORD.unpack_from(self._map, self._record_offset(seq))
+        if fields[0] != seq or seq == 0:
+            return None
+        _, entry_id, event_id, captured_at, kind, plate, lot_id, count, has_frame, digests, *sizes = fields
+        return {
+            "seq": seq,
+            "entry_id": entry_id or None,
+            "event_id": str(uuid.UUID(bytes=event_id)),
+            "captured_at": captured_at,
+            "kind": _text(kind),
+            "plate": _text(plate),
+            "lot_id": _text(lot_id),
+            "objects": [
+                {"digest": digests[i * 16:(i + 1) * 16].hex(), "size": sizes[i], "role": "frame" if i == 0 and has_frame else "crop"}
+                for i in range(count)
+            ],
+        }
+
+    def records(self):
+        """Yield every live record, oldest first."""
+        head = self.next_seq
+        for seq in range(max(1, head - self.capacity), head):
+            record = self.record(seq)
+            if record:
+                yield record
+
+    def append(self, event_id, kind, plate, lot_id, captured_at, objects, has_frame=True):
+        """Write a record for a decision and return its seq. `objects` is [(digest bytes, size), ...], frame first."""
+        seq = self.next_seq
+        objects = objects[:MAX_OBJECTS]
+        digests = b"".join(digest for digest, _ in objects)
+        sizes = [size for _, size in objects] + [0] * (MAX_OBJECTS - len(objects))
+        offset = self._record_offset(seq)
+        # Write the body under seq 0 and publish the seq last, so readers never see a half-written record
+        RECORD.pack_into(self._map, offset, 0, 0, event_id, captured_at, kind.encode(), plate.encode()[:16],
+                         (lot_id or "").encode()[:32], len(objects), int(has_frame), digests, *sizes)
+        struct.pack_into("<Q", self._map, offset, seq)
+        struct.pack_into("<Q", self._map, HEADER.size - 8, seq + 1)
+        return seq
+
+    def _slot_offset(self, key, probe):
+        position = ((key * 0x9E3779B97F4A7C15 >> 17) + probe) & self._mask
+        return self._table_offset + position * SLOT.size
+
+    def _live(self, key, seq):
+        offset = self._record_offset(seq)
+        stored_seq, entry_id = struct.unpack_from("<QQ", self._map, offset)
+        kind = _text(RECORD.unpack_from(self._map, offset)[4])
+        return stored_seq == seq and entry_id and _key(entry_id, kind) == key
+
+    def link(self, seq, entry_id):
+        """Attach the MySQL entry_id to a record once the gate journal has applied its event."""
+        offset = self._record_offset(seq)
+        if struct.unpack_from("<Q", self._map, offset)[0] != seq:
+            return False  # overwritten before the journal caught up
+        struct.pack_into("<Q", self._map, offset + 8, entry_id)
+        key = _key(entry_id, _text(RECORD.unpack_from(self._map, offset)[4]))
+        last = None
+        for probe in range(MAX_PROBES):
+            last = self._slot_offset(key, probe)
+            slot_key, slot_seq = SLOT.unpack_from(self._map, last)
+            if slot_key == 0 or slot_key == key or not self._live(slot_key, slot_seq):
+                break
+        # A full probe run reuses its last slot; that older link just stops resolving
+        SLOT.pack_into(self._map, last, key, seq)
+        return True
+
+    def find(self, entry_id, kind):
+        key = _key(entry_id, kind)
+        for probe in range(MAX_PROBES):
+            slot_key, slot_seq = SLOT.unpack_from(self._map, self._slot_offset(key, probe))
+            if slot_key == 0:
+                return None
+            if slot_key == key and self._live(key, slot_seq):
+                return self.record(slot_seq)
+        return None
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class EvidenceStore:
+    """Background encoder for the images behind each gate decision.
+
+    submit() only queues references to the frame and crops the gate already
+    holds; JPEG encoding, hashing, disk writes and retention all run on the
+    store's own thread. Images are stored once under their BLAKE2b digest in
+    a directory shared by every gate, and each gate indexes its decisions in
+    its own EvidenceIndex, keyed by the entry_id the journal assigns later.
+    """
+
+    def __init__(self, root=None, gate=None, max_bytes=None, capacity=None):
+        self.root = root or EVIDENCE_CONFIG["root"]
+        self.gate = gate or EVIDENCE_CONFIG["gate"]
+        self.max_bytes = max_bytes or EVIDENCE_CONFIG["max_bytes"]
+        self.index = EvidenceIndex(os.path.join(self.root, "index", f"{self.gate}.idx"), capacity, writable=True)
+        self._events = {}          # event_id bytes -> seq, for linking entry_ids
+        self._pending_links = {}   # links that arrived before their capture was written
+        for record in self.index.records():
+            self._events[uuid.UUID(record["event_id"]).bytes] = record["seq"]
+        self._queue = queue.Queue()
+        self._pending_captures = 0  # links are never dropped, so only captures count against max_pending
+        self._stored_bytes = None
+        self.dropped = 0
+        self.written = 0
+        self._thread = None
+
+    # ---- gate side -------------------------------------------------------
+
+    def submit(self, event_id, kind, plate, frame=None, crops=(), lot_id=None):
+        """Queue the evidence for one decision. Never blocks; drops the capture if the encoder is behind."""
+        if self._pending_captures >= EVIDENCE_CONFIG["max_pending"]:
+            self.dropped += 1
+            return False
+        self._pending_captures += 1
+        self._queue.put(("capture", (event_id, kind, plate, frame, list(crops), lot_id, time.time())))
+        return True
+
+    def submit_selection(self, event_id, kind, plate, best, lot_id=None):
+        """submit() for CropSelector.best() output: the best crop's frame (info "frame") and the kept crops."""
+        frame = best[0][2].get("frame") if best else None
+        return self.submit(event_id, kind, plate, frame, [crop for _, crop, _ in best], lot_id)
+
+    def link(self, event_id, entry_id):
+        """Record that journal event `event_id` became MySQL row `entry_id` (GateJournal on_applied hook)."""
+        self._queue.put(("link", (event_id, entry_id)))
+
+    # ---- encoder side ----------------------------------------------------
+
+    def _encode(self, image, width=None):
+        import cv2  # only the gate side encodes; readers such as the dashboard don't need OpenCV
+
+        if width and image.shape[1] > width:
+            height = max(1, image.shape[0] * width // image.shape[1])
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, EVIDENCE_CONFIG["jpeg_quality"]])
+        return encoded.tobytes() if ok else None
+
+    def _put_object(self, data):
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        path = object_path(self.root, digest.hex())
+        if os.path.exists(path):
+            os.utime(path)  # same image seen again; keep it young for retention
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # atomic, so readers and other gates never see a partial object
+        self._stored_bytes = (self._stored_bytes or 0) + len(data)
+        return digest
+
+    def _capture(self, event_id, kind, plate, frame, crops, lot_id, captured_at):
+        images = [self._encode(frame, EVIDENCE_CONFIG["frame_width"])] if frame is not None else []
+        has_frame = bool(images and images[0])
+        images += [self._encode(crop) for crop in crops[:MAX_OBJECTS - len(images)]]
+        objects = [(self._put_object(data), len(data)) for data in images if data]
+
+        event_key = uuid.UUID(event_id).bytes
+        head = self.index.next_seq
+        overwritten = self.index.record(head - self.index.capacity) if head > self.index.capacity else None
+        if overwritten:
+            self._events.pop(uuid.UUID(overwritten["event_id"]).bytes, None)
+        seq = self.index.append(event_key, kind, plate, lot_id, captured_at, objects, has_frame)
+        self._events[event_key] = seq
+        if event_key in self._pending_links:
+            self.index.link(seq, self._pending_links.pop(event_key))
+        self.written += 1
+
+    def _link(self, event_id, entry_id):
+        event_key = uuid.UUID(event_id).bytes
+        seq = self._events.get(event_key)
+        if seq is None:
+            self._pending_links[event_key] = entry_id
+            while len(self._pending_links) > self.index.capacity:
+                self._pending_links.pop(next(iter(self._pending_links)))
+        else:
+            self.index.link(seq, entry_id)
+
+    # Function to delete the least recently written objects once the store is over budget
+    def enforce_retention(self):
+        """Trim the shared object directory to 90% of max_bytes, oldest objects first. Returns bytes freed."""
+        files = []
+        for path in glob.glob(os.path.join(self.root, "objects", "*", "*.jpg")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # another gate trimmed it first
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        for _, size, path in sorted(files):
+            if total - freed <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        self._stored_bytes = total - freed
+        return freed
+
+    def _run(self):
+        while True:
+            job, args = self._queue.get()
+            if job is None:
+                break
+            try:
+                if job == "capture":
+                    self._pending_captures -= 1
+                    self._capture(*args)
+                else:
+                    self._link(*args)
+                if self._stored_bytes is None or self._stored_bytes > self.max_bytes:
+                    freed = self.enforce_retention()
+                    if freed:
+                        print(f"🗑 Evidence store trimmed {freed / 1e6:.1f} MB of old images")
+            except Exception as err:  # a bad frame or full disk must not stop the encoder thread
+                print(f"⚠️ Evidence not stored: {err}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="evidence-encoder", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Write what is queued, then stop."""
+        if self._thread is not None:
+            self._queue.put((None, None))
+            self._thread.join(timeout)
+            self._thread = None
+        self.index.flush()
+        if self.dropped:
+            print(f"⚠️ Evidence encoder fell behind; {self.dropped} decision(s) stored without images.")
+
+
+# Function to look up the evidence for a stay across every gate's index
+def find_evidence(entry_id, root=None):
+    """Return the entry and exit evidence records for `entry_id`, newest gate index first."""
+    root = root or EVIDENCE_CONFIG["root"]
+    found = {}
+    paths = sorted(glob.glob(os.path.join(root, "index", "*.idx")), key=os.path.getmtime, reverse=True)
+    for path in paths:
+        try:
+            index = EvidenceIndex(path)
+        except (OSError, ValueError):
+            continue  # index still being created by its gate
+        try:
+            for kind in KINDS:
+                if kind not in found:
+                    record = index.find(entry_id, kind)
+                    if record:
+                        record["gate"] = os.path.splitext(os.path.basename(path))[0]
+                        for obj in record["objects"]:
+                            obj["available"] = os.path.exists(object_path(root, obj["digest"]))
+                        found[kind] = record
+        finally:
+            index.close()
+    return [found[kind] for kind in KINDS if kind in found]
+
+
+# Function to attach image URLs to evidence records for the dashboards
+def evidence_json(records, url_prefix="/evidence/"):
+    for record in records:
+        for obj in record["objects"]:
+            obj["url"] = f"{url_prefix}{obj['digest']}.jpg"
+    return records
+
+
+# Function to serve a stored image (works for Flask and Quart)
+def image_response(digest, request_headers, root=None):
+    """Return (body, status, headers). Objects never change, so they are cached as immutable."""
+    if not DIGEST_PATTERN.match(digest):
+        return b"", 404, {}
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if f'"{digest}"' in (request_headers.get("If-None-Match") or ""):
+        return b"", 304, headers
+    try:
+        with open(object_path(root or EVIDENCE_CONFIG["root"], digest), "rb") as f:
+            body = f.read()
+    except FileNotFoundError:
+        return b"", 404, {}  # trimmed by retention
+    headers["Content-Type"] = "image/jpeg"
+    headers["Content-Length"] = str(len(body))
+    return body, 200, headers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect stored gate evidence.")
+    parser.add_argument("entry_id", type=int)
+    parser.add_argument("--root", default=None)
+    args = parser.parse_args()
+    records = find_evidence(args.entry_id, args.root)
+    if not records:
+        print(f"⚠️ No evidence stored for entry {args.entry_id}")
+    for record in records:
+        print(f"📁 {record['kind']} {record['plate']} at {time.ctime(record['captured_at'])} "
+              f"({record['gate']}, lot {record['lot_id']})")
+        for obj in record["objects"]:
+            state = "" if obj["available"] else " (trimmed)"
+            print(f"   {obj['role']}: {object_path(args.root or EVIDENCE_CONFIG['root'], obj['digest'])}{state}")
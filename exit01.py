@@ -1,14 +1,21 @@
+from gate_startup import start_gate
 import cv2
-import easyocr
-import numpy as np
 import time
+from datetime import datetime
 import mysql.connector
-
-# Load Haar Cascade for plate detection
-plate_cascade = cv2.CascadeClassifier("haarcascade_russian_plate_number.xml")
-
-# Initialize EasyOCR Reader
-reader = easyocr.Reader(['en'])
+from exit_matcher import ExitMatcher
+from evidence_store import EvidenceStore
+from gate_journal import GateJournal
+from gate_preview import BLUE, GateView
+from parking_billing import TARIFF
+from parking_lots import LOT_ID
+from ocr_cache import CachedReader
+from plate_decoder import PlateDecoder
+from plate_detector import create_plate_detector
+from plate_preprocess import create_preprocessor
+from plate_quality import CropSelector
+from plate_utils import correct_plate_text, validate_plate_format
+from sampling_profiler import install as install_profiler, stage
 
 # MySQL Database Configuration
 DB_CONFIG = {
@@ -18,58 +25,31 @@ DB_CONFIG = {
     "database": "smart_parking",
 }
 
-# Function to validate the format of the detected plate
-def validate_plate_format(text):
-    """Validate the format of the detected plate."""
-    if len(text) != 10:
-        return False
-    return (text[0].isalpha() and text[1].isalpha() and
-            text[2].isdigit() and text[3].isdigit() and
-            text[4].isalpha() and text[5].isalpha() and
-            text[6].isdigit() and text[7].isdigit() and
-            text[8].isdigit() and text[9].isdigit())
-
-# Function to correct common misreads of characters
-def correct_character(char, position):
-    """Correct common misreads of characters."""
-    correction_map = {
-        0: {'0':'D', '1':'D', '4':'A', '7':'D', '8':'B'},
-        1: {'0':'L', '1':'I', '2':'Z', '4':'A', '5':'S', '7':'Z', '8':'B'},
-        2: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
-        3: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
-        4: {'0':'D', '1':'I', '2':'Z', '4':'A', '5':'S', '7':'Z', '8':'B'},
-        5: {'0':'D', '1':'I', '2':'Z', '4':'A', '5':'S', '7':'Z', '8':'B'},
-        6: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
-        7: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
-        8: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
-        9: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'}
-    }
-    return correction_map[position].get(char, char)
-
-# Function to apply corrections to the entire plate text
-def correct_plate_text(text):
-    """Apply character corrections to the plate text based on position."""
-    if len(text) != 10:
-        return text
-    
-    corrected_text = ""
-    for i, char in enumerate(text):
-        corrected_text += correct_character(char, i)
-    
-    return corrected_text
-
-# Function to preprocess plate for better OCR
-def preprocess_plate(plate):
-    if plate is None or plate.size == 0:
-        return None
-
-    gray = cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY)  
-    blurred = cv2.GaussianBlur(gray, (3, 3), 0)  
-    enhanced = cv2.equalizeHist(blurred)  
-    return enhanced
+# Built by setup() from main(), so importing this module loads no cascade and opens no files
+plate_detector = None   # Haar cascade unless PLATE_DETECTOR selects another backend
+evidence = None         # frames and crops behind each decision, encoded on a background thread
+journal = None          # local gate event journal; a background thread writes it to MySQL
+exit_matcher = None     # active plates kept in memory; OCR reads are matched against them
+
+# Function to build the detector, evidence store and journal this gate uses
+def setup():
+    global plate_detector, evidence, journal, exit_matcher
+    if journal is not None:
+        return
+    plate_detector = create_plate_detector(scale_factor=1.1, min_neighbors=5, min_size=(100, 50))
+    evidence = EvidenceStore()
+    journal = GateJournal(db_config=DB_CONFIG, on_applied=evidence.link)
+    exit_matcher = ExitMatcher(DB_CONFIG, journal)
+
+# Preprocessing pipeline for better OCR (gray -> blur -> equalize unless PLATE_PREPROCESS overrides)
+plate_preprocessor = create_preprocessor("equalize")
 
 # Function to check if a vehicle is parked and get slot number
 def get_parked_vehicle_slot(vehicle_number):
+    # Events still in the journal are newer than anything in MySQL
+    known, slot = journal.pending_vehicle_slot(vehicle_number)
+    if known:
+        return slot
     try:
         connection = mysql.connector.connect(**DB_CONFIG)
         cursor = connection.cursor(buffered=True)
@@ -77,8 +57,8 @@ def get_parked_vehicle_slot(vehicle_number):
         print(f"🔍 Checking parking status for: {vehicle_number}")
         
         cursor.execute(
-            "SELECT slot_number FROM SmartParking WHERE vehicle_number = %s AND exit_time IS NULL",
-            (vehicle_number,)
+            "SELECT slot_number FROM SmartParking WHERE lot_id = %s AND vehicle_number = %s AND exit_time IS NULL",
+            (LOT_ID, vehicle_number)
         )
         result = cursor.fetchone()
         
@@ -96,122 +76,172 @@ def get_parked_vehicle_slot(vehicle_number):
         cursor.close()
         connection.close()
 
-# Function to completely remove a vehicle from the database
-def remove_from_database(vehicle_number):
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        cursor = connection.cursor()
-        
-        print(f"🛠 Removing vehicle: {vehicle_number} from the database.")
-        
-        # DELETE the vehicle record from the database
-        cursor.execute(
-            "DELETE FROM SmartParking WHERE vehicle_number = %s AND exit_time IS NULL",
-            (vehicle_number,)
-        )
-        connection.commit()
+# Function to price the stay being closed; the matcher's active set already holds its entry time
+def quote_fee(vehicle_number, exit_time):
+    stay = exit_matcher.stay(vehicle_number)
+    if stay is None:
+        print(f"⚠️ No entry time cached for {vehicle_number}; fee will be settled from history.")
+        return None
+    entry_time, is_ev = stay
+    fee = TARIFF.price(entry_time, exit_time, is_ev)
+    print(f"💰 Parking fee for {vehicle_number}: ₹{fee:.2f} (parked since {entry_time:%Y-%m-%d %H:%M})")
+    return fee
 
-        # Check if any row was deleted
-        if cursor.rowcount > 0:
-            print(f"✅ Vehicle {vehicle_number} has exited and record removed from database.")
+# Function to record an exit; the journal writer moves the stay to SmartParkingHistory in the background
+def remove_from_database(vehicle_number):
+    exit_time = datetime.now()
+    quote_fee(vehicle_number, exit_time)
+    print(f"🛠 Archiving vehicle: {vehicle_number} to parking history.")
+    # The journal's unflushed events overlay the matcher's active set, as in get_parked_vehicle_slot
+    known, slot = journal.pending_vehicle_slot(vehicle_number)
+    parked = slot is not None if known else vehicle_number in exit_matcher.active
+    event_id = journal.record_exit(vehicle_number, exit_time)
+    if parked:
+        print(f"✅ Vehicle {vehicle_number} has exited; archive queued in the gate journal.")
+    else:
+        print(f"⚠️ No active parking record found for {vehicle_number}. Check OCR result or database records.")
+    return event_id
+
+def main():
+    install_profiler()  # kill -USR2 <pid> records a profile without restarting the gate
+    setup()
+
+    # Load the OCR model while the camera opens, then warm it up
+    reader, cap, startup_timer = start_gate(0, 1920, 1080)
+    plate_decoder = PlateDecoder(reader)  # grammar-constrained decoding of the recognizer output
+    reader = CachedReader(reader)  # repeated identical crops skip the readtext fallback (the decoder is not cached)
+    journal.start()
+    evidence.start()
+    exit_matcher.refresh()  # load the active plates before the car reaches the camera
+
+    plate_texts = []
+    corrected_texts = []
+    exit_match = None
+    captured_images = 0
+    max_images = 5  
+
+    # Keep only the best-scoring crops; the rest never reach easyocr
+    crop_selector = CropSelector()
+
+    # Local window, or headless with an optional MJPEG preview (GATE_HEADLESS, GATE_PREVIEW_PORT)
+    view = GateView("Number Plate Detection")
+
+    while captured_images < max_images:
+        with stage("capture"):
+            ret, frame = cap.read()
+        if not ret or frame is None or frame.size == 0:
+            print("⚠️ Error: Could not read frame from camera.")
+            continue  
+
+        with stage("cascade"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            plates = plate_detector.detect(frame, gray)
+
+        if len(plates) > 0:
+            for x, y, w, h in plates:
+                score = crop_selector.offer(frame[y:y+h, x:x+w], gray[y:y+h, x:x+w], frame=frame)
+                view.box(x, y, w, h)
+                view.text(f"Quality: {score:.2f}", x, y - 20)
+
+            x, y, w, h = plates[0]
+            view.text(f"Capturing {captured_images+1}/{max_images}", x, y - 60, 0.8, BLUE)
+
+            captured_images += 1
+            time.sleep(0.25)  
+
+        if view.show(frame):
+            break
+
+    print(f"📷 {crop_selector.seen} crops scored, {crop_selector.dropped} dropped before OCR")
+
+    # OCR only the top-K crops
+    for score, plate, _ in crop_selector.best():
+        with stage("ocr"):
+            # Preprocess plate before OCR
+            processed_plate = plate_preprocessor.process(plate)
+
+            # Decode the most probable plate-grammar string straight from the recognizer
+            decoded_text, confidence = plate_decoder.read(processed_plate)
+        if decoded_text:
+            print(f"🔤 Decoded: {decoded_text} | Confidence: {confidence:.2f} | Quality: {score:.2f}")
+            plate_texts.append(decoded_text)
         else:
-            print(f"⚠️ No active parking record found for {vehicle_number}. Check OCR result or database records.")
-
-    except mysql.connector.Error as err:
-        print(f"❌ Database error: {err}")
-    finally:
-        cursor.close()
-        connection.close()
-
-# Open webcam
-cap = cv2.VideoCapture(0)
-cap.set(3, 1920)  
-cap.set(4, 1080)  
-
-time.sleep(2)  
-
-plate_texts = []
-corrected_texts = []
-captured_images = 0
-max_images = 5  
-
-while captured_images < max_images:
-    ret, frame = cap.read()
-    if not ret or frame is None or frame.size == 0:
-        print("⚠️ Error: Could not read frame from camera.")
-        continue  
-
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    plates = plate_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(100, 50))
+            # Fall back to easyocr's own detection for crops the grammar can't decode (e.g. two-line plates)
+            with stage("ocr"):
+                result = reader.readtext(processed_plate, detail=0, allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+
+            if result:
+                best_text = max(result, key=len).upper()  
+
+                # Apply character correction if text length matches expected format
+                if len(best_text) == 10:
+                    corrected_text = correct_plate_text(best_text)
+                    corrected_texts.append(corrected_text)
+                    print(f"🔤 Original: {best_text} | Corrected: {corrected_text} | Quality: {score:.2f}")
+
+                    # Only add to plates list if format is valid
+                    if validate_plate_format(corrected_text):
+                        plate_texts.append(corrected_text)
+                else:
+                    # Still collect the original text for review
+                    plate_texts.append(best_text)
+
+        # The exiting car has to be one of the parked vehicles; stop once a read singles one out
+        with stage("match"):
+            exit_match = exit_matcher.match(plate_texts)
+        if exit_match and exit_match.accepted:
+            break
+
+    cache_stats = reader.stats()
+    print(f"🗂 OCR cache (readtext fallback only): {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+          f"(hit rate {cache_stats['hit_rate']:.0%})")
+
+    # Process the best detected plate
+    if exit_match and exit_match.accepted:
+        print(f"\n🚗 Matched parked vehicle: {exit_match.vehicle_number} "
+              f"(distance {exit_match.distance:.2f}, margin {exit_match.margin:.2f})")
+        print(f"🚗 {exit_match.vehicle_number} is parked in slot {exit_match.slot_number}. Archiving to history...")
+        event_id = remove_from_database(exit_match.vehicle_number)
+        evidence.submit_selection(event_id, "exit", exit_match.vehicle_number, crop_selector.best(), LOT_ID)
+        exit_matcher.remove(exit_match.vehicle_number)
+    elif plate_texts:
+        if exit_match:
+            print(f"\n⚠️ Ambiguous match: closest parked vehicle {exit_match.vehicle_number} "
+                  f"(distance {exit_match.distance:.2f}, margin {exit_match.margin:.2f})")
+
+        # Prioritize valid formatted plates if any
+        valid_plates = [text for text in plate_texts if validate_plate_format(text)]
+
+        if valid_plates:
+            final_plate_text = max(set(valid_plates), key=valid_plates.count)
+            print("\n🔍 Valid plate format detected!")
+        else:
+            # If no valid plates, use the most common detection
+            final_plate_text = max(set(plate_texts), key=plate_texts.count)
+            print("\n⚠️ No valid plate format detected. Using best guess.")
+
+        print("\n🚗 Final Detected Plate Number:", final_plate_text)
+
+        # Check if vehicle is currently parked
+        existing_slot = get_parked_vehicle_slot(final_plate_text)
+        if existing_slot:
+            print(f"🚗 {final_plate_text} is parked in slot {existing_slot}. Archiving to history...")
+            event_id = remove_from_database(final_plate_text)
+            evidence.submit_selection(event_id, "exit", final_plate_text, crop_selector.best(), LOT_ID)
+        else:
+            print(f"⚠️ No active parking record found for {final_plate_text}. Possible issues:\n"
+                  f"  - No matching record in database\n"
+                  f"  - Vehicle already exited")
+    else:
+        print("\n❌ No plate detected.")
 
-    if len(plates) > 0:
-        x, y, w, h = plates[0]  
-        plate = frame[y:y+h, x:x+w]
+    startup_timer.report_first_decision()
 
-        # Preprocess plate before OCR
-        processed_plate = preprocess_plate(plate)
+    cap.release()
+    view.close()
+    journal.stop()
+    evidence.stop()
 
-        # OCR for number plate text
-        result = reader.readtext(processed_plate, detail=0, allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
 
-        if result:
-            best_text = max(result, key=len).upper()  
-            
-            # Apply character correction if text length matches expected format
-            if len(best_text) == 10:
-                corrected_text = correct_plate_text(best_text)
-                corrected_texts.append(corrected_text)
-                
-                # Display both original and corrected text for debugging
-                cv2.putText(frame, f"Original: {best_text}", (x, y - 40), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                cv2.putText(frame, f"Corrected: {corrected_text}", (x, y - 20), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                
-                # Only add to plates list if format is valid
-                if validate_plate_format(corrected_text):
-                    plate_texts.append(corrected_text)
-            else:
-                # Still collect the original text for review
-                plate_texts.append(best_text)
-
-        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        cv2.putText(frame, f"Capturing {captured_images+1}/{max_images}", (x, y - 60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
-
-        captured_images += 1
-        time.sleep(0.25)  
-
-    cv2.imshow("Number Plate Detection", frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-# Process the best detected plate
-if plate_texts:
-    # Prioritize valid formatted plates if any
-    valid_plates = [text for text in plate_texts if validate_plate_format(text)]
-    
-    if valid_plates:
-        final_plate_text = max(set(valid_plates), key=valid_plates.count)
-        print("\n🔍 Valid plate format detected!")
-    else:
-        # If no valid plates, use the most common detection
-        final_plate_text = max(set(plate_texts), key=plate_texts.count)
-        print("\n⚠️ No valid plate format detected. Using best guess.")
-    
-    print("\n🚗 Final Detected Plate Number:", final_plate_text)
-
-    # Check if vehicle is currently parked
-    existing_slot = get_parked_vehicle_slot(final_plate_text)
-    if existing_slot:
-        print(f"🚗 {final_plate_text} is parked in slot {existing_slot}. Removing from database...")
-        remove_from_database(final_plate_text)
-    else:
-        print(f"⚠️ No active parking record found for {final_plate_text}. Possible issues:\n"
-              f"  - No matching record in database\n"
-              f"  - Vehicle already exited")
-else:
-    print("\n❌ No plate detected.")
-
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import time
+import mysql.connector
+from parking_lots import LOT_ID
+
+MATCHER_CONFIG = {
+    "max_distance": float(os.getenv("EXIT_MATCH_MAX_DISTANCE", "2.0")),  # weighted edits allowed for a match
+    "min_margin": float(os.getenv("EXIT_MATCH_MIN_MARGIN", "1.0")),      # lead over the runner-up to decide
+    "refresh_interval": float(os.getenv("EXIT_MATCH_REFRESH", "30")),    # seconds between MySQL reloads
+}
+
+# Look-alike characters OCR swaps on plates; substituting one for the other is cheap
+CONFUSABLE = (
+    "0O", "0D", "0Q", "OD", "OQ", "1I", "1L", "1T", "IL", "2Z", "7Z", "7T",
+    "5S", "8B", "6G", "4A", "3B", "MN", "UV", "HN", "KX", "CG", "EF", "PR",
+)
+CONFUSION_COST = 0.25
+SUBSTITUTION_COST = 1.0
+INDEL_COST = 1.0
+
+_CONFUSABLE_PAIRS = {frozenset(pair) for pair in CONFUSABLE}
+
+
+def substitution_cost(a, b):
+    if a == b:
+        return 0.0
+    return CONFUSION_COST if frozenset((a, b)) in _CONFUSABLE_PAIRS else SUBSTITUTION_COST
+
+
+# Function to compute a confusion-weighted edit distance between two plate strings
+def weighted_distance(a, b, limit=None):
+    """Levenshtein distance where look-alike substitutions cost CONFUSION_COST.
+
+    With `limit`, gives up early (returning a value above it) once every
+    alignment already costs more, which keeps a scan over hundreds of
+    active plates cheap.
+    """
+    if limit is not None and abs(len(a) - len(b)) * INDEL_COST > limit:
+        return limit + INDEL_COST
+    previous = [j * INDEL_COST for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, start=1):
+        current = [i * INDEL_COST]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + INDEL_COST,
+                current[j - 1] + INDEL_COST,
+                previous[j - 1] + substitution_cost(ca, cb),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + INDEL_COST
+        previous = current
+    return previous[-1]
+
+
+class ExitMatch:
+    """Best active stay for a set of OCR candidates."""
+
+    def __init__(self, vehicle_number, slot_number, distance, margin, accepted):
+        self.vehicle_number = vehicle_number
+        self.slot_number = slot_number
+        self.distance = distance
+        self.margin = margin
+        self.accepted = accepted
+
+    def __repr__(self):
+        return (f"ExitMatch({self.vehicle_number!r}, slot={self.slot_number!r}, "
+                f"distance={self.distance:.2f}, margin={self.margin:.2f}, accepted={self.accepted})")
+
+
+class ExitMatcher:
+    """Matches exit-gate OCR reads against the closed set of currently parked vehicles.
+
+    The active plates ({vehicle_number: slot_number}) of one lot are loaded
+    from SmartParking and overlaid with unflushed gate-journal events, then
+    reloaded every `refresh_interval` seconds. A read is accepted as soon
+    as its nearest plate is within `max_distance` and at least
+    `min_margin` closer than any other parked vehicle; a lone parked
+    vehicle must be within `max_distance - min_margin`.
+    """
+
+    def __init__(self, db_config, journal=None, max_distance=None, min_margin=None, refresh_interval=None,
+                 lot_id=None):
+        self.db_config = db_config
+        self.lot_id = lot_id or (journal.lot_id if journal is not None else LOT_ID)
+        self.journal = journal
+        self.max_distance = MATCHER_CONFIG["max_distance"] if max_distance is None else max_distance
+        self.min_margin = MATCHER_CONFIG["min_margin"] if min_margin is None else min_margin
+        self.refresh_interval = MATCHER_CONFIG["refresh_interval"] if refresh_interval is None else refresh_interval
+        self.active = {}
+        self.stays = {}  # vehicle_number -> (entry_time, is_ev), for pricing the exit
+        self.loaded_at = None
+
+    def refresh(self):
+        active, stays = {}, {}
+        try:
+            connection = mysql.connector.connect(**self.db_config)
+            cursor = connection.cursor()
+            cursor.execute("SELECT vehicle_number, slot_number, entry_time, is_ev FROM SmartParking "
+                           "WHERE lot_id = %s AND exit_time IS NULL", (self.lot_id,))
+            for vehicle_number, slot_number, entry_time, is_ev in cursor.fetchall():
+                active[vehicle_number] = slot_number
+                stays[vehicle_number] = (entry_time, bool(is_ev))
+            cursor.close()
+            connection.close()
+        except mysql.connector.Error as err:
+            print(f"❌ Database error while loading active stays: {err}")
+            if self.loaded_at is not None:
+                active, stays = dict(self.active), dict(self.stays)  # keep the last good set while MySQL is unreachable
+        if self.journal is not None:
+            # Events still in the journal are newer than anything in MySQL
+            for vehicle_number, stay in self.journal.pending_entries().items():
+                if stay:
+                    slot_number, is_ev, entry_time = stay
+                    active[vehicle_number] = slot_number
+                    stays[vehicle_number] = (entry_time, is_ev)
+                else:
+                    active.pop(vehicle_number, None)
+                    stays.pop(vehicle_number, None)
+        self.active = active
+        self.stays = stays
+        self.loaded_at = time.monotonic()
+        return len(active)
+
+    def _ensure_fresh(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.refresh_interval:
+            self.refresh()
+
+    def match(self, candidates):
+        """Score OCR candidate strings against every active plate; returns an ExitMatch or None."""
+        self._ensure_fresh()
+        candidates = [c.upper().replace(" ", "") for c in candidates if c]
+        if not candidates or not self.active:
+            return None
+
+        limit = self.max_distance + self.min_margin
+        scored = []
+        for vehicle_number in self.active:
+            distance = min(weighted_distance(c, vehicle_number, limit) for c in candidates)
+            scored.append((distance, vehicle_number))
+        scored.sort()
+
+        best_distance, best = scored[0]
+        # With a single parked vehicle there is nothing to beat, so the margin is measured against an
+        # unseen plate at max_distance: a lone candidate must be min_margin closer than that
+        runner_up = scored[1][0] if len(scored) > 1 else self.max_distance
+        margin = runner_up - best_distance
+        accepted = best_distance <= self.max_distance and margin >= self.min_margin
+        return ExitMatch(best, self.active[best], best_distance, margin, accepted)
+
+    def stay(self, vehicle_number):
+        """Return (entry_time, is_ev) for a parked vehicle, or None if it isn't in the active set."""
+        return self.stays.get(vehicle_number)
+
+    def remove(self, vehicle_number):
+        """Drop a vehicle once its exit is recorded, so it can't match again."""
+        self.active.pop(vehicle_number, None)
+        self.stays.pop(vehicle_number, None)
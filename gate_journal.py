@@ -0,0 +1,273 @@
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+import mysql.connector
+import occupancy_log
+from parking_archive import archive_vehicle_exit, migrate
+import parking_rollups
+from parking_lots import LOT_ID
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+# Local append-only journal of gate events
+JOURNAL_PATH = os.getenv("GATE_JOURNAL", "gate_journal.db")
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS gate_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,               -- 'entry' or 'exit'
+    vehicle_number TEXT NOT NULL,
+    is_ev INTEGER,
+    slot_number TEXT,
+    event_time TEXT NOT NULL,
+    flushed INTEGER NOT NULL DEFAULT 0,
+    lot_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_gate_events_pending ON gate_events (flushed, seq);
+"""
+
+EVENT_COLUMNS = "seq, event_id, kind, vehicle_number, is_ev, slot_number, event_time, flushed, lot_id"
+
+# Applied event ids live in MySQL so replaying the journal is idempotent
+APPLIED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS GateEventsApplied (
+    event_id CHAR(36) PRIMARY KEY,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+
+def _open_journal(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.executescript(JOURNAL_SCHEMA)
+    if "lot_id" not in {row[1] for row in conn.execute("PRAGMA table_info(gate_events)")}:
+        conn.execute("ALTER TABLE gate_events ADD COLUMN lot_id TEXT")  # journals written before multi-lot
+    return conn
+
+
+# Function to apply one journalled event inside an open MySQL transaction
+def apply_event(cursor, event):
+    """Returns the entry_id of the stay the event created or closed, or None if nothing was applied."""
+    _, event_id, kind, vehicle_number, is_ev, slot_number, event_time, _, lot_id = event
+    lot_id = lot_id or LOT_ID
+    cursor.execute("INSERT IGNORE INTO GateEventsApplied (event_id, applied_at) VALUES (%s, NOW())", (event_id,))
+    if cursor.rowcount == 0:
+        return None  # already applied by an earlier flush
+
+    if kind == "entry":
+        cursor.execute(
+            "INSERT INTO SmartParking (lot_id, vehicle_number, is_ev, slot_number, entry_time, exit_time) "
+            "VALUES (%s, %s, %s, %s, %s, NULL)",
+            (lot_id, vehicle_number, is_ev, slot_number, event_time),
+        )
+        entry_id = cursor.lastrowid
+        parking_rollups.record_entry(cursor, slot_number, event_time, lot_id)
+        occupancy_log.record_entry(cursor, entry_id, lot_id, slot_number, vehicle_number, is_ev, event_time)
+        return entry_id
+    if kind == "exit":
+        cursor.execute(
+            "SELECT entry_id FROM SmartParking WHERE lot_id = %s AND vehicle_number = %s AND exit_time IS NULL",
+            (lot_id, vehicle_number),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            print(f"⚠️ No active parking record found for {vehicle_number} in {lot_id}; exit event {event_id} skipped.")
+            return None
+        # Move the stay to SmartParkingHistory in this same transaction
+        archive_vehicle_exit(cursor, vehicle_number, event_time, lot_id)
+        return row[0]
+    return None
+
+
+class GateJournal:
+    """Durable local journal for gate events with a background MySQL writer.
+
+    record_entry/record_exit only append to a SQLite WAL file, so the gate
+    never waits on MySQL. A writer thread flushes pending events in batched
+    transactions; events stay in the journal until MySQL has committed them
+    and are replayed on the next start if the process dies first. Each
+    event carries the lot the gate belongs to. `on_applied(event_id, entry_id)`
+    is called from the writer thread once an event's MySQL row is committed.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, db_config=None, batch_size=100, flush_interval=0.5, lot_id=None,
+                 on_applied=None):
+        self.path = path
+        self.lot_id = lot_id or LOT_ID
+        self.db_config = db_config or DB_CONFIG
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_applied = on_applied
+        self._conn = _open_journal(path)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- gate side -------------------------------------------------------
+
+    def _append(self, kind, vehicle_number, is_ev, slot_number, event_time):
+        event_id = str(uuid.uuid4())
+        event_time = (event_time or datetime.now()).isoformat(sep=" ", timespec="seconds")
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO gate_events (event_id, kind, vehicle_number, is_ev, slot_number, event_time, lot_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (event_id, kind, vehicle_number, is_ev, slot_number, event_time, self.lot_id),
+            )
+        self._wake.set()
+        return event_id
+
+    def record_entry(self, vehicle_number, is_ev, slot_number, event_time=None):
+        return self._append("entry", vehicle_number, int(is_ev), slot_number, event_time)
+
+    def record_exit(self, vehicle_number, event_time=None):
+        return self._append("exit", vehicle_number, None, None, event_time)
+
+    def pending_entries(self):
+        """Replay unflushed events into {vehicle_number: (slot_number, is_ev, entry_time)} (None = exited)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, vehicle_number, slot_number, is_ev, event_time FROM gate_events "
+                "WHERE flushed = 0 AND COALESCE(lot_id, ?) = ? ORDER BY seq", (LOT_ID, self.lot_id)
+            ).fetchall()
+        stays = {}
+        for kind, vehicle_number, slot_number, is_ev, event_time in rows:
+            stays[vehicle_number] = (
+                (slot_number, bool(is_ev), datetime.fromisoformat(event_time)) if kind == "entry" else None
+            )
+        return stays
+
+    def pending_stays(self):
+        """Replay unflushed events into {vehicle_number: slot_number} (None = exited)."""
+        return {vehicle_number: stay[0] if stay else None for vehicle_number, stay in self.pending_entries().items()}
+
+    def pending_slots(self):
+        """Slots taken by entries that have not reached MySQL yet."""
+        return {slot for slot in self.pending_stays().values() if slot}
+
+    def pending_vehicle_slot(self, vehicle_number):
+        """Return (known, slot): known is True if the journal has an unflushed event for the vehicle."""
+        stays = self.pending_stays()
+        return vehicle_number in stays, stays.get(vehicle_number)
+
+    def prune(self, keep=10000):
+        """Drop all but the newest `keep` flushed events; pending events are never pruned."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM gate_events WHERE flushed = 1 AND seq <= "
+                "(SELECT COALESCE(MAX(seq), 0) FROM gate_events) - ?", (keep,)
+            )
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM gate_events WHERE flushed = 0").fetchone()[0]
+
+    # ---- writer side -----------------------------------------------------
+
+    def flush_once(self, journal=None):
+        """Flush one batch of pending events to MySQL. Returns the number flushed."""
+        journal = journal or self._conn
+        events = journal.execute(
+            f"SELECT {EVENT_COLUMNS} FROM gate_events WHERE flushed = 0 ORDER BY seq LIMIT ?", (self.batch_size,)
+        ).fetchall()
+        if not events:
+            return 0
+
+        applied = []
+        connection = mysql.connector.connect(**self.db_config)
+        try:
+            cursor = connection.cursor(buffered=True)
+            cursor.execute(APPLIED_SCHEMA)
+            connection.start_transaction()
+            for event in events:
+                entry_id = apply_event(cursor, event)
+                if entry_id:
+                    applied.append((event[1], entry_id))
+            connection.commit()
+            cursor.close()
+        except mysql.connector.Error:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+        journal.execute("UPDATE gate_events SET flushed = 1 WHERE seq <= ? AND flushed = 0", (events[-1][0],))
+        if self.on_applied:
+            for event_id, entry_id in applied:
+                self.on_applied(event_id, entry_id)
+        return len(events)
+
+    def _run(self):
+        journal = _open_journal(self.path)
+        backoff = self.flush_interval
+        migrated = False
+        while True:
+            try:
+                if not migrated:
+                    migrate(self.db_config)
+                    migrated = True
+                while self.flush_once(journal) == self.batch_size:
+                    pass
+                backoff = self.flush_interval
+            except mysql.connector.Error as err:
+                print(f"❌ Database error: {err} (events kept in journal, retrying in {backoff:.1f}s)")
+                backoff = min(backoff * 2, 30.0)
+            except sqlite3.Error as err:
+                # e.g. "database is locked" while the gate appends; an unmarked batch is replayed idempotently
+                print(f"❌ Journal error: {err} (retrying in {backoff:.1f}s)")
+                backoff = min(backoff * 2, 30.0)
+            except Exception as err:
+                # Never let the writer thread die silently: the gate would keep journalling with nothing flushed
+                print(f"❌ Gate journal writer error: {err!r} (retrying in {backoff:.1f}s)")
+                backoff = min(backoff * 2, 30.0)
+            if self._stop.is_set():
+                break
+            self._wake.wait(backoff)
+            self._wake.clear()
+        journal.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gate-journal-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Ask the writer to flush what it can and stop. Unflushed events stay journalled."""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.prune()
+        pending = self.pending_count()
+        if pending:
+            print(f"⚠️ {pending} gate event(s) still pending in {self.path}; they will be replayed on next start.")
+
+
+if __name__ == "__main__":
+    # Standalone replay: push every pending journal event to MySQL, then exit
+    journal = GateJournal()
+    total = 0
+    try:
+        migrate(journal.db_config)
+        while True:
+            flushed = journal.flush_once()
+            total += flushed
+            if flushed < journal.batch_size:
+                break
+        print(f"✅ Replayed {total} gate event(s) from {journal.path}")
+    except mysql.connector.Error as err:
+        print(f"❌ Database error: {err}")
@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+
+PREVIEW_CONFIG = {
+    "headless": os.getenv("GATE_HEADLESS", "0") != "0",       # no window, no drawing on the capture loop
+    "port": int(os.getenv("GATE_PREVIEW_PORT", "0")),         # MJPEG preview server; 0 = off
+    "fps": float(os.getenv("GATE_PREVIEW_FPS", "5")),         # preview frames per second, at most
+    "width": int(os.getenv("GATE_PREVIEW_WIDTH", "640")),     # preview frames are downscaled to this width
+    "jpeg_quality": int(os.getenv("GATE_PREVIEW_QUALITY", "70")),
+}
+
+BOUNDARY = "gateframe"
+GREEN = (0, 255, 0)
+BLUE = (255, 0, 0)
+
+PREVIEW_PAGE = b"""<!DOCTYPE html>
+<html><head><title>Gate preview</title></head>
+<body style="margin:0;background:#111"><img src="/stream.mjpg" style="width:100%"></body></html>
+"""
+
+
+def draw(frame, annotations, scale=1.0):
+    """Draw queued ("box", (x, y, w, h), color) / ("text", text, (x, y), size, color) items on `frame`."""
+    for item in annotations:
+        if item[0] == "box":
+            x, y, w, h = (int(v * scale) for v in item[1])
+            cv2.rectangle(frame, (x, y), (x + w, y + h), item[2], 2)
+        else:
+            _, text, (x, y), size, color = item
+            cv2.putText(frame, text, (int(x * scale), int(y * scale)), cv2.FONT_HERSHEY_SIMPLEX,
+                        size * max(scale, 0.4), color, 2)
+    return frame
+
+
+class MjpegPreview:
+    """Renders annotated, downscaled preview frames on its own thread and serves them as MJPEG.
+
+    offer() only swaps a reference into a one-frame slot, at most `fps`
+    times a second and only while a client is watching; resizing,
+    drawing and JPEG encoding happen on the render thread.
+    """
+
+    def __init__(self, port, fps=None, width=None, jpeg_quality=None):
+        self.interval = 1.0 / (fps or PREVIEW_CONFIG["fps"])
+        self.width = width or PREVIEW_CONFIG["width"]
+        self.jpeg_quality = jpeg_quality or PREVIEW_CONFIG["jpeg_quality"]
+        self.clients = 0
+        self._pending = None
+        self._jpeg = None
+        self._sequence = 0
+        self._offered_at = 0.0
+        self._running = True
+        self._frame_ready = threading.Event()
+        self._jpeg_ready = threading.Condition()
+        self._renderer = threading.Thread(target=self._render, name="preview-render", daemon=True)
+        self._renderer.start()
+        self._server = ThreadingHTTPServer(("0.0.0.0", port), self._handler())
+        self._server.daemon_threads = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="preview-http", daemon=True)
+        self._server_thread.start()
+        print(f"📺 Gate preview on http://localhost:{port}/ ({1 / self.interval:.0f} fps max)")
+
+    def offer(self, frame, annotations):
+        now = time.monotonic()
+        if not self.clients or now - self._offered_at < self.interval:
+            return False
+        self._offered_at = now
+        self._pending = (frame, list(annotations))
+        self._frame_ready.set()
+        return True
+
+    def _render(self):
+        while self._running:
+            self._frame_ready.wait()
+            self._frame_ready.clear()
+            pending, self._pending = self._pending, None
+            if pending is None:
+                continue
+            frame, annotations = pending
+            scale = min(1.0, self.width / frame.shape[1])
+            small = cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale)),
+                               interpolation=cv2.INTER_AREA) if scale < 1.0 else frame.copy()
+            draw(small, annotations, scale)
+            ok, encoded = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if ok:
+                with self._jpeg_ready:
+                    self._jpeg = encoded.tobytes()
+                    self._sequence += 1
+                    self._jpeg_ready.notify_all()
+
+    def _next_jpeg(self, seen, timeout=5.0):
+        with self._jpeg_ready:
+            self._jpeg_ready.wait_for(lambda: self._sequence != seen or not self._running, timeout)
+            return self._sequence, self._jpeg
+
+    def _handler(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/":
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(PREVIEW_PAGE)))
+                    self.end_headers()
+                    self.wfile.write(PREVIEW_PAGE)
+                    return
+                if self.path != "/stream.mjpg":
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                preview.clients += 1
+                seen = 0
+                try:
+                    while preview._running:
+                        sequence, jpeg = preview._next_jpeg(seen)
+                        if jpeg is None or sequence == seen:
+                            continue  # gate idle; keep waiting
+                        seen = sequence
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    preview.clients -= 1
+
+        return Handler
+
+    def close(self):
+        self._running = False
+        self._frame_ready.set()
+        with self._jpeg_ready:
+            self._jpeg_ready.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class GateView:
+    """What a gate loop shows per frame: a local window, an MJPEG preview, or nothing.
+
+    The loop queues boxes and labels with box()/text() and calls show()
+    once per frame. In headless mode nothing is drawn on the capture
+    thread and there is no imshow/waitKey; annotations are only kept when
+    a preview client is connected.
+    """
+
+    def __init__(self, title="Number Plate Detection", headless=None, preview_port=None):
+        self.title = title
+        self.headless = PREVIEW_CONFIG["headless"] if headless is None else headless
+        port = PREVIEW_CONFIG["port"] if preview_port is None else preview_port
+        self.preview = MjpegPreview(port) if port else None
+        self._annotations = []
+
+    @property
+    def annotating(self):
+        return not self.headless or (self.preview is not None and self.preview.clients > 0)
+
+    def box(self, x, y, w, h, color=GREEN):
+        if self.annotating:
+            self._annotations.append(("box", (x, y, w, h), color))
+
+    def text(self, text, x, y, size=0.7, color=GREEN):
+        if self.annotating:
+            self._annotations.append(("text", text, (x, y), size, color))
+
+    def show(self, frame):
+        """Publish the frame with its annotations. Returns True when the operator pressed 'q'."""
+        annotations, self._annotations = self._annotations, []
+        if self.headless:
+            if self.preview is not None:
+                self.preview.offer(frame, annotations)
+            return False
+        draw(frame, annotations)
+        if self.preview is not None:
+            self.preview.offer(frame, [])  # already drawn for the window
+        cv2.imshow(self.title, frame)
+        return cv2.waitKey(1) & 0xFF == ord('q')
+
+    def close(self):
+        if self.preview is not None:
+            self.preview.close()
+        if not self.headless:
+            cv2.destroyAllWindows()
@@ -0,0 +1,94 @@
+import time
+
+# Taken as early as possible: gate scripts import this module first
+PROCESS_START = time.perf_counter()
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from camera_capture import open_capture
+from ocr_recognizer import configure_recognizer, reader_kwargs
+
+STARTUP_CONFIG = {
+    "warmup_text": "KA01AB1234",
+    "camera_timeout": float(os.getenv("CAMERA_TIMEOUT", "5.0")),  # seconds to wait for a first frame
+    "warmup": os.getenv("OCR_WARMUP", "1") != "0",
+}
+
+
+class StartupTimer:
+    """Records startup milestones relative to process start."""
+
+    def __init__(self):
+        self.marks = {}
+        self._first_decision_reported = False
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter() - PROCESS_START
+        return self.marks[name]
+
+    def report_first_decision(self):
+        """Print time-to-first-decision once, with the startup milestones that led to it."""
+        if self._first_decision_reported:
+            return
+        self._first_decision_reported = True
+        self.mark("first_decision")
+        milestones = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.marks.items())
+        print(f"⏱ Startup: {milestones}")
+
+
+# Function to construct the easyocr reader; easyocr/torch are only imported here
+def load_reader(languages=("en",), recognizer=None, **kwargs):
+    """`recognizer` picks the recognition backend (OCR_RECOGNIZER: fp32, torch, onnx, onnx-int8)."""
+    import easyocr
+    reader = easyocr.Reader(list(languages), **{**reader_kwargs(recognizer), **kwargs})
+    reader.recognizer_mode = configure_recognizer(reader, recognizer)  # the backend actually in use
+    return reader
+
+
+def make_warmup_image(text=None):
+    """Synthetic 64 px high plate so the first real readtext doesn't pay warm-up costs."""
+    image = np.full((64, 256), 255, np.uint8)
+    cv2.putText(image, text or STARTUP_CONFIG["warmup_text"], (6, 46),
+                cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    return image
+
+
+def _load_and_warm(timer, languages, reader_kwargs, warmup):
+    reader = load_reader(languages, **reader_kwargs)
+    timer.mark("model_loaded")
+    if warmup:
+        reader.readtext(make_warmup_image(), detail=0, allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+        timer.mark("model_warm")
+    return reader
+
+
+# Function to open the camera and wait for a real frame instead of a blind sleep
+def open_camera(index=0, width=1920, height=1080, timeout=None, fps=None):
+    timeout = STARTUP_CONFIG["camera_timeout"] if timeout is None else timeout
+    cap = open_capture(index, width, height, fps)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ret, frame = cap.read()
+        if ret and frame is not None and frame.size > 0:
+            return cap
+        time.sleep(0.05)
+    print("⚠️ Camera did not deliver a frame during startup; continuing anyway.")
+    return cap
+
+
+# Function to load the OCR model in parallel with opening the camera
+def start_gate(camera_index=0, width=1920, height=1080, languages=("en",), warmup=None, fps=None, **reader_kwargs):
+    """Return (reader, cap, timer) once both the model and the camera are ready."""
+    timer = StartupTimer()
+    timer.mark("imports")
+    warmup = STARTUP_CONFIG["warmup"] if warmup is None else warmup
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-loader") as pool:
+        future = pool.submit(_load_and_warm, timer, languages, reader_kwargs, warmup)
+        cap = open_camera(camera_index, width, height, fps=fps)
+        timer.mark("camera_ready")
+        reader = future.result()
+    return reader, cap, timer
@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+import mysql.connector
+from parking_lots import LOT_ID, LOTS, lot_slots, resolve_lot
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+LOG_CONFIG = {
+    "snapshot_interval": float(os.getenv("OCCUPANCY_SNAPSHOT_SECONDS", "3600")),  # one snapshot per lot per interval
+    "settle": float(os.getenv("OCCUPANCY_SNAPSHOT_SETTLE", "300")),  # leave room for late gate journal flushes
+}
+
+# Append-only: rows are only ever inserted, in the same transaction as the stay change they describe
+EVENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS OccupancyEvents (
+    event_seq BIGINT NOT NULL AUTO_INCREMENT,
+    lot_id VARCHAR(32) NOT NULL DEFAULT 'main',
+    event_time DATETIME NOT NULL,
+    kind ENUM('entry', 'exit') NOT NULL,
+    entry_id INT NOT NULL,
+    slot_number VARCHAR(10) NOT NULL,
+    vehicle_number VARCHAR(20) NOT NULL,
+    is_ev TINYINT(1) NOT NULL DEFAULT 0,
+    PRIMARY KEY (event_seq),
+    KEY idx_events_lot_time (lot_id, event_time, event_seq),
+    KEY idx_events_entry (entry_id, kind)
+)
+"""
+
+# Lot state at snapshot_time: the stays parked then, as JSON [[entry_id, slot, vehicle, is_ev, entry_time], ...]
+SNAPSHOTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS OccupancySnapshots (
+    lot_id VARCHAR(32) NOT NULL,
+    snapshot_time DATETIME NOT NULL,
+    stays MEDIUMTEXT NOT NULL,
+    PRIMARY KEY (lot_id, snapshot_time)
+)
+"""
+
+EVENT_COLUMNS = "lot_id, event_time, kind, entry_id, slot_number, vehicle_number, is_ev"
+
+ENTRY_EVENT_SQL = f"INSERT INTO OccupancyEvents ({EVENT_COLUMNS}) VALUES (%s, %s, 'entry', %s, %s, %s, %s)"
+
+# A snapshot at or after an event's time no longer matches the log once that event lands
+INVALIDATE_SQL = "DELETE FROM OccupancySnapshots WHERE lot_id = %s AND snapshot_time >= %s"
+
+SNAPSHOT_AT_SQL = (
+    "SELECT snapshot_time, stays FROM OccupancySnapshots "
+    "WHERE lot_id = %s AND snapshot_time <= %s ORDER BY snapshot_time DESC LIMIT 1"
+)
+
+EVENTS_BETWEEN_SQL = (
+    "SELECT kind, entry_id, slot_number, vehicle_number, is_ev, event_time FROM OccupancyEvents "
+    "WHERE lot_id = %s AND event_time > %s AND event_time <= %s ORDER BY event_time, event_seq"
+)
+
+# Lower bound for replays with no snapshot before them (MySQL's smallest DATETIME)
+LOG_START = datetime(1000, 1, 1)
+
+
+def exit_events_sql(count):
+    """Logs exits for `count` stays, copied from SmartParking before the rows are moved or deleted."""
+    placeholders = ", ".join(["%s"] * count)
+    return (f"INSERT INTO OccupancyEvents ({EVENT_COLUMNS}) "
+            f"SELECT lot_id, %s, 'exit', entry_id, slot_number, vehicle_number, is_ev "
+            f"FROM SmartParking WHERE lot_id = %s AND entry_id IN ({placeholders})")
+
+
+def entry_statements(entry_id, lot_id, slot_number, vehicle_number, is_ev, event_time):
+    """(sql, params) pairs logging one entry; the async API runs these on its own cursor."""
+    lot_id = lot_id or LOT_ID
+    return [
+        (ENTRY_EVENT_SQL, (lot_id, event_time, entry_id, slot_number, vehicle_number, bool(is_ev))),
+        (INVALIDATE_SQL, (lot_id, event_time)),
+    ]
+
+
+def exit_statements(lot_id, entry_ids, event_time):
+    """(sql, params) pairs logging the exit of active stays; run them before the stays leave SmartParking."""
+    lot_id = lot_id or LOT_ID
+    if not entry_ids:
+        return []
+    return [
+        (exit_events_sql(len(entry_ids)), (event_time, lot_id, *entry_ids)),
+        (INVALIDATE_SQL, (lot_id, event_time)),
+    ]
+
+
+# Function to log an entry inside the caller's transaction
+def record_entry(cursor, entry_id, lot_id, slot_number, vehicle_number, is_ev, event_time):
+    for sql, params in entry_statements(entry_id, lot_id, slot_number, vehicle_number, is_ev, event_time):
+        cursor.execute(sql, params)
+
+
+# Function to log exits inside the caller's transaction
+def record_exits(cursor, lot_id, entry_ids, event_time):
+    for sql, params in exit_statements(lot_id, entry_ids, event_time):
+        cursor.execute(sql, params)
+
+
+def _value(row, key, index):
+    return row[key] if isinstance(row, dict) else row[index]
+
+
+def _stay_json(entry_id, slot_number, vehicle_number, is_ev, entry_time):
+    return [entry_id, slot_number, vehicle_number, bool(is_ev),
+            entry_time.isoformat(sep=" ") if isinstance(entry_time, datetime) else entry_time]
+
+
+def apply_events(state, events):
+    """Advance {entry_id: stay} by event rows (dicts or tuples in EVENTS_BETWEEN_SQL order)."""
+    for event in events:
+        entry_id = _value(event, "entry_id", 1)
+        if _value(event, "kind", 0) == "entry":
+            state[entry_id] = _stay_json(entry_id, _value(event, "slot_number", 2), _value(event, "vehicle_number", 3),
+                                         _value(event, "is_ev", 4), _value(event, "event_time", 5))
+        else:
+            state.pop(entry_id, None)
+    return state
+
+
+def replay(snapshot_row, events):
+    """Lot state from the nearest snapshot row (or nothing) plus the events after it."""
+    state = {}
+    if snapshot_row:
+        state = {stay[0]: stay for stay in json.loads(_value(snapshot_row, "stays", 1))}
+    return apply_events(state, events)
+
+
+def occupancy_payload(lot_id, moment, snapshot_row, events, slot=None):
+    """JSON body for a point-in-time query: every slot of the lot (or just `slot`) and who was in it."""
+    state = replay(snapshot_row, events)
+    slots = {name: None for name in ([slot] if slot else lot_slots(lot_id))}
+    for entry_id, slot_number, vehicle_number, is_ev, entry_time in sorted(state.values(), key=lambda s: s[4]):
+        if slot is None or slot_number == slot:
+            slots[slot_number] = {"entry_id": entry_id, "vehicle_number": vehicle_number,
+                                  "is_ev": is_ev, "entry_time": entry_time}
+    snapshot_time = _value(snapshot_row, "snapshot_time", 0) if snapshot_row else None
+    return {
+        "lot_id": lot_id,
+        "at": moment.isoformat(sep=" "),
+        "snapshot_time": snapshot_time.isoformat(sep=" ") if snapshot_time else None,
+        "events_replayed": len(events),
+        "occupied": sum(1 for stay in slots.values() if stay),
+        "slots": slots,
+    }
+
+
+def parse_moment(value):
+    """ISO timestamp for ?at=; raises ValueError."""
+    if not value:
+        raise ValueError("at is required")
+    return datetime.fromisoformat(value.replace("T", " ")).replace(microsecond=0)
+
+
+def validate_slot(lot_id, slot):
+    if slot and slot not in lot_slots(lot_id):
+        raise ValueError(f"Unknown slot {slot} in lot {lot_id}")
+    return slot
+
+
+# Function to rebuild a lot's state at any instant from the nearest snapshot
+def occupancy_at(cursor, lot_id, moment, slot=None):
+    """`cursor` must be a dictionary cursor. Only events after the nearest earlier snapshot are replayed."""
+    lot_id = resolve_lot(lot_id)
+    validate_slot(lot_id, slot)
+    cursor.execute(SNAPSHOT_AT_SQL, (lot_id, moment))
+    snapshot_row = cursor.fetchone()
+    since = snapshot_row["snapshot_time"] if snapshot_row else LOG_START
+    cursor.execute(EVENTS_BETWEEN_SQL, (lot_id, since, moment))
+    return occupancy_payload(lot_id, moment, snapshot_row, cursor.fetchall(), slot)
+
+
+# Function to create the log tables; every entry/exit writer needs them, so parking_archive.migrate() runs this
+def ensure_schema(cursor):
+    cursor.execute(EVENTS_SCHEMA)
+    cursor.execute(SNAPSHOTS_SCHEMA)
+
+
+def _boundary_after(moment, interval):
+    seconds = (moment - datetime(2000, 1, 1)).total_seconds()
+    return datetime(2000, 1, 1) + timedelta(seconds=(seconds // interval + 1) * interval)
+
+
+# Function to write the missing snapshots of one lot up to `until`
+def snapshot_lot(connection, lot_id, until, interval=None):
+    """Chains from the lot's latest snapshot, replaying only the events since it. Returns snapshots written."""
+    interval = interval or LOG_CONFIG["snapshot_interval"]
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT COALESCE(MAX(event_seq), 0) AS seq FROM OccupancyEvents")
+    seen_seq = cursor.fetchone()["seq"]
+    cursor.execute(SNAPSHOT_AT_SQL, (lot_id, until))
+    snapshot_row = cursor.fetchone()
+    if snapshot_row:
+        start = snapshot_row["snapshot_time"]
+    else:
+        cursor.execute("SELECT MIN(event_time) AS first FROM OccupancyEvents WHERE lot_id = %s", (lot_id,))
+        start = cursor.fetchone()["first"]
+        if start is None:
+            cursor.close()
+            return 0
+        start -= timedelta(seconds=1)
+    cursor.execute(EVENTS_BETWEEN_SQL, (lot_id, start, until))
+    events = cursor.fetchall()
+    connection.commit()  # end the read view so the late-event check below sees new commits
+
+    state = replay(snapshot_row, [])
+    rows, boundary, i = [], _boundary_after(start, interval), 0
+    while boundary <= until:
+        while i < len(events) and events[i]["event_time"] <= boundary:
+            apply_events(state, [events[i]])
+            i += 1
+        rows.append((lot_id, boundary, json.dumps(sorted(state.values()))))
+        boundary += timedelta(seconds=interval)
+
+    # An event for this window that committed while we replayed makes these snapshots stale; retry next run
+    cursor.execute("SELECT COUNT(*) AS late FROM OccupancyEvents WHERE event_seq > %s AND lot_id = %s "
+                   "AND event_time <= %s", (seen_seq, lot_id, until))
+    if rows and cursor.fetchone()["late"] == 0:
+        cursor.executemany("INSERT IGNORE INTO OccupancySnapshots (lot_id, snapshot_time, stays) "
+                           "VALUES (%s, %s, %s)", rows)
+        connection.commit()
+    else:
+        connection.rollback()
+        rows = []
+    cursor.close()
+    return len(rows)
+
+
+def take_snapshots(connection, lots=None, until=None):
+    until = until or datetime.now() - timedelta(seconds=LOG_CONFIG["settle"])
+    cursor = connection.cursor()
+    ensure_schema(cursor)
+    cursor.close()
+    return {lot_id: snapshot_lot(connection, lot_id, until) for lot_id in lots or LOTS}
+
+
+# Function to seed the log from SmartParkingHistory and SmartParking for stays it has never seen
+def backfill(connection):
+    """Appends the missing entry/exit events (the log stays append-only), then drops snapshots to rebuild."""
+    cursor = connection.cursor()
+    ensure_schema(cursor)
+    connection.start_transaction()
+    missing_entry = ("NOT EXISTS (SELECT 1 FROM OccupancyEvents e "
+                     "WHERE e.entry_id = s.entry_id AND e.kind = '{kind}')")
+    cursor.execute(
+        f"INSERT INTO OccupancyEvents ({EVENT_COLUMNS}) "
+        f"SELECT lot_id, entry_time, 'entry', entry_id, slot_number, vehicle_number, is_ev "
+        f"FROM SmartParkingHistory s WHERE {missing_entry.format(kind='entry')} "
+        f"UNION ALL "
+        f"SELECT lot_id, entry_time, 'entry', entry_id, slot_number, vehicle_number, is_ev "
+        f"FROM SmartParking s WHERE {missing_entry.format(kind='entry')} "
+        f"ORDER BY entry_time")
+    entries = cursor.rowcount
+    cursor.execute(
+        f"INSERT INTO OccupancyEvents ({EVENT_COLUMNS}) "
+        f"SELECT lot_id, exit_time, 'exit', entry_id, slot_number, vehicle_number, is_ev "
+        f"FROM SmartParkingHistory s WHERE {missing_entry.format(kind='exit')} ORDER BY exit_time")
+    exits = cursor.rowcount
+    if entries or exits:
+        cursor.execute("DELETE FROM OccupancySnapshots")
+    connection.commit()
+    cursor.close()
+    return entries, exits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Occupancy event log: snapshots and point-in-time queries.")
+    parser.add_argument("command", choices=["backfill", "snapshot", "at"])
+    parser.add_argument("moment", nargs="?", help="For 'at': YYYY-MM-DD HH:MM[:SS]")
+    parser.add_argument("--lot", help="Lot id (default: PARKING_LOT; 'snapshot' does every lot)")
+    parser.add_argument("--slot", help="For 'at': only this slot")
+    parser.add_argument("--loop", action="store_true", help="For 'snapshot': keep running every interval")
+    args = parser.parse_args()
+    try:
+        from parking_archive import migrate  # imports this module, so not at the top
+        migrate(DB_CONFIG)
+        connection = mysql.connector.connect(**DB_CONFIG)
+        if args.command == "backfill":
+            entries, exits = backfill(connection)
+            print(f"✅ Logged {entries} entries and {exits} exits from existing stays; run 'snapshot' next")
+        elif args.command == "snapshot":
+            while True:
+                written = take_snapshots(connection, [resolve_lot(args.lot)] if args.lot else None)
+                print(f"📸 Snapshots written: {', '.join(f'{lot} {n}' for lot, n in written.items()) or 'none'}")
+                if not args.loop:
+                    break
+                time.sleep(LOG_CONFIG["snapshot_interval"])
+        else:
+            cursor = connection.cursor(dictionary=True)
+            result = occupancy_at(cursor, args.lot, parse_moment(args.moment), args.slot)
+            print(f"🕰 {result['lot_id']} at {result['at']}: {result['occupied']} occupied "
+                  f"(snapshot {result['snapshot_time'] or 'none'}, {result['events_replayed']} events replayed)")
+            for slot, stay in result["slots"].items():
+                print(f"   {slot:<6} {stay['vehicle_number'] + ' since ' + stay['entry_time'] if stay else '-'}")
+        connection.close()
+    except ValueError as err:
+        print(f"❌ {err}")
+    except mysql.connector.Error as err:
+        print(f"❌ Database error: {err}")
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+import time
+import cv2
+import numpy as np
+
+OCR_CACHE_CONFIG = {
+    "max_entries": 256,   # bounded LRU size
+    "max_distance": 0,    # dHash bits (of 256) that may differ for a hit; 0 = identical hashes only
+    "near_age": 2.0,      # with max_distance > 0, inexact hits only match entries stored this recently
+    "max_age": 30.0,      # seconds before an entry expires (one vehicle at the barrier)
+}
+
+# A one-glyph change (0/8, 1/7, 3/8) moves the 32x8 dHash of a whole plate by as few as 3 bits, while
+# re-captures of the same plate usually differ by more, so no tolerance tells them apart and the cache
+# only reuses identical hashes. `python bench_plate_preprocess.py CORPUS --hash-distances` prints both
+# distributions for real crops before anyone raises max_distance.
+
+
+# Function to compute a difference hash of a plate crop
+def dhash(image, width=32, height=8):
+    """dHash over a (width+1) x height thumbnail, returned as a width*height bit int.
+
+    Plates are wide, so the default uses 32 columns (~3 per character) rather
+    than the usual 8 to keep different plates from colliding.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (width + 1, height), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class CachedReader:
+    """LRU cache in front of an easyocr.Reader's readtext, keyed by a dHash of the crop.
+
+    A crop whose hash (and readtext options) matches a cached one reuses
+    its result, e.g. a repeated frame while the camera image is static.
+    Re-captures of a moving vehicle hash differently and are read again.
+    `max_distance` > 0 also accepts hashes that differ by that many bits,
+    but only against entries stored within `near_age` seconds. Entries
+    unused for `max_age` seconds are evicted.
+    """
+
+    def __init__(self, reader, max_entries=None, max_distance=None, max_age=None, near_age=None):
+        self.reader = reader
+        self.max_entries = max_entries or OCR_CACHE_CONFIG["max_entries"]
+        self.max_distance = max_distance if max_distance is not None else OCR_CACHE_CONFIG["max_distance"]
+        self.max_age = max_age if max_age is not None else OCR_CACHE_CONFIG["max_age"]
+        self.near_age = near_age if near_age is not None else OCR_CACHE_CONFIG["near_age"]
+        self._cache = OrderedDict()  # (options, hash) -> (last_used, stored_at, result)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _expire(self, now):
+        # Entries are kept in last-used order, so expired ones sit at the front
+        while self._cache:
+            last_used = next(iter(self._cache.values()))[0]
+            if now - last_used <= self.max_age:
+                break
+            self._cache.popitem(last=False)
+
+    def _touch(self, entry_key, now):
+        _, stored_at, result = self._cache[entry_key]
+        self._cache[entry_key] = (now, stored_at, result)
+        self._cache.move_to_end(entry_key)
+        self.hits += 1
+        return result
+
+    def _lookup(self, options, key, now):
+        exact = (options, key)
+        if exact in self._cache:
+            return self._touch(exact, now)
+
+        for (cached_options, cached_key), (_, stored_at, _) in reversed(self._cache.items()):
+            if now - stored_at > self.near_age:
+                continue
+            if cached_options == options and (cached_key ^ key).bit_count() <= self.max_distance:
+                self.near_hits += 1
+                return self._touch((cached_options, cached_key), now)
+        return None
+
+    def readtext(self, image, **kwargs):
+        """Drop-in replacement for easyocr.Reader.readtext."""
+        if image is None or image.size == 0:
+            return self.reader.readtext(image, **kwargs)
+
+        now = time.monotonic()
+        self._expire(now)
+
+        options = tuple(sorted(kwargs.items()))
+        key = dhash(image)
+        result = self._lookup(options, key, now)
+        if result is not None:
+            return result
+
+        self.misses += 1
+        result = self.reader.readtext(image, **kwargs)
+        self._cache[(options, key)] = (now, now, result)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._cache.clear()
+
+    def __getattr__(self, name):
+        # Anything else (detect, recognize, ...) goes straight to the wrapped reader
+        return getattr(self.reader, name)
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import time
+
+# fp32      easyocr recognizer with quantize=False (reference accuracy)
+# torch     easyocr default: torch dynamic INT8 on the LSTM/Linear layers, convolutions stay FP32
+# onnx      recognizer exported to ONNX and run by onnxruntime in FP32
+# onnx-int8 the ONNX graph with onnxruntime dynamic INT8, convolutions included
+RECOGNIZER_MODES = ("fp32", "torch", "onnx", "onnx-int8")
+
+RECOGNIZER_CONFIG = {
+    "mode": os.getenv("OCR_RECOGNIZER", "torch"),
+    "model_dir": os.getenv("OCR_MODEL_DIR", "models"),  # exported ONNX graphs are cached here
+    "threads": int(os.getenv("OCR_THREADS", "0")),      # 0 lets onnxruntime pick
+    "opset": 13,
+}
+
+
+def reader_kwargs(mode=None):
+    """Extra easyocr.Reader arguments a mode needs: the ONNX export starts from the FP32 weights."""
+    mode = mode or RECOGNIZER_CONFIG["mode"]
+    if mode not in RECOGNIZER_MODES:
+        raise ValueError(f"Unknown OCR_RECOGNIZER {mode!r}: choose one of {', '.join(RECOGNIZER_MODES)}")
+    return {"quantize": mode == "torch"}
+
+
+def _weights_tag(model):
+    """Short digest of the recognizer weights, so a new easyocr model gets a new export."""
+    digest = hashlib.blake2b(digest_size=6)
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().numpy().tobytes()[:4096])
+    return digest.hexdigest()
+
+
+# Function to export easyocr's recognizer to ONNX (and its INT8 variant) once per model
+def export_recognizer(model, mode="onnx", model_dir=None):
+    """Return the path of the ONNX graph for `mode`, exporting it if it isn't cached yet."""
+    import torch
+
+    model_dir = model_dir or RECOGNIZER_CONFIG["model_dir"]
+    model = getattr(model, "module", model)  # unwrap DataParallel
+    tag = _weights_tag(model)
+    fp32_path = os.path.join(model_dir, f"recognizer-{tag}.onnx")
+    int8_path = os.path.join(model_dir, f"recognizer-{tag}-int8.onnx")
+    path = int8_path if mode == "onnx-int8" else fp32_path
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(model_dir, exist_ok=True)
+    if not os.path.exists(fp32_path):
+        class ImageOnly(torch.nn.Module):
+            # The CTC recognizer ignores its `text` argument; export the image path only
+            def __init__(self, inner):
+                super().__init__()
+                self.inner = inner
+
+            def forward(self, image):
+                return self.inner(image, None)
+
+        model.eval()
+        started = time.perf_counter()
+        tmp = f"{fp32_path}.{os.getpid()}.tmp"
+        torch.onnx.export(
+            ImageOnly(model), torch.zeros(1, 1, 64, 256), tmp,
+            input_names=["image"], output_names=["preds"],
+            dynamic_axes={"image": {0: "batch", 3: "width"}, "preds": {0: "batch", 1: "time"}},
+            opset_version=RECOGNIZER_CONFIG["opset"],
+        )
+        os.replace(tmp, fp32_path)
+        print(f"📦 Exported OCR recognizer to {fp32_path} in {time.perf_counter() - started:.1f}s")
+
+    if mode == "onnx-int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32_path, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, int8_path)
+        print(f"📦 Quantised OCR recognizer to INT8: {int8_path}")
+    return path
+
+
+class OnnxRecognizer:
+    """Stands in for easyocr's torch recognizer, running an ONNX graph in onnxruntime.
+
+    Called the way easyocr and PlateDecoder call the torch module,
+    model(image_tensor, text_for_pred), and returns a torch tensor, so
+    readtext and the grammar decoder work unchanged.
+    """
+
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = RECOGNIZER_CONFIG["threads"] if threads is None else threads
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, image, text=None):
+        import torch
+
+        preds = self.session.run(None, {"image": image.detach().cpu().numpy().astype("float32")})[0]
+        return torch.from_numpy(preds)
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+
+# Function to switch a loaded easyocr.Reader to the selected recognizer backend
+def configure_recognizer(reader, mode=None):
+    """Returns the mode actually in use; ONNX modes fall back to FP32 torch when they can't be set up."""
+    mode = mode or RECOGNIZER_CONFIG["mode"]
+    if mode in ("fp32", "torch"):
+        return mode
+    if str(getattr(reader, "device", "cpu")) != "cpu":
+        # reader_kwargs built this reader with quantize=False, so the torch recognizer is FP32
+        print(f"⚠️ OCR_RECOGNIZER={mode} is a CPU path; keeping the FP32 torch recognizer on {reader.device}.")
+        return "fp32"
+    try:
+        path = export_recognizer(reader.recognizer, mode)
+        reader.recognizer = OnnxRecognizer(path)  # drops the torch weights from this worker
+    except (ImportError, RuntimeError, OSError) as err:
+        print(f"⚠️ Could not use the {mode} recognizer ({err}); keeping the FP32 torch recognizer.")
+        return "fp32"
+    print(f"🔤 OCR recognizer: {mode} ({os.path.basename(path)})")
+    return mode
@@ -0,0 +1,218 @@
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from parking_db import READ_ERRORS, ReadRouter
+from parking_lots import resolve_lot
+from timing_wheel import TimingWheel
+
+ALERT_CONFIG = {
+    "overstay_hours": float(os.getenv("OVERSTAY_HOURS", "12")),            # any stay longer than this
+    "ev_charge_minutes": float(os.getenv("EV_CHARGE_LIMIT_MINUTES", "120")),  # EV holding a charging slot
+    "poll": float(os.getenv("ALERT_POLL_SECONDS", "5")),          # new entries / departures check
+    "reconcile": float(os.getenv("ALERT_RECONCILE_SECONDS", "600")),  # full resync with SmartParking
+    "keep": int(os.getenv("ALERT_KEEP", "500")),                  # fired alerts kept for /api/alerts
+    "tick": 1.0,
+}
+
+# Re-read this many ids below the high-water mark: auto-increment ids can commit out of order
+FEED_OVERLAP = 200
+
+STAY_COLUMNS = "entry_id, lot_id, vehicle_number, slot_number, is_ev, entry_time"
+
+
+class OverstayMonitor:
+    """Raises overstay and EV charging-limit alerts from a timing wheel instead of polling by age.
+
+    Each active stay gets its deadlines scheduled once, when its entry is
+    seen, and cancelled when it leaves, so the cost is O(1) per event
+    however many cars are parked. Entries made by other processes (the
+    gates) are picked up by an id high-water-mark query every `poll`
+    seconds. A fired deadline is only raised after a batched check that
+    the stay is still in SmartParking, so exits this process missed
+    never alert. `connect()` returns a read connection for SmartParking.
+    """
+
+    def __init__(self, connect, overstay_hours=None, ev_charge_minutes=None, keep=None):
+        self.connect = connect
+        self.limits = {
+            "overstay": timedelta(hours=overstay_hours or ALERT_CONFIG["overstay_hours"]),
+            "ev_charge": timedelta(minutes=ev_charge_minutes or ALERT_CONFIG["ev_charge_minutes"]),
+        }
+        self.wheel = TimingWheel(ALERT_CONFIG["tick"])
+        self.stays = {}   # entry_id -> stay dict, for every stay this monitor knows is parked
+        self.active = {}  # (entry_id, kind) -> alert, raised and still parked
+        self.recent = deque(maxlen=keep or ALERT_CONFIG["keep"])
+        self.high_water = 0
+        self._reconciled_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Function to schedule a stay's deadlines (gate entry, slot map entry or feed)
+    def on_entry(self, entry_id, lot_id, vehicle_number, slot_number, is_ev, entry_time):
+        stay = {"entry_id": entry_id, "lot_id": lot_id, "vehicle_number": vehicle_number,
+                "slot_number": slot_number, "is_ev": bool(is_ev), "entry_time": entry_time}
+        with self._lock:
+            if entry_id in self.stays:
+                return
+            self.stays[entry_id] = stay
+            self.high_water = max(self.high_water, entry_id)
+            for kind, limit in self.limits.items():
+                if kind == "ev_charge" and not stay["is_ev"]:
+                    continue
+                self.wheel.schedule((entry_id, kind), (entry_time + limit).timestamp(), kind)
+
+    # Function to drop a stay's deadlines and resolve its alerts
+    def on_exit(self, entry_id, exit_time=None):
+        resolved_at = (exit_time or datetime.now()).isoformat(sep=" ", timespec="seconds")
+        with self._lock:
+            self.stays.pop(entry_id, None)
+            for kind in self.limits:
+                self.wheel.cancel((entry_id, kind))
+                alert = self.active.pop((entry_id, kind), None)
+                if alert is not None:
+                    alert["resolved_at"] = resolved_at
+
+    def _query(self, sql, params=()):
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            cursor.close()
+            connection.commit()  # end the read transaction on pooled/replica connections
+            return rows
+        finally:
+            connection.close()
+
+    def _present(self, entry_ids):
+        if not entry_ids:
+            return set()
+        placeholders = ", ".join(["%s"] * len(entry_ids))
+        return {row[0] for row in self._query(
+            f"SELECT entry_id FROM SmartParking WHERE entry_id IN ({placeholders})", tuple(entry_ids))}
+
+    def _feed(self):
+        rows = self._query(f"SELECT {STAY_COLUMNS} FROM SmartParking WHERE entry_id > %s ORDER BY entry_id",
+                           (max(0, self.high_water - FEED_OVERLAP),))
+        for row in rows:
+            self.on_entry(*row)
+
+    def reconcile(self):
+        """Resync with every active stay: schedule unknown ones, drop ones that have left."""
+        rows = self._query(f"SELECT {STAY_COLUMNS} FROM SmartParking")
+        present = {row[0] for row in rows}
+        for row in rows:
+            self.on_entry(*row)
+        for entry_id in set(self.stays) - present:
+            self.on_exit(entry_id)
+        self._reconciled_at = time.monotonic()
+        return len(present)
+
+    # Function to advance the wheel and raise the deadlines that passed
+    def tick(self, now=None):
+        """One poll: read the entry feed, fire due timers, resolve departed alerts. Returns new alerts."""
+        if time.monotonic() - self._reconciled_at >= ALERT_CONFIG["reconcile"]:
+            self.reconcile()
+        else:
+            self._feed()
+        with self._lock:
+            due = self.wheel.advance(now)
+            watched = {entry_id for (entry_id, _kind), _, _ in due} | {entry_id for entry_id, _kind in self.active}
+        present = self._present(sorted(watched))
+
+        fired_at = datetime.now().isoformat(sep=" ", timespec="seconds")
+        raised = []
+        for (entry_id, kind), _, deadline in due:
+            stay = self.stays.get(entry_id)
+            if stay is None:
+                continue
+            if entry_id not in present:
+                self.on_exit(entry_id)
+                continue
+            alert = dict(stay, kind=kind, entry_time=stay["entry_time"].isoformat(sep=" ", timespec="seconds"),
+                         deadline=datetime.fromtimestamp(deadline).isoformat(sep=" ", timespec="seconds"),
+                         fired_at=fired_at, resolved_at=None)
+            with self._lock:
+                self.active[(entry_id, kind)] = alert
+                self.recent.append(alert)
+            raised.append(alert)
+            label = "EV charging limit passed" if kind == "ev_charge" else "Overstay"
+            print(f"⏰ {label}: {stay['vehicle_number']} in {stay['lot_id']}/{stay['slot_number']} "
+                  f"since {alert['entry_time']}")
+        with self._lock:
+            departed = {entry_id for entry_id, _kind in self.active if entry_id not in present}
+        for entry_id in departed:
+            self.on_exit(entry_id)
+        return raised
+
+    def alerts(self, lot_id=None):
+        """{"active": still-parked alerts by deadline, "recent": latest fired alerts, newest first}."""
+        with self._lock:
+            active = sorted((a for a in self.active.values() if lot_id in (None, a["lot_id"])),
+                            key=lambda a: a["deadline"])
+            recent = [a for a in reversed(self.recent) if lot_id in (None, a["lot_id"])]
+            return {"active": [dict(a) for a in active], "recent": [dict(a) for a in recent],
+                    "watching": len(self.wheel)}
+
+    def _run(self):
+        failing = False
+        while not self._stop.is_set():
+            try:
+                self.tick()
+                failing = False
+            except READ_ERRORS as err:
+                if not failing:
+                    print(f"⚠️ Overstay alerts paused ({err}); retrying every {ALERT_CONFIG['poll']:g}s.")
+                failing = True
+            self._stop.wait(ALERT_CONFIG["poll"])
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="overstay-alerts", daemon=True)
+        self._thread.start()
+        print(f"⏰ Overstay alerts: stays over {self.limits['overstay']}, EV charging over {self.limits['ev_charge']}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+# Function to add GET /api/alerts?lot=<id> to a Flask app
+def register_alert_route(app, monitor):
+    from flask import jsonify, request
+
+    @app.route('/api/alerts', methods=['GET'])
+    def get_alerts():
+        lot_id = request.args.get('lot')
+        try:
+            lot_id = resolve_lot(lot_id) if lot_id else None
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 404
+        return jsonify(monitor.alerts(lot_id))
+
+    return get_alerts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch active stays and print overstay / EV charging alerts.")
+    parser.add_argument("--once", action="store_true", help="Load active stays, report what is already overdue, exit")
+    args = parser.parse_args()
+
+    reads = ReadRouter()
+    monitor = OverstayMonitor(lambda: reads.connect(active_only=True))
+    print(f"⏰ Watching {monitor.reconcile()} active stays ({reads.describe()})")
+    monitor.tick()
+    if not args.once:
+        reads.start()
+        monitor.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            monitor.stop()
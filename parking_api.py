@@ -0,0 +1,586 @@
+import asyncio
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import datetime
+import aiomysql
+import mysql.connector
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+from evidence_store import evidence_json, find_evidence, image_response
+import occupancy_log
+from overstay_alerts import OverstayMonitor
+from parking_archive import HISTORY_COLUMNS, archive_statements, migrate, stays_query
+from parking_db import READ_CONFIG, REPLICA_STATUS_SQL, ReadRouter, lag_from_status
+from parking_export import CONTENT_TYPES, EXPORT_CHUNK, FORMATS, export_query, make_encoder
+import parking_rollups
+from parking_lots import lot_slots, resolve_lot, zone_capacity
+from response_cache import EncodedPayload, STATUS_FINGERPRINT_SQL, conditional_response, static_payload
+from sampling_profiler import PROFILER, authorised, install as install_profiler
+
+# One ASGI service for the slot map (9854), vehicle search (9871) and dashboard (9843)
+app = cors(Quart(__name__))
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', '...'),
+    'db': os.getenv('DB_NAME', 'smart_parking'),
+}
+
+API_CONFIG = {
+    'pool_min': int(os.getenv('DB_POOL_MIN', '2')),
+    'pool_max': int(os.getenv('DB_POOL_MAX', '20')),
+    'status_ttl': float(os.getenv('STATUS_CACHE_TTL', '1.0')),  # seconds between change checks on the status
+    'ports': [int(p) for p in os.getenv('API_PORTS', '9854,9871,9843').split(',')],
+}
+
+# The three old apps each served their own page at '/'; pick it by listening port
+ROOT_PAGES = {
+    9854: 'slots',
+    9871: 'search',
+    9843: 'dashboard',
+}
+
+# The pages contain no template syntax, so they are served as cacheable static files
+PAGE_FILES = {
+    'slots': 'pslot.html',
+    'search': os.path.join('templates', 'vsearch.html'),
+    'dashboard': os.path.join('templates', 'dashboard01.html'),
+}
+
+# Read-only endpoints use the replica pool or the read snapshot (DB_READ_FROM); writes use db_pool
+reads = ReadRouter({'host': DB_CONFIG['host'], 'user': DB_CONFIG['user'],
+                    'password': DB_CONFIG['password'], 'database': DB_CONFIG['db']})
+
+# Overstay / EV charging-limit timers, fed by this service's writes and the gates' entries
+alerts = OverstayMonitor(lambda: reads.connect(active_only=True))
+
+# Errors a read-only endpoint can see, from MySQL or the SQLite snapshot
+READ_ERRORS = (aiomysql.Error, sqlite3.Error)
+
+db_pool = None
+replica_pool = None
+replica_lag = {'lag': None, 'checked': float('-inf')}
+
+
+@app.before_serving
+async def open_pool():
+    global db_pool, replica_pool
+    db_pool = await aiomysql.create_pool(
+        minsize=API_CONFIG['pool_min'], maxsize=API_CONFIG['pool_max'], autocommit=False, **DB_CONFIG
+    )
+    if reads.replica_config is not None and reads.source != 'primary':
+        replica_pool = await aiomysql.create_pool(
+            minsize=API_CONFIG['pool_min'], maxsize=API_CONFIG['pool_max'], autocommit=False,
+            **dict(DB_CONFIG, host=reads.replica_config['host'], port=reads.replica_config['port'])
+        )
+
+
+@app.after_serving
+async def close_pool():
+    for pool in (db_pool, replica_pool):
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
+
+
+class StatusCache:
+    """Shared pre-encoded parking-status payload; concurrent pollers wait on a single check.
+
+    Every `ttl` seconds a cheap fingerprint query decides whether the full
+    status query and JSON/gzip encoding need to run again.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.value = None
+        self.fingerprint = None
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.fingerprint = None
+        self.loaded_at = 0.0
+
+    async def get(self, fingerprint, loader):
+        if self.value is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return self.value
+        async with self._lock:
+            if self.value is None or time.monotonic() - self.loaded_at >= self.ttl:
+                current = await fingerprint()
+                if self.value is None or current != self.fingerprint:
+                    self.value = await loader()
+                    self.fingerprint = current
+                self.loaded_at = time.monotonic()
+        return self.value
+
+
+# One status snapshot per lot, so a busy lot's writes never invalidate another's
+status_caches = defaultdict(lambda: StatusCache(API_CONFIG['status_ttl']))
+
+
+# Lot for this request: ?lot=<id> or "lot_id" in the JSON body, else PARKING_LOT
+def request_lot(data=None):
+    return resolve_lot((data or {}).get('lot_id') or request.args.get('lot'))
+
+
+def optional_lot(lot_id):
+    return resolve_lot(lot_id) if lot_id else None
+
+
+# Function to pick the pool for a read: the replica while its lag is within DB_MAX_STALENESS
+async def read_pool():
+    if replica_pool is None:
+        return db_pool
+    now = time.monotonic()
+    if now - replica_lag['checked'] >= READ_CONFIG['lag_check']:
+        replica_lag['checked'] = now  # set first, so concurrent readers don't all probe
+        lag = None
+        try:
+            async with replica_pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    for sql in REPLICA_STATUS_SQL:
+                        try:
+                            await cursor.execute(sql)
+                        except aiomysql.Error:
+                            continue
+                        lag = lag_from_status(await cursor.fetchone())
+                        break
+        except aiomysql.Error:
+            pass
+        replica_lag['lag'] = lag
+    lag = replica_lag['lag']
+    return replica_pool if lag is not None and lag <= reads.max_staleness else db_pool
+
+
+# Function to run one query on a pooled connection
+async def fetch_all(query, params=(), pool=None):
+    async with (pool or db_pool).acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+        await conn.commit()  # end the read transaction so the pooled connection sees fresh data
+    return rows
+
+
+# Function to run one read-only query; active_only (SmartParking-only) reads may use the snapshot
+async def read_all(query, params=(), active_only=False):
+    if active_only and reads.use_snapshot():
+        return await asyncio.to_thread(reads.snapshot.fetch_all, query, params)
+    return await fetch_all(query, params, await read_pool())
+
+
+def format_times(rows, keys=('entry_time',)):
+    for row in rows:
+        for key in keys:
+            if isinstance(row.get(key), datetime):
+                row[key] = row[key].strftime('%Y-%m-%d %H:%M:%S')
+    return rows
+
+
+# ---- pages -------------------------------------------------------------------
+
+def serve_page(page):
+    path = os.path.join(app.root_path, PAGE_FILES[page])
+    return conditional_response(static_payload(path), request.headers)
+
+
+@app.route('/')
+async def index():
+    return serve_page(ROOT_PAGES.get(request.server[1] if request.server else None, 'slots'))
+
+
+@app.route('/slots')
+async def slots_page():
+    return serve_page('slots')
+
+
+@app.route('/vsearch')
+async def search_page():
+    return serve_page('search')
+
+
+@app.route('/dashboard')
+async def dashboard_page():
+    return serve_page('dashboard')
+
+
+# ---- slot map (parking_slot_server.py) ---------------------------------------
+
+async def parking_status_fingerprint(lot_id):
+    rows = await read_all(STATUS_FINGERPRINT_SQL, (lot_id,), active_only=True)
+    return tuple(rows[0].values())
+
+
+async def load_parking_status(lot_id):
+    rows = await read_all(
+        "SELECT entry_id, slot_number, is_ev, vehicle_number, entry_time, exit_time "
+        "FROM SmartParking WHERE lot_id = %s AND exit_time IS NULL", (lot_id,), active_only=True
+    )
+    return EncodedPayload.from_json({
+        row['slot_number']: {
+            'entry_id': row['entry_id'],
+            'is_ev': bool(row['is_ev']),
+            'status': 'available' if row['exit_time'] else 'occupied',
+            'vehicle_number': row['vehicle_number'],
+            'entry_time': row['entry_time'].isoformat() if row['entry_time'] else None,
+            'exit_time': row['exit_time'].isoformat() if row['exit_time'] else None
+        } for row in rows
+    })
+
+
+@app.route('/get_parking_status', methods=['GET'])
+async def get_parking_status():
+    try:
+        lot_id = request_lot()
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 404
+    try:
+        payload = await status_caches[lot_id].get(lambda: parking_status_fingerprint(lot_id),
+                                                  lambda: load_parking_status(lot_id))
+        return conditional_response(payload, request.headers)
+    except READ_ERRORS as err:
+        return jsonify({'error': str(err)}), 500
+
+
+@app.route('/update_slot', methods=['POST'])
+async def update_slot():
+    data = await request.get_json()
+    slot_number = data.get('slot_number')
+    is_ev = data.get('is_ev', False)
+    action = data.get('action')
+    vehicle_number = data.get('vehicle_number', '')
+
+    if not slot_number or not action:
+        return jsonify({'error': 'Missing required fields'}), 400
+    try:
+        lot_id = request_lot(data)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 404
+    if slot_number not in lot_slots(lot_id):
+        return jsonify({'error': f'Unknown slot {slot_number} in lot {lot_id}'}), 400
+
+    current_time = datetime.now()
+    entry_ids = []
+    try:
+        async with db_pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                if action == 'entry':
+                    await cursor.execute(
+                        "SELECT slot_number FROM SmartParking "
+                        "WHERE lot_id = %s AND slot_number = %s AND exit_time IS NULL FOR UPDATE",
+                        (lot_id, slot_number))
+                    if await cursor.fetchone():
+                        await conn.rollback()
+                        return jsonify({'error': 'Slot is already occupied'}), 400
+                    await cursor.execute(
+                        "INSERT INTO SmartParking (lot_id, slot_number, is_ev, vehicle_number, entry_time, exit_time) "
+                        "VALUES (%s, %s, %s, %s, %s, NULL)",
+                        (lot_id, slot_number, is_ev, vehicle_number, current_time))
+                    entry_ids = [cursor.lastrowid]
+                    await cursor.executemany(parking_rollups.ROLLUP_UPSERT,
+                                             parking_rollups.entry_deltas(slot_number, current_time, lot_id))
+                    for sql, params in occupancy_log.entry_statements(entry_ids[0], lot_id, slot_number,
+                                                                      vehicle_number, is_ev, current_time):
+                        await cursor.execute(sql, params)
+
+                elif action == 'exit':
+                    # Move the stay to SmartParkingHistory (locks, copies and deletes in one transaction)
+                    await cursor.execute(*stays_query("slot_number = %s", (slot_number,), lot_id))
+                    stays = await cursor.fetchall()
+                    entry_ids = [stay[0] for stay in stays]
+                    if not entry_ids:
+                        await conn.rollback()
+                        return jsonify({'error': 'No vehicle found in this slot'}), 400
+                    for sql, params in archive_statements(lot_id, stays, current_time):
+                        await cursor.execute(sql, params)
+
+            await conn.commit()
+        status_caches[lot_id].invalidate()
+        for entry_id in entry_ids:
+            if action == 'entry':
+                alerts.on_entry(entry_id, lot_id, vehicle_number, slot_number, is_ev, current_time)
+            else:
+                alerts.on_exit(entry_id, current_time)
+        return jsonify({'success': True})
+    except aiomysql.Error as err:
+        return jsonify({'error': str(err)}), 500
+
+
+# ---- vehicle search (vehicle_search_server.py) -------------------------------
+
+@app.route('/search', methods=['POST'])
+async def search_vehicle():
+    form = await request.form
+    vehicle_number = form.get('vehicle_number')
+    if not vehicle_number:
+        return jsonify({'error': 'Vehicle number is required'}), 400
+    try:
+        lot_id = optional_lot(form.get('lot_id') or request.args.get('lot'))  # all lots unless given
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 404
+    lot_filter = " AND lot_id = %s" if lot_id else ""
+    params = (vehicle_number, lot_id) if lot_id else (vehicle_number,)
+
+    try:
+        results = await read_all(
+            f"SELECT {HISTORY_COLUMNS} FROM SmartParking WHERE vehicle_number = %s{lot_filter} "
+            f"UNION ALL "
+            f"SELECT {HISTORY_COLUMNS} FROM SmartParkingHistory WHERE vehicle_number = %s{lot_filter} "
+            f"ORDER BY entry_time DESC",
+            params * 2)
+        return jsonify({'results': format_times(results, ('entry_time', 'exit_time'))})
+    except aiomysql.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+
+
+@app.route('/api/vehicles', methods=['GET'])
+async def get_all_vehicles():
+    try:
+        lot_id = optional_lot(request.args.get('lot'))
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 404
+    try:
+        if lot_id:
+            results = await read_all(
+                "SELECT * FROM SmartParking WHERE lot_id = %s ORDER BY entry_time DESC LIMIT 100", (lot_id,),
+                active_only=True)
+        else:
+            results = await read_all("SELECT * FROM SmartParking ORDER BY entry_time DESC LIMIT 100",
+                                     active_only=True)
+        return jsonify({'results': format_times(results)})
+    except READ_ERRORS as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+
+
+# ---- dashboard (dashboard.py) ------------------------------------------------
+
+@app.route('/parking-entries', methods=['GET'])
+async def get_parking_entries():
+    try:
+        lot_id = optional_lot(request.args.get('lot'))  # all lots unless given
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    sql = "SELECT entry_id, lot_id, vehicle_number, slot_number, entry_time, is_ev FROM SmartParking"
+    try:
+        if lot_id:
+            entries = await read_all(sql + " WHERE lot_id = %s ORDER BY entry_time DESC", (lot_id,),
+                                     active_only=True)
+        else:
+            entries = await read_all(sql + " ORDER BY entry_time DESC", active_only=True)
+        return jsonify(entries)
+    except READ_ERRORS as err:
+        return jsonify({"error": str(err)}), 500
+
+
+@app.route('/parking-entries', methods=['POST'])
+async def add_parking_entry():
+    data = await request.get_json()
+    vehicle_number = data.get('vehicle_number')
+    slot_number = data.get('slot_number')
+    is_ev = data.get('is_ev', False)
+
+    if not vehicle_number or not slot_number:
+        return jsonify({"error": "Vehicle number and slot number are required"}), 400
+    try:
+        lot_id = request_lot(data)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    if slot_number not in lot_slots(lot_id):
+        return jsonify({"error": f"Unknown slot {slot_number} in lot {lot_id}"}), 400
+
+    try:
+        async with db_pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT COUNT(*) FROM SmartParking "
+                    "WHERE lot_id = %s AND slot_number = %s AND exit_time IS NULL FOR UPDATE",
+                    (lot_id, slot_number))
+                if (await cursor.fetchone())[0] > 0:
+                    await conn.rollback()
+                    return jsonify({"error": "Slot is already occupied"}), 400
+                entry_time = datetime.now()
+                await cursor.execute(
+                    "INSERT INTO SmartParking (lot_id, vehicle_number, slot_number, entry_time, is_ev) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    (lot_id, vehicle_number, slot_number, entry_time, is_ev))
+                entry_id = cursor.lastrowid
+                await cursor.executemany(parking_rollups.ROLLUP_UPSERT,
+                                         parking_rollups.entry_deltas(slot_number, entry_time, lot_id))
+                for sql, params in occupancy_log.entry_statements(entry_id, lot_id, slot_number, vehicle_number,
+                                                                  is_ev, entry_time):
+                    await cursor.execute(sql, params)
+            await conn.commit()
+        status_caches[lot_id].invalidate()
+        alerts.on_entry(entry_id, lot_id, vehicle_number, slot_number, is_ev, entry_time)
+        return jsonify({"message": "Entry added successfully"}), 201
+    except aiomysql.Error as err:
+        return jsonify({"error": str(err)}), 500
+
+
+@app.route('/parking-entries/<int:entry_id>', methods=['DELETE'])
+async def delete_parking_entry(entry_id):
+    try:
+        lot_id = request_lot()
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    exit_time = datetime.now()
+    try:
+        async with db_pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                # Close the stay like a gate exit: occupancy log, history and rollup exit deltas together
+                await cursor.execute(*stays_query("entry_id = %s", (entry_id,), lot_id))
+                stays = await cursor.fetchall()
+                for sql, params in archive_statements(lot_id, stays, exit_time):
+                    await cursor.execute(sql, params)
+            if not stays:
+                await conn.rollback()
+                return jsonify({"error": f"No entry {entry_id} in lot {lot_id}"}), 404
+            await conn.commit()
+        status_caches[lot_id].invalidate()
+        alerts.on_exit(entry_id, exit_time)
+        return jsonify({"message": "Entry deleted successfully"}), 200
+    except aiomysql.Error as err:
+        return jsonify({"error": str(err)}), 500
+
+
+@app.route('/api/rollups', methods=['GET'])
+async def get_rollups():
+    try:
+        start, end = parking_rollups.parse_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start/end must be ISO timestamps"}), 400
+    zone = request.args.get('zone')
+    try:
+        lot_id = optional_lot(request.args.get('lot'))  # all lots unless given
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    sql, params, active_sql, active_params = parking_rollups.rollup_query(start, end, zone, lot_id)
+    try:
+        async with (await read_pool()).acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                rows = await cursor.fetchall()
+                await cursor.execute(active_sql, active_params)
+                active = await cursor.fetchall()
+            await conn.commit()
+        if zone:
+            active = [stay for stay in active if parking_rollups.zone_of(stay[0]) == zone]
+        return jsonify(parking_rollups.summarise(rows, active, start, end, capacity=zone_capacity(lot_id)))
+    except aiomysql.Error as err:
+        return jsonify({"error": str(err)}), 500
+
+
+@app.route('/api/occupancy/at', methods=['GET'])
+async def get_occupancy_at():
+    try:
+        moment = occupancy_log.parse_moment(request.args.get('at'))
+    except ValueError:
+        return jsonify({"error": "at must be an ISO timestamp"}), 400
+    slot = request.args.get('slot')
+    try:
+        lot_id = request_lot()
+        occupancy_log.validate_slot(lot_id, slot)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    try:
+        # Nearest snapshot, then only the events logged after it
+        pool = await read_pool()
+        snapshots = await fetch_all(occupancy_log.SNAPSHOT_AT_SQL, (lot_id, moment), pool)
+        snapshot_row = snapshots[0] if snapshots else None
+        since = snapshot_row['snapshot_time'] if snapshot_row else occupancy_log.LOG_START
+        events = await fetch_all(occupancy_log.EVENTS_BETWEEN_SQL, (lot_id, since, moment), pool)
+        return jsonify(occupancy_log.occupancy_payload(lot_id, moment, snapshot_row, events, slot))
+    except aiomysql.Error as err:
+        return jsonify({"error": str(err)}), 500
+
+
+@app.route('/api/alerts', methods=['GET'])
+async def get_alerts():
+    try:
+        lot_id = optional_lot(request.args.get('lot'))  # all lots unless given
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 404
+    return jsonify(alerts.alerts(lot_id))
+
+
+@app.route('/api/evidence/<int:entry_id>', methods=['GET'])
+async def get_evidence(entry_id):
+    # Index lookups are a few mmap reads; no need to leave the event loop
+    records = find_evidence(entry_id)
+    if not records:
+        return jsonify({"error": f"No evidence stored for entry {entry_id}"}), 404
+    return jsonify(evidence_json(records))
+
+
+@app.route('/evidence/<digest>.jpg', methods=['GET'])
+async def get_evidence_image(digest):
+    return await asyncio.to_thread(image_response, digest, request.headers)
+
+
+@app.route('/admin/profile', methods=['GET'])
+async def admin_profile():
+    if not authorised(request.remote_addr, request.headers, request.args):
+        return jsonify({"error": "forbidden"}), 403
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return jsonify({"error": "seconds must be a number"}), 400
+    if not PROFILER.start(seconds):
+        return jsonify({"error": "a profile is already running"}), 409
+    # The sampler runs on its own thread and sees the event loop's stacks while we wait
+    path = await asyncio.to_thread(PROFILER.wait)
+    with open(path, "rb") as f:
+        body = f.read()
+    return Response(body, mimetype="text/plain",
+                    headers={"Content-Disposition": f"attachment; filename={os.path.basename(path)}"})
+
+
+@app.route('/export', methods=['GET'])
+async def export_parking_history():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+    sql, params = export_query(request.args.get('since'), request.args.get('until'), request.args.get('lot'))
+
+    async def generate():
+        encoder = make_encoder(fmt)
+        async with (await read_pool()).acquire() as conn:
+            # Unbuffered server-side cursor: rows arrive chunk by chunk
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(sql, params)
+                yield encoder.header()
+                while True:
+                    rows = await cursor.fetchmany(EXPORT_CHUNK)
+                    if not rows:
+                        break
+                    yield encoder.encode(rows)
+            await conn.commit()
+        yield encoder.footer()
+
+    return Response(
+        generate(),
+        mimetype=CONTENT_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=parking_history.{fmt}"},
+    )
+
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"0.0.0.0:{port}" for port in API_CONFIG['ports']]
+    config.keep_alive_timeout = 75
+    install_profiler()
+    try:
+        migrate(reads.primary_config)
+    except mysql.connector.Error as err:
+        print(f"⚠️ Schema check failed ({err}); entry and exit writes need it")
+    reads.start()
+    alerts.start()
+    for port in API_CONFIG['ports']:
+        print(f"🚀 Server running on http://localhost:{port}")
+    asyncio.run(serve(app, config))
@@ -0,0 +1,243 @@
+import os
+import time
+from datetime import date, datetime
+import mysql.connector
+import occupancy_log
+import parking_lots
+import parking_rollups
+from parking_lots import LOT_ID
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+ARCHIVE_CONFIG = {
+    "months_ahead": int(os.getenv("ARCHIVE_MONTHS_AHEAD", "3")),   # empty partitions kept ready
+    "retention_months": int(os.getenv("ARCHIVE_RETENTION_MONTHS", "0")),  # 0 = keep forever
+    "batch_size": int(os.getenv("ARCHIVE_BATCH_SIZE", "500")),
+    "interval": float(os.getenv("ARCHIVE_INTERVAL", "300")),
+}
+
+HISTORY_COLUMNS = "entry_id, lot_id, vehicle_number, is_ev, slot_number, entry_time, exit_time"
+
+# SmartParking stays the small hot table of active stays (exit_time IS NULL).
+# Finished stays live here, one partition per month of exit_time.
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SmartParkingHistory (
+    entry_id INT NOT NULL,
+    lot_id VARCHAR(32) NOT NULL DEFAULT 'main',
+    vehicle_number VARCHAR(20) NOT NULL,
+    is_ev TINYINT(1) NOT NULL DEFAULT 0,
+    slot_number VARCHAR(10) NOT NULL,
+    entry_time DATETIME NOT NULL,
+    exit_time DATETIME NOT NULL,
+    PRIMARY KEY (entry_id, exit_time),
+    KEY idx_history_vehicle (vehicle_number, entry_time),
+    KEY idx_history_lot (lot_id, exit_time),
+    KEY idx_history_lot_slot (lot_id, slot_number, exit_time)
+)
+PARTITION BY RANGE COLUMNS (exit_time) (
+    PARTITION p_before VALUES LESS THAN ('{start}'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+)
+"""
+
+def _month_start(day, offset=0):
+    month = day.month - 1 + offset
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def _value(row):
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+# Function to create the history table, rollups and per-lot hot-table layout if missing
+def ensure_schema(cursor):
+    cursor.execute(HISTORY_SCHEMA.format(start=_month_start(date.today()).isoformat()))
+    cursor.execute(parking_rollups.ROLLUP_SCHEMA)
+    occupancy_log.ensure_schema(cursor)
+    parking_lots.ensure_lot_schema(cursor)
+
+
+# Function to create every table the entry/exit write paths touch; the gates and servers run it at startup
+def migrate(db_config=None):
+    """Idempotent, so every process can call it; until it has run, entry and exit writes fail."""
+    connection = mysql.connector.connect(**(db_config or DB_CONFIG))
+    try:
+        cursor = connection.cursor()
+        ensure_schema(cursor)
+        cursor.close()
+    finally:
+        connection.close()
+
+
+# Function to keep monthly partitions created ahead of time
+def ensure_partitions(cursor, months_ahead=None, today=None):
+    """Split pmax so the current month and `months_ahead` future months have partitions.
+
+    pmax is always empty when this runs on schedule, so each split is a
+    metadata-only change.
+    """
+    months_ahead = ARCHIVE_CONFIG["months_ahead"] if months_ahead is None else months_ahead
+    today = today or date.today()
+    cursor.execute(
+        "SELECT partition_name FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = 'SmartParkingHistory'"
+    )
+    existing = {_value(row) for row in cursor.fetchall()}
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _month_start(today, offset)
+        name = f"p{month:%Y%m}"
+        if name in existing:
+            continue
+        cursor.execute(
+            f"ALTER TABLE SmartParkingHistory REORGANIZE PARTITION pmax INTO ("
+            f"PARTITION {name} VALUES LESS THAN ('{_month_start(month, 1).isoformat()}'), "
+            f"PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+        )
+        created.append(name)
+    return created
+
+
+# Function to drop monthly partitions past the retention window
+def drop_expired_partitions(cursor, retention_months=None, today=None):
+    retention_months = ARCHIVE_CONFIG["retention_months"] if retention_months is None else retention_months
+    if retention_months <= 0:
+        return []
+    cutoff = f"p{_month_start(today or date.today(), -retention_months):%Y%m}"
+    cursor.execute(
+        "SELECT partition_name FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = 'SmartParkingHistory'"
+    )
+    expired = sorted(
+        name for name in (_value(row) for row in cursor.fetchall())
+        if name and name.startswith("p2") and name < cutoff
+    )
+    if expired:
+        cursor.execute(f"ALTER TABLE SmartParkingHistory DROP PARTITION {', '.join(expired)}")
+    return expired
+
+
+def stays_query(where, params, lot_id=None):
+    """(sql, params) locking a lot's active stays matching `where`; rows are (entry_id, slot_number, entry_time).
+
+    The lookup is prefixed by lot_id, so it only locks rows in that lot's partition.
+    """
+    return (f"SELECT entry_id, slot_number, entry_time FROM SmartParking "
+            f"WHERE lot_id = %s AND {where} AND exit_time IS NULL FOR UPDATE", (lot_id or LOT_ID, *params))
+
+
+def archive_statements(lot_id, stays, exit_time):
+    """(sql, params) pairs moving stays locked by stays_query to history; the async API runs these on its own cursor."""
+    lot_id = lot_id or LOT_ID
+    entry_ids = [stay[0] for stay in stays]
+    if not entry_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(entry_ids))
+    statements = occupancy_log.exit_statements(lot_id, entry_ids, exit_time)
+    statements.append((
+        f"INSERT INTO SmartParkingHistory ({HISTORY_COLUMNS}) "
+        f"SELECT entry_id, lot_id, vehicle_number, is_ev, slot_number, entry_time, %s "
+        f"FROM SmartParking WHERE lot_id = %s AND entry_id IN ({placeholders})",
+        (exit_time, lot_id, *entry_ids),
+    ))
+    statements.append((f"DELETE FROM SmartParking WHERE lot_id = %s AND entry_id IN ({placeholders})",
+                       (lot_id, *entry_ids)))
+    for _, slot_number, entry_time in stays:
+        statements += [(parking_rollups.ROLLUP_UPSERT, delta)
+                       for delta in parking_rollups.exit_deltas(slot_number, entry_time, exit_time, lot_id)]
+    return statements
+
+
+# Function to move active stays to history inside the caller's transaction
+def archive_stays(cursor, where, params, exit_time=None, lot_id=None):
+    """Move a lot's active stays matching `where` to SmartParkingHistory. Returns rows moved.
+
+    The caller owns the transaction: the row lock, insert, delete and
+    rollup update all commit (or roll back) together.
+    """
+    exit_time = exit_time or datetime.now()
+    lot_id = lot_id or LOT_ID
+    cursor.execute(*stays_query(where, params, lot_id))
+    stays = [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+    for sql, statement_params in archive_statements(lot_id, stays, exit_time):
+        cursor.execute(sql, statement_params)
+    return len(stays)
+
+
+def archive_vehicle_exit(cursor, vehicle_number, exit_time=None, lot_id=None):
+    return archive_stays(cursor, "vehicle_number = %s", (vehicle_number,), exit_time, lot_id)
+
+
+def archive_slot_exit(cursor, slot_number, exit_time=None, lot_id=None):
+    return archive_stays(cursor, "slot_number = %s", (slot_number,), exit_time, lot_id)
+
+
+# Function to move finished rows left in the hot table into history
+def compact(connection, batch_size=None):
+    """Move rows that already have an exit_time (legacy or out-of-band updates) in batches."""
+    batch_size = batch_size or ARCHIVE_CONFIG["batch_size"]
+    moved = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            connection.start_transaction()
+            cursor.execute(
+                "SELECT entry_id FROM SmartParking WHERE exit_time IS NOT NULL "
+                "ORDER BY entry_id LIMIT %s FOR UPDATE", (batch_size,)
+            )
+            entry_ids = [row[0] for row in cursor.fetchall()]
+            if not entry_ids:
+                connection.commit()
+                break
+            placeholders = ", ".join(["%s"] * len(entry_ids))
+            cursor.execute(
+                f"INSERT IGNORE INTO SmartParkingHistory ({HISTORY_COLUMNS}) "
+                f"SELECT {HISTORY_COLUMNS} FROM SmartParking WHERE entry_id IN ({placeholders})",
+                entry_ids,
+            )
+            cursor.execute(f"DELETE FROM SmartParking WHERE entry_id IN ({placeholders})", entry_ids)
+            connection.commit()
+            moved += len(entry_ids)
+            if len(entry_ids) < batch_size:
+                break
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return moved
+
+
+# Function to run one maintenance pass: partitions, compaction, retention
+def run_maintenance(db_config=None):
+    connection = mysql.connector.connect(**(db_config or DB_CONFIG))
+    try:
+        cursor = connection.cursor()
+        ensure_schema(cursor)
+        created = ensure_partitions(cursor)
+        dropped = drop_expired_partitions(cursor)
+        cursor.close()
+        moved = compact(connection)
+    finally:
+        connection.close()
+    return created, moved, dropped
+
+
+if __name__ == "__main__":
+    # Background compaction job
+    print(f"🗄 History archiver running every {ARCHIVE_CONFIG['interval']:.0f}s")
+    while True:
+        try:
+            created, moved, dropped = run_maintenance()
+            if created or moved or dropped:
+                print(f"✅ Archived {moved} row(s); partitions added {created or '-'}, dropped {dropped or '-'}")
+        except mysql.connector.Error as err:
+            print(f"❌ Database error: {err}")
+        time.sleep(ARCHIVE_CONFIG["interval"])
@@ -0,0 +1,228 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+import mysql.connector
+import numpy as np
+from parking_lots import resolve_lot
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+TARIFF_PATH = os.getenv("PARKING_TARIFF", "tariff.json")
+
+# Rates are per hour. Later bands override earlier ones where they overlap;
+# a band whose end is before its start runs past midnight.
+DEFAULT_TARIFF = {
+    "grace_minutes": 15,      # stays this short are free
+    "round_to": 1.0,          # fees are rounded up to a multiple of this
+    "daily_cap": 400,         # most a vehicle pays per 24 hours from entry
+    "ev_daily_cap": 500,
+    "bands": [
+        {"start": "08:00", "end": "20:00", "rate": 40, "ev_rate": 50},
+        {"start": "20:00", "end": "08:00", "rate": 20, "ev_rate": 30},
+        {"days": [5, 6], "start": "08:00", "end": "20:00", "rate": 30, "ev_rate": 40},  # weekends
+    ],
+}
+
+DAY = 24 * 60
+WEEK = 7 * DAY
+EPOCH = datetime(1970, 1, 5)  # a Monday, so minute 0 of the week table is Monday 00:00
+EPOCH64 = np.datetime64(EPOCH, "s")
+
+
+# Function to load the tariff from tariff.json (PARKING_TARIFF), falling back to the default
+def load_tariff(path=None):
+    path = path or TARIFF_PATH
+    if os.path.exists(path):
+        with open(path) as f:
+            return {**DEFAULT_TARIFF, **json.load(f)}
+    return dict(DEFAULT_TARIFF)
+
+
+def _clock(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+# Function to expand tariff bands into a per-minute rate table for one week
+def week_rates(bands, ev=False):
+    """Return a list of WEEK hourly rates in paise, one per minute of the week (Monday 00:00 first)."""
+    rates = [0] * WEEK
+    for band in bands:
+        rate = int(round(100 * band.get("ev_rate", band["rate"]) if ev else 100 * band["rate"]))
+        start, end = _clock(band["start"]), _clock(band["end"])
+        length = (end - start) % DAY or DAY
+        for day in band.get("days", range(7)):
+            first = day * DAY + start
+            for minute in range(first, first + length):
+                rates[minute % WEEK] = rate
+    return rates
+
+
+def _minute(value, ceil=False):
+    delta = value - EPOCH
+    minutes, rest = divmod(delta, timedelta(minutes=1))
+    return minutes + (1 if ceil and rest else 0)
+
+
+class Tariff:
+    """Prices stays from prefix sums over a one-week per-minute rate table.
+
+    The charge for any interval is the difference of two cumulative sums,
+    so a stay costs one table lookup per 24-hour period instead of a walk
+    over its minutes. Amounts are kept as integer paise x minutes/hour
+    until the final rounding, so the scalar and batch paths agree exactly.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or load_tariff()
+        self.grace = int(self.config["grace_minutes"])
+        self.round_to = max(1, int(round(100 * self.config["round_to"])))  # paise
+        self.caps = [int(round(100 * 60 * self.config[key])) for key in ("daily_cap", "ev_daily_cap")]
+        self._cum = []
+        for ev in (False, True):
+            cum = [0]
+            for rate in week_rates(self.config["bands"], ev):
+                cum.append(cum[-1] + rate)
+            self._cum.append(cum)
+        self._week_cost = [cum[-1] for cum in self._cum]
+        self._cum_array = np.array(self._cum, dtype=np.int64)         # (2, WEEK + 1)
+        self._week_cost_array = np.array(self._week_cost, dtype=np.int64)
+        self._cap_array = np.array(self.caps, dtype=np.int64)
+
+    def _charged(self, units):
+        paise = -(-units // 60)
+        return -(-paise // self.round_to) * self.round_to
+
+    def _cost_to(self, ev, minute):
+        weeks, offset = divmod(minute, WEEK)
+        return weeks * self._week_cost[ev] + self._cum[ev][offset]
+
+    # Function to price one stay (exit gate path)
+    def price_minutes(self, start, end, is_ev=False):
+        """Fee in paise for [start, end) given as minutes since EPOCH."""
+        if end - start <= self.grace:
+            return 0
+        ev = int(bool(is_ev))
+        cap = self.caps[ev]
+        units, t = 0, start
+        while end - t > DAY:
+            units += min(self._cost_to(ev, t + DAY) - self._cost_to(ev, t), cap)
+            t += DAY
+        units += min(self._cost_to(ev, end) - self._cost_to(ev, t), cap)
+        return self._charged(units)
+
+    def price(self, entry_time, exit_time=None, is_ev=False):
+        """Fee in rupees for one stay. Part minutes are charged as whole minutes."""
+        exit_time = exit_time or datetime.now()
+        return self.price_minutes(_minute(entry_time), _minute(exit_time, ceil=True), is_ev) / 100
+
+    # Function to price many stays at once (month-end repricing)
+    def price_batch(self, entry_times, exit_times, is_ev):
+        """Vectorised price() over columnar arrays; returns a float64 array of fees in rupees."""
+        entry_seconds = (np.asarray(entry_times, dtype="datetime64[s]") - EPOCH64).astype(np.int64)
+        exit_seconds = (np.asarray(exit_times, dtype="datetime64[s]") - EPOCH64).astype(np.int64)
+        start = entry_seconds // 60
+        end = -(-exit_seconds // 60)
+        ev = np.asarray(is_ev, dtype=bool).astype(np.intp)
+        cum = self._cum_array
+        week_cost = self._week_cost_array[ev]
+        cap = self._cap_array[ev]
+
+        def cost_to(minute, rows=slice(None)):
+            weeks, offset = np.divmod(minute, WEEK)
+            return weeks * week_cost[rows] + cum[ev[rows], offset]
+
+        units = np.zeros(len(start), dtype=np.int64)
+        t = start.copy()
+        # Whole 24-hour periods, each capped on its own; only long stays take part in later rounds
+        long_stays = np.nonzero(end - t > DAY)[0]
+        while len(long_stays):
+            period = np.minimum(cost_to(t[long_stays] + DAY, long_stays) - cost_to(t[long_stays], long_stays),
+                                cap[long_stays])
+            units[long_stays] += period
+            t[long_stays] += DAY
+            long_stays = long_stays[end[long_stays] - t[long_stays] > DAY]
+        units += np.minimum(cost_to(end) - cost_to(t), cap)
+        units[end - start <= self.grace] = 0
+
+        paise = -(-units // 60)
+        paise = -(-paise // self.round_to) * self.round_to
+        return paise / 100.0
+
+
+TARIFF = Tariff()
+
+
+# Function to load a month of finished stays as column arrays
+def load_month(cursor, month, lot_id=None):
+    """Return (entry_ids, lot_ids, entry_times, exit_times, is_ev) for stays that exited in `month` (YYYY-MM)."""
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    sql = ("SELECT entry_id, lot_id, entry_time, exit_time, is_ev FROM SmartParkingHistory "
+           "WHERE exit_time >= %s AND exit_time < %s")  # prunes to the month's partition
+    params = [start, end]
+    if lot_id:
+        sql += " AND lot_id = %s"
+        params.append(lot_id)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    if not rows:
+        return np.array([], np.int64), [], np.array([], "datetime64[s]"), np.array([], "datetime64[s]"), np.array([], bool)
+    entry_ids, lot_ids, entry_times, exit_times, is_ev = zip(*rows)
+    return (np.array(entry_ids, np.int64), list(lot_ids), np.array(entry_times, "datetime64[s]"),
+            np.array(exit_times, "datetime64[s]"), np.array(is_ev, bool))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price parking stays with the configured tariff.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    quote = sub.add_parser("quote", help="Price a single stay")
+    quote.add_argument("entry", help="Entry time, ISO format")
+    quote.add_argument("exit", nargs="?", help="Exit time, ISO format (default: now)")
+    quote.add_argument("--ev", action="store_true")
+    reprice = sub.add_parser("reprice", help="Reprice every stay that exited in a month")
+    reprice.add_argument("month", help="YYYY-MM")
+    reprice.add_argument("--lot", help="Only this lot (default: all lots)")
+    reprice.add_argument("--csv", help="Write entry_id,lot_id,fee rows to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.command == "quote":
+        exit_time = datetime.fromisoformat(args.exit) if args.exit else datetime.now()
+        print(f"💰 Fee: ₹{TARIFF.price(datetime.fromisoformat(args.entry), exit_time, args.ev):.2f}")
+        return
+
+    lot_id = resolve_lot(args.lot) if args.lot else None
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        cursor = connection.cursor()
+        entry_ids, lot_ids, entry_times, exit_times, is_ev = load_month(cursor, args.month, lot_id)
+        cursor.close()
+        connection.close()
+    except mysql.connector.Error as err:
+        print(f"❌ Database error: {err}")
+        return
+
+    fees = TARIFF.price_batch(entry_times, exit_times, is_ev)
+    if args.csv:
+        out = sys.stdout if args.csv == "-" else open(args.csv, "w", newline="")
+        writer = csv.writer(out)
+        writer.writerow(["entry_id", "lot_id", "fee"])
+        writer.writerows(zip(entry_ids.tolist(), lot_ids, (f"{fee:.2f}" for fee in fees)))
+        if out is not sys.stdout:
+            out.close()
+    ev_fees = fees[is_ev]
+    print(f"✅ {len(fees)} stays in {args.month}: ₹{fees.sum():,.2f} "
+          f"(EV ₹{ev_fees.sum():,.2f} over {len(ev_fees)} stays, {int((fees == 0).sum())} free)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+import argparse
+import os
+import random
+import sqlite3
+import string
+import threading
+import time
+from datetime import datetime, timedelta
+import mysql.connector
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from parking_archive import HISTORY_COLUMNS
+from parking_lots import LOT_ID, LOTS, lot_slots
+
+# MySQL Database Configuration (the primary the gates write to)
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+# Where read-only endpoint queries go:
+#   primary   the gates' MySQL, as before
+#   replica   a MySQL replica (DB_REPLICA_HOST) while its lag is within max_staleness, else the primary
+#   snapshot  a local SQLite copy of SmartParking, refreshed every snapshot_interval from the replica/primary
+#   local     a SQLite file filled by `python parking_db.py seed` or `pull`; never refreshed, no MySQL needed
+READ_SOURCES = ("primary", "replica", "snapshot", "local")
+
+READ_CONFIG = {
+    "source": os.getenv("DB_READ_FROM", "replica" if os.getenv("DB_REPLICA_HOST") else "primary"),
+    "replica_host": os.getenv("DB_REPLICA_HOST", ""),
+    "replica_port": int(os.getenv("DB_REPLICA_PORT", "3306")),
+    "max_staleness": float(os.getenv("DB_MAX_STALENESS", "5")),       # seconds a read may lag the gates
+    "lag_check": float(os.getenv("DB_LAG_CHECK", "1")),              # seconds between replica lag probes
+    "snapshot_interval": float(os.getenv("DB_SNAPSHOT_INTERVAL", "2")),
+    "snapshot_path": os.getenv("DB_SNAPSHOT_PATH", "read_snapshot.db"),
+    "local_path": os.getenv("DB_LOCAL_PATH", "parking_local.db"),
+}
+
+# Errors a read path can raise, whichever source answered it
+READ_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+# MySQL 8.0.22+ first, then the pre-8.0.22 / MariaDB spelling
+REPLICA_STATUS_SQL = ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS")
+
+SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SmartParking (
+    entry_id INTEGER PRIMARY KEY,
+    lot_id TEXT NOT NULL,
+    vehicle_number TEXT NOT NULL,
+    is_ev INTEGER NOT NULL,
+    slot_number TEXT NOT NULL,
+    entry_time DATETIME NOT NULL,
+    exit_time DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_snapshot_lot_time ON SmartParking (lot_id, entry_time);
+CREATE TABLE IF NOT EXISTS snapshot_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    as_of REAL NOT NULL,              -- unix time the copied rows were current at
+    source TEXT NOT NULL
+);
+"""
+
+# DATETIME columns come back as datetime objects, like mysql.connector returns them
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+def lag_from_status(row):
+    """Replica lag in seconds from a SHOW REPLICA STATUS row (a dict); None when replication is not running."""
+    if not row:
+        return None
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+# Function to take an exclusive lock on `path` without waiting
+def try_lock(path):
+    """Return the open lock file, or None while another process holds it; the OS drops it when we exit."""
+    handle = open(path, "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def _sqlite_value(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else value
+
+
+class SnapshotCursor:
+    """The part of a mysql.connector cursor the read endpoints use, over a SQLite snapshot.
+
+    %s placeholders are rewritten to ?, so the endpoints' SmartParking
+    queries run unchanged.
+    """
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = None
+        self.dictionary = dictionary
+
+    def execute(self, query, params=()):
+        self._cursor = self._conn.execute(query.replace("%s", "?"), tuple(_sqlite_value(p) for p in params))
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return dict(zip((column[0] for column in self._cursor.description), row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+
+
+class SnapshotConnection:
+    """Read-only SQLite connection shaped like a mysql.connector connection."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5,
+                                     detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SnapshotCursor(self._conn, dictionary)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._conn.close()
+
+
+class ReadSnapshot:
+    """A local SQLite copy of SmartParking that dashboards read instead of MySQL.
+
+    SmartParking only holds active stays (finished ones are archived), so
+    a full copy is small. Only the process holding `<path>.lock` refreshes
+    it, every `interval` seconds from `source()`, which returns
+    (connection, lag_seconds); the other servers sharing the file open it
+    read-only and take over the lock if that process exits. However many
+    servers and screens are open, MySQL sees one SELECT per interval.
+    Without a source the file is a fixed local stand-in.
+    """
+
+    def __init__(self, path, source=None, interval=None):
+        self.path = path
+        self.source = source
+        self.interval = interval or READ_CONFIG["snapshot_interval"]
+        self._stop = threading.Event()
+        self._thread = None
+        self._failing = False
+        self.lock_path = path + ".lock"
+        self._lock_file = None
+        if source is None:
+            self._open().close()  # the stand-in exists (empty) until it is seeded
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")  # readers never wait for a refresh
+        conn.executescript(SNAPSHOT_SCHEMA)
+        return conn
+
+    def age(self):
+        """Seconds since the snapshot's rows were current (inf before the first refresh)."""
+        try:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5)
+            try:
+                row = conn.execute("SELECT as_of FROM snapshot_meta WHERE id = 1").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            return float("inf")  # the refreshing process has not written the file yet
+        return time.time() - row[0] if row else float("inf")
+
+    def connect(self):
+        return SnapshotConnection(self.path)
+
+    def fetch_all(self, query, params=()):
+        """Run one read on the snapshot and return dict rows."""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def load(self, rows, as_of=None, source="local"):
+        """Replace the snapshot's rows (tuples in HISTORY_COLUMNS order) in one transaction."""
+        conn = self._open()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM SmartParking")
+            conn.executemany(f"INSERT INTO SmartParking ({HISTORY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [tuple(_sqlite_value(v) for v in row) for row in rows])
+            conn.execute("INSERT OR REPLACE INTO snapshot_meta (id, as_of, source) VALUES (1, ?, ?)",
+                         (time.time() if as_of is None else as_of, source))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return len(rows)
+
+    # Function to copy SmartParking from the source into the snapshot
+    def refresh(self):
+        started = time.time()
+        connection, lag = self.source()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {HISTORY_COLUMNS} FROM SmartParking")
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            connection.close()
+        return self.load(rows, as_of=started - lag, source="mysql")
+
+    # Function to become the refreshing process if no other one holds the lock
+    def claim(self):
+        if self._lock_file is None:
+            self._lock_file = try_lock(self.lock_path)
+        return self._lock_file is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._lock_file is None:
+                if not self.claim():
+                    self._stop.wait(self.interval)
+                    continue
+                print(f"🔒 Took over refreshing {self.path}")
+            try:
+                self.refresh()
+                if self._failing:
+                    print("✅ Read snapshot refreshing again.")
+                self._failing = False
+            except READ_ERRORS as err:
+                if not self._failing:
+                    print(f"⚠️ Read snapshot refresh failed ({err}); reads fall back to MySQL once it is stale.")
+                self._failing = True
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.source is None or self._thread is not None:
+            return
+        if self.claim():
+            print(f"🔒 This process refreshes {self.path} (holds {self.lock_path})")
+        else:
+            print(f"📖 Another process refreshes {self.path}; reading it read-only")
+        self._thread = threading.Thread(target=self._run, name="read-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class ReadRouter:
+    """Sends read-only endpoint queries to a replica or snapshot; everything else stays on the primary.
+
+    Staleness is bounded by max_staleness: a replica whose last probed
+    lag exceeds it (or that is not replicating) and a snapshot older than
+    it are skipped in favour of the primary. Replica lag is probed at
+    most every lag_check seconds, so the bound holds to within that.
+    Writes never go through the router; use primary() or the caller's
+    own DB_CONFIG.
+    """
+
+    def __init__(self, primary_config=None, source=None, replica_host=None, max_staleness=None):
+        self.primary_config = dict(primary_config or DB_CONFIG)
+        self.source = source or READ_CONFIG["source"]
+        if self.source not in READ_SOURCES:
+            raise ValueError(f"Unknown DB_READ_FROM {self.source!r}: choose one of {', '.join(READ_SOURCES)}")
+        host = READ_CONFIG["replica_host"] if replica_host is None else replica_host
+        self.replica_config = dict(self.primary_config, host=host, port=READ_CONFIG["replica_port"]) if host else None
+        self.max_staleness = READ_CONFIG["max_staleness"] if max_staleness is None else max_staleness
+        self.last_lag = None
+        self._lag_checked = float("-inf")
+        self._replica_ok = True
+        self._lock = threading.Lock()
+        self.snapshot = None
+        if self.source == "replica" and self.replica_config is None:
+            print("⚠️ DB_READ_FROM=replica but DB_REPLICA_HOST is not set; reading from the primary.")
+        if self.source == "snapshot":
+            self.snapshot = ReadSnapshot(READ_CONFIG["snapshot_path"], self.live)
+            if self.snapshot.interval >= self.max_staleness:
+                print(f"⚠️ DB_SNAPSHOT_INTERVAL ({self.snapshot.interval:g}s) is not below DB_MAX_STALENESS "
+                      f"({self.max_staleness:g}s); most snapshot reads will fall back to MySQL.")
+        elif self.source == "local":
+            self.snapshot = ReadSnapshot(READ_CONFIG["local_path"])
+
+    def primary(self):
+        return mysql.connector.connect(**self.primary_config)
+
+    def replica_lag(self, connection):
+        """Cached replica lag in seconds, re-probed on `connection` every lag_check seconds."""
+        with self._lock:
+            if time.monotonic() - self._lag_checked < READ_CONFIG["lag_check"]:
+                return self.last_lag
+            self._lag_checked = time.monotonic()
+        lag = None
+        cursor = connection.cursor(dictionary=True)
+        for sql in REPLICA_STATUS_SQL:
+            try:
+                cursor.execute(sql)
+                lag = lag_from_status(cursor.fetchone())
+                break
+            except mysql.connector.Error:
+                continue
+        cursor.close()
+        self.last_lag = lag
+        return lag
+
+    def _replica_state(self, ok, reason=""):
+        if ok != self._replica_ok:
+            print("✅ Reads back on the replica." if ok else f"⚠️ Replica skipped ({reason}); reading from the primary.")
+        self._replica_ok = ok
+
+    # Function to open a MySQL connection for reads: the replica while fresh, else the primary
+    def live(self):
+        """Returns (connection, lag_seconds); the lag is 0 for the primary."""
+        if self.replica_config is not None and self.source != "primary":
+            try:
+                connection = mysql.connector.connect(**self.replica_config)
+            except mysql.connector.Error as err:
+                self._replica_state(False, str(err))
+            else:
+                lag = self.replica_lag(connection)
+                if lag is not None and lag <= self.max_staleness:
+                    self._replica_state(True)
+                    return connection, lag
+                connection.close()
+                self._replica_state(False, "not replicating" if lag is None else f"{lag:.0f}s behind")
+        return self.primary(), 0.0
+
+    def use_snapshot(self):
+        """True when an active-stays read may be answered by the snapshot right now."""
+        if self.snapshot is None:
+            return False
+        return self.source == "local" or self.snapshot.age() <= self.max_staleness
+
+    def connect(self, active_only=False):
+        """Connection for a read-only query.
+
+        active_only: the query reads nothing but SmartParking, so the
+        snapshot may answer it. History, rollups and exports always read
+        MySQL (replica or primary).
+        """
+        if active_only and self.use_snapshot():
+            return self.snapshot.connect()
+        return self.live()[0]
+
+    def start(self):
+        """Start the snapshot refresher (snapshot mode only; one process per file refreshes); call once from main."""
+        if self.source == "snapshot":
+            self.snapshot.start()
+        print(f"📚 Dashboard reads: {self.describe()}")
+
+    def stop(self):
+        if self.snapshot is not None:
+            self.snapshot.stop()
+
+    def describe(self):
+        if self.source == "local":
+            return f"local stand-in {self.snapshot.path}"
+        if self.source == "snapshot":
+            return (f"snapshot {self.snapshot.path} every {self.snapshot.interval:g}s "
+                    f"(stale after {self.max_staleness:g}s)")
+        if self.source == "replica" and self.replica_config is not None:
+            return f"replica {self.replica_config['host']} (lag up to {self.max_staleness:g}s)"
+        return "primary"
+
+
+def random_plate():
+    return (random.choice(["KA", "KL", "TN", "MH", "DL"]) + f"{random.randint(1, 99):02d}"
+            + "".join(random.choices(string.ascii_uppercase, k=2)) + f"{random.randint(0, 9999):04d}")
+
+
+# Function to fill a local stand-in with random active stays
+def seed_local(path, occupancy=0.6, lots=None):
+    """One stay in roughly `occupancy` of every slot of each lot; returns the number of rows."""
+    now = datetime.now().replace(microsecond=0)
+    rows, entry_id = [], 0
+    for lot_id in lots or LOTS:
+        for zone in ("regular", "EV"):
+            for slot in lot_slots(lot_id, zone):
+                if random.random() < occupancy:
+                    entry_id += 1
+                    entry_time = now - timedelta(minutes=random.randint(1, 8 * 60))
+                    rows.append((entry_id, lot_id, random_plate(), int(zone == "EV"), slot, entry_time, None))
+    return ReadSnapshot(path).load(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read snapshot and local stand-in for the dashboards' reads.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    seed = sub.add_parser("seed", help="Fill a local stand-in with random active stays")
+    seed.add_argument("--path", default=READ_CONFIG["local_path"])
+    seed.add_argument("--occupancy", type=float, default=0.6)
+    seed.add_argument("--lot", action="append", help="Lot id (repeatable; default: every configured lot)")
+    pull = sub.add_parser("pull", help="Copy SmartParking from MySQL into a snapshot file once")
+    pull.add_argument("--path", default=READ_CONFIG["local_path"])
+    sub.add_parser("status", help="Show the configured read source, replica lag and snapshot age")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        rows = seed_local(args.path, args.occupancy, args.lot)
+        print(f"🌱 Seeded {rows} active stays into {args.path} (use DB_READ_FROM=local DB_LOCAL_PATH={args.path})")
+    elif args.command == "pull":
+        router = ReadRouter(source="replica" if READ_CONFIG["replica_host"] else "primary")
+        rows = ReadSnapshot(args.path, router.live).refresh()
+        print(f"📥 Copied {rows} active stays into {args.path}")
+    else:
+        router = ReadRouter()
+        print(f"📚 Reads: {router.describe()} (default lot {LOT_ID})")
+        if router.replica_config is not None:
+            try:
+                connection = mysql.connector.connect(**router.replica_config)
+                lag = router.replica_lag(connection)
+                connection.close()
+                print(f"   replica lag: {'not replicating' if lag is None else f'{lag:.0f}s'}")
+            except mysql.connector.Error as err:
+                print(f"❌ Replica unreachable: {err}")
+        if router.snapshot is not None:
+            print(f"   snapshot age: {router.snapshot.age():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+import mysql.connector
+from parking_lots import DEFAULT_LOT
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+EXPORT_COLUMNS = ("entry_id", "lot_id", "vehicle_number", "is_ev", "slot_number", "entry_time", "exit_time")
+EXIT_TIME = EXPORT_COLUMNS.index("exit_time")
+IS_EV = EXPORT_COLUMNS.index("is_ev")
+EXPORT_CHUNK = 5000
+FORMATS = ("csv", "ndjson", "parquet")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+# Function to build the export query over active and archived stays
+def export_query(since=None, until=None, lot_id=None):
+    """Return (sql, params) selecting EXPORT_COLUMNS, optionally bounded by entry_time and lot."""
+    where, params = [], []
+    if lot_id:
+        where.append("lot_id = %s")
+        params.append(lot_id)
+    if since:
+        where.append("entry_time >= %s")
+        params.append(since)
+    if until:
+        where.append("entry_time < %s")
+        params.append(until)
+    clause = f" WHERE {' AND '.join(where)}" if where else ""
+    columns = ", ".join(EXPORT_COLUMNS)
+    sql = (f"SELECT {columns} FROM SmartParkingHistory{clause} "
+           f"UNION ALL SELECT {columns} FROM SmartParking{clause}")
+    return sql, params * 2
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+class CsvEncoder:
+    def header(self):
+        return (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+
+    def encode(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([["" if v is None else _cell(v) for v in row] for row in rows])
+        return buffer.getvalue().encode()
+
+    def footer(self):
+        return b""
+
+
+class NdjsonEncoder:
+    def header(self):
+        return b""
+
+    def encode(self, rows):
+        return "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_cell, row)))) + "\n" for row in rows
+        ).encode()
+
+    def footer(self):
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """File-like sink that hands back whatever pyarrow has written so far."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """One row group per chunk; only the current chunk is ever held in memory."""
+
+    def __init__(self):
+        import pyarrow as pa  # optional dependency, only needed for Parquet
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([
+            ("entry_id", pa.int64()),
+            ("lot_id", pa.string()),
+            ("vehicle_number", pa.string()),
+            ("is_ev", pa.bool_()),
+            ("slot_number", pa.string()),
+            ("entry_time", pa.timestamp("s")),
+            ("exit_time", pa.timestamp("s")),
+        ])
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+
+    def header(self):
+        return self.sink.drain()
+
+    def encode(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in EXPORT_COLUMNS]
+        arrays = [self.pa.array([None if v is None else (bool(v) if i == IS_EV else v) for v in column],
+                                type=self.schema.field(i).type)
+                  for i, column in enumerate(columns)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.drain()
+
+    def footer(self):
+        self.writer.close()
+        return self.sink.drain()
+
+
+def make_encoder(fmt):
+    if fmt == "csv":
+        return CsvEncoder()
+    if fmt == "ndjson":
+        return NdjsonEncoder()
+    if fmt == "parquet":
+        return ParquetEncoder()
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+# Function to stream an export as encoded byte chunks with constant memory
+def stream_export(connection, fmt="csv", since=None, until=None, chunk_size=EXPORT_CHUNK, lot_id=None):
+    """Yield encoded chunks. Uses an unbuffered (server-side) cursor and fetchmany()."""
+    encoder = make_encoder(fmt)
+    sql, params = export_query(since, until, lot_id)
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(sql, params)
+        data = encoder.header()
+        if data:
+            yield data
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            data = encoder.encode(rows)
+            if data:
+                yield data
+        data = encoder.footer()
+        if data:
+            yield data
+    finally:
+        cursor.close()
+
+
+# ---- bulk import ----------------------------------------------------------
+
+def _parse_time(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _normalise(record):
+    return (
+        int(record["entry_id"]),
+        record.get("lot_id") or DEFAULT_LOT,  # exports from before multi-lot have no lot_id
+        record["vehicle_number"],
+        int(record["is_ev"] in (1, True, "1", "True", "true")),
+        record["slot_number"],
+        _parse_time(record["entry_time"]),
+        _parse_time(record.get("exit_time")),
+    )
+
+
+def read_records(path, fmt):
+    """Yield export rows from a CSV, NDJSON or Parquet file one at a time."""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=EXPORT_CHUNK):
+            for record in batch.to_pylist():
+                yield _normalise(record)
+        return
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            for record in csv.DictReader(f):
+                yield _normalise(record)
+        else:
+            for line in f:
+                if line.strip():
+                    yield _normalise(json.loads(line))
+
+
+def _flush_batch(connection, batch):
+    cursor = connection.cursor()
+    columns = ", ".join(EXPORT_COLUMNS)
+    placeholders = ", ".join(["%s"] * len(EXPORT_COLUMNS))
+    finished = [row for row in batch if row[EXIT_TIME] is not None]
+    active = [row for row in batch if row[EXIT_TIME] is None]
+    if finished:
+        cursor.executemany(
+            f"INSERT IGNORE INTO SmartParkingHistory ({columns}) VALUES ({placeholders})", finished)
+    if active:
+        cursor.executemany(
+            f"INSERT IGNORE INTO SmartParking ({columns}) VALUES ({placeholders})", active)
+    connection.commit()
+    cursor.close()
+
+
+# Function to bulk load an export file with batched executemany
+def import_file(connection, path, fmt, batch_size=EXPORT_CHUNK):
+    total, batch = 0, []
+    for row in read_records(path, fmt):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _flush_batch(connection, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        _flush_batch(connection, batch)
+        total += len(batch)
+    return total
+
+
+# Function to bulk load a CSV export with LOAD DATA LOCAL INFILE
+def load_data_csv(connection, path):
+    """Fastest path for CSV: load into a staging table, then split active/finished rows.
+
+    The connection must be opened with allow_local_infile=True.
+    """
+    columns = ", ".join(EXPORT_COLUMNS)
+    cursor = connection.cursor()
+    cursor.execute(
+        "CREATE TEMPORARY TABLE IF NOT EXISTS SmartParkingImport ("
+        "entry_id INT, lot_id VARCHAR(32), vehicle_number VARCHAR(20), is_ev TINYINT(1), slot_number VARCHAR(10), "
+        "entry_time DATETIME, exit_time DATETIME NULL)"
+    )
+    cursor.execute("TRUNCATE TABLE SmartParkingImport")
+    cursor.execute(
+        "LOAD DATA LOCAL INFILE %s INTO TABLE SmartParkingImport "
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\r\\n' IGNORE 1 LINES "
+        "(entry_id, lot_id, vehicle_number, @is_ev, slot_number, entry_time, @exit_time) "
+        "SET is_ev = (@is_ev IN ('1', 'True', 'true')), exit_time = NULLIF(@exit_time, '')",
+        (os.path.abspath(path),),
+    )
+    loaded = cursor.rowcount
+    cursor.execute(f"INSERT IGNORE INTO SmartParkingHistory ({columns}) "
+                   f"SELECT {columns} FROM SmartParkingImport WHERE exit_time IS NOT NULL")
+    cursor.execute(f"INSERT IGNORE INTO SmartParking ({columns}) "
+                   f"SELECT {columns} FROM SmartParkingImport WHERE exit_time IS NULL")
+    cursor.execute("DROP TEMPORARY TABLE SmartParkingImport")
+    connection.commit()
+    cursor.close()
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream SmartParking history out, or bulk load it back in.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="Export active and archived stays")
+    export_parser.add_argument("--format", choices=FORMATS, default="csv")
+    export_parser.add_argument("--out", help="Output file (default: stdout)")
+    export_parser.add_argument("--since", help="Only stays with entry_time >= this (YYYY-MM-DD[ HH:MM:SS])")
+    export_parser.add_argument("--until", help="Only stays with entry_time < this")
+    export_parser.add_argument("--lot", help="Only stays in this parking lot")
+
+    import_parser = sub.add_parser("import", help="Bulk load an export file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=FORMATS, default="csv")
+    import_parser.add_argument("--batch", type=int, default=EXPORT_CHUNK)
+    import_parser.add_argument("--load-data", action="store_true", help="Use LOAD DATA LOCAL INFILE (CSV only)")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            connection = mysql.connector.connect(**DB_CONFIG)
+            out = open(args.out, "wb") if args.out else sys.stdout.buffer
+            try:
+                for chunk in stream_export(connection, args.format, args.since, args.until, lot_id=args.lot):
+                    out.write(chunk)
+            finally:
+                if args.out:
+                    out.close()
+                connection.close()
+        else:
+            connection = mysql.connector.connect(allow_local_infile=args.load_data, **DB_CONFIG)
+            try:
+                if args.load_data:
+                    if args.format != "csv":
+                        parser.error("--load-data only supports CSV")
+                    total = load_data_csv(connection, args.path)
+                else:
+                    total = import_file(connection, args.path, args.format, args.batch)
+            finally:
+                connection.close()
+            print(f"✅ Imported {total} row(s) from {args.path}", file=sys.stderr)
+    except mysql.connector.Error as err:
+        print(f"❌ Database error: {err}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import re
+import mysql.connector
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+# Lot served by this process (gate scripts) and the default for API requests without one
+DEFAULT_LOT = "main"
+LOT_ID = os.getenv("PARKING_LOT", DEFAULT_LOT)
+
+LOTS_CONFIG_PATH = os.getenv("PARKING_LOTS_CONFIG", "lots.json")
+
+# The original single site: A1-A9 regular, EV1-EV5 charging
+DEFAULT_LOTS = {
+    DEFAULT_LOT: {"regular": {"prefix": "A", "count": 9}, "ev": {"prefix": "EV", "count": 5}},
+}
+
+# Lot ids become partition names, so keep them to identifier characters
+LOT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_]{1,32}$")
+
+
+def _expand(spec):
+    if isinstance(spec, dict):
+        return [f"{spec['prefix']}{i}" for i in range(spec.get("start", 1), spec.get("start", 1) + spec["count"])]
+    return list(spec)
+
+
+# Function to load {lot_id: {"regular": [...], "ev": [...]}} from lots.json
+def load_lots(path=None):
+    """Slots may be listed explicitly or as {"prefix": "A", "count": 9}."""
+    path = path or LOTS_CONFIG_PATH
+    config = DEFAULT_LOTS
+    if os.path.exists(path):
+        with open(path) as f:
+            config = json.load(f)
+        config = config.get("lots", config)
+    lots = {}
+    for lot_id, zones in config.items():
+        if not LOT_ID_PATTERN.match(lot_id):
+            raise ValueError(f"Invalid lot id {lot_id!r}: use letters, digits and '_' only")
+        lots[lot_id] = {"regular": _expand(zones.get("regular", [])), "ev": _expand(zones.get("ev", []))}
+    return lots
+
+
+LOTS = load_lots()
+
+
+def lot_ids():
+    return list(LOTS)
+
+
+def resolve_lot(lot_id=None):
+    """Return a known lot id (the process default when None); raises ValueError otherwise."""
+    lot_id = lot_id or LOT_ID
+    if lot_id not in LOTS:
+        raise ValueError(f"Unknown parking lot: {lot_id}")
+    return lot_id
+
+
+def lot_slots(lot_id, zone=None):
+    lot = LOTS[resolve_lot(lot_id)]
+    if zone is None:
+        return lot["regular"] + lot["ev"]
+    return lot["ev"] if zone == "EV" else lot["regular"]
+
+
+def zone_capacity(lot_id=None):
+    """Slots per rollup zone for one lot, or summed over all lots when lot_id is None."""
+    lots = [LOTS[resolve_lot(lot_id)]] if lot_id else LOTS.values()
+    return {
+        "EV": sum(len(lot["ev"]) for lot in lots),
+        "regular": sum(len(lot["regular"]) for lot in lots),
+    }
+
+
+# Function to pick the next free slot in the vehicle's own zone of a lot
+def next_free_slot(lot_id, taken, is_ev, spill=False):
+    """With spill=True a full zone falls back to the other one (EV bays for regular cars and vice versa)."""
+    lot = LOTS[resolve_lot(lot_id)]
+    order = (lot["ev"], lot["regular"]) if is_ev else (lot["regular"], lot["ev"])
+    for slots in order[:2 if spill else 1]:
+        for slot in slots:
+            if slot not in taken:
+                return slot
+    return None
+
+
+# ---- schema ----------------------------------------------------------------
+
+# Tables that gain a lot_id column, with the migration that adds it
+LOT_COLUMNS = {
+    "SmartParking": "ALTER TABLE SmartParking ADD COLUMN lot_id VARCHAR(32) NOT NULL DEFAULT '{lot}' AFTER entry_id",
+    "SmartParkingHistory": "ALTER TABLE SmartParkingHistory ADD COLUMN lot_id VARCHAR(32) NOT NULL DEFAULT '{lot}' AFTER entry_id",
+    "OccupancyRollup": "ALTER TABLE OccupancyRollup ADD COLUMN lot_id VARCHAR(32) NOT NULL DEFAULT '{lot}' FIRST, "
+                       "DROP PRIMARY KEY, ADD PRIMARY KEY (lot_id, bucket_start, zone)",
+    "SlotOccupancy": "ALTER TABLE SlotOccupancy ADD COLUMN lot_id VARCHAR(32) NOT NULL DEFAULT '{lot}' FIRST, "
+                     "DROP PRIMARY KEY, ADD PRIMARY KEY (lot_id, slot_number)",
+}
+
+# Every hot-table lookup is prefixed by lot_id, so row and gap locks never span lots
+LOT_INDEXES = {
+    "SmartParking": (
+        ("idx_lot_slot", "CREATE INDEX idx_lot_slot ON SmartParking (lot_id, slot_number, exit_time)"),
+        ("idx_lot_vehicle", "CREATE INDEX idx_lot_vehicle ON SmartParking (lot_id, vehicle_number, exit_time)"),
+    ),
+    "SmartParkingHistory": (
+        ("idx_history_lot", "CREATE INDEX idx_history_lot ON SmartParkingHistory (lot_id, exit_time)"),
+        ("idx_history_lot_slot", "CREATE INDEX idx_history_lot_slot ON SmartParkingHistory (lot_id, slot_number, exit_time)"),
+    ),
+}
+
+# Single-lot indexes superseded by the lot-prefixed ones
+LEGACY_INDEXES = {
+    "SmartParking": ("idx_active_slot", "idx_active_vehicle"),
+    "SmartParkingHistory": ("idx_history_slot",),
+}
+
+
+def _values(cursor):
+    return [next(iter(row.values())) if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+
+def _table_exists(cursor, table):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,))
+    return _values(cursor)[0] > 0
+
+
+def _has_column(cursor, table, column):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s", (table, column))
+    return _values(cursor)[0] > 0
+
+
+def _indexes(cursor, table):
+    cursor.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+    return set(_values(cursor))
+
+
+def _partitions(cursor, table):
+    cursor.execute(
+        "SELECT partition_name FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL", (table,))
+    return set(_values(cursor))
+
+
+# Function to add lot_id columns and lot-prefixed indexes to an existing single-lot schema
+def ensure_lot_schema(cursor):
+    """Idempotent migration; existing rows are assigned to DEFAULT_LOT."""
+    for table, ddl in LOT_COLUMNS.items():
+        if _table_exists(cursor, table) and not _has_column(cursor, table, "lot_id"):
+            cursor.execute(ddl.format(lot=DEFAULT_LOT))
+
+    for table, indexes in LOT_INDEXES.items():
+        if not _table_exists(cursor, table):
+            continue  # created later with these indexes already in its schema
+        existing = _indexes(cursor, table)
+        for name, ddl in indexes:
+            if name not in existing:
+                cursor.execute(ddl)
+        for name in LEGACY_INDEXES.get(table, ()):
+            if name in existing:
+                cursor.execute(f"DROP INDEX {name} ON {table}")
+    ensure_lot_partitions(cursor)
+
+
+# Function to keep one SmartParking partition per configured lot
+def ensure_lot_partitions(cursor, lots=None):
+    """LIST-partition the hot table by lot_id and add partitions for new lots.
+
+    Each lot's active stays then live in their own partition with their
+    own index trees, so one lot's scans and locks never touch another's.
+    """
+    lots = lots or lot_ids()
+    if not _table_exists(cursor, "SmartParking"):
+        return []
+    existing = _partitions(cursor, "SmartParking")
+    if not existing:
+        # First run: partitioning needs lot_id in the primary key
+        cursor.execute("ALTER TABLE SmartParking DROP PRIMARY KEY, ADD PRIMARY KEY (entry_id, lot_id)")
+        cursor.execute("SELECT DISTINCT lot_id FROM SmartParking")
+        stored = set(_values(cursor))
+        partitions = ", ".join(f"PARTITION p_{lot} VALUES IN ('{lot}')" for lot in sorted(set(lots) | stored))
+        cursor.execute(f"ALTER TABLE SmartParking PARTITION BY LIST COLUMNS (lot_id) ({partitions})")
+        return sorted(set(lots) | stored)
+
+    added = [lot for lot in lots if f"p_{lot}" not in existing]
+    for lot in added:
+        try:
+            cursor.execute(f"ALTER TABLE SmartParking ADD PARTITION (PARTITION p_{lot} VALUES IN ('{lot}'))")
+        except mysql.connector.Error as err:
+            if err.errno != 1517:  # ER_SAME_NAME_PARTITION: another process starting up added it first
+                raise
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage parking lots.")
+    parser.add_argument("command", choices=["migrate", "list"])
+    args = parser.parse_args()
+    if args.command == "list":
+        for lot_id, zones in LOTS.items():
+            print(f"{lot_id}: {len(zones['regular'])} regular, {len(zones['ev'])} EV")
+    else:
+        try:
+            connection = mysql.connector.connect(**DB_CONFIG)
+            cursor = connection.cursor()
+            ensure_lot_schema(cursor)
+            cursor.close()
+            connection.close()
+            print(f"✅ Schema ready for lots: {', '.join(lot_ids())}")
+        except mysql.connector.Error as err:
+            print(f"❌ Database error: {err}")
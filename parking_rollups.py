@@ -0,0 +1,234 @@
+import argparse
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+import mysql.connector
+from parking_lots import LOT_ID, zone_capacity
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+BUCKET = timedelta(hours=1)
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS OccupancyRollup (
+    lot_id VARCHAR(32) NOT NULL DEFAULT 'main',
+    bucket_start DATETIME NOT NULL,
+    zone VARCHAR(16) NOT NULL,
+    entries INT NOT NULL DEFAULT 0,
+    exits INT NOT NULL DEFAULT 0,
+    occupied_seconds BIGINT NOT NULL DEFAULT 0,   -- finished stays only; live stays are added on read
+    dwell_seconds BIGINT NOT NULL DEFAULT 0,      -- total dwell of stays that exited in this bucket
+    PRIMARY KEY (lot_id, bucket_start, zone)
+)
+"""
+
+ROLLUP_UPSERT = (
+    "INSERT INTO OccupancyRollup (lot_id, bucket_start, zone, entries, exits, occupied_seconds, dwell_seconds) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE entries = entries + VALUES(entries), exits = exits + VALUES(exits), "
+    "occupied_seconds = occupied_seconds + VALUES(occupied_seconds), "
+    "dwell_seconds = dwell_seconds + VALUES(dwell_seconds)"
+)
+
+
+def zone_of(slot_number):
+    return "EV" if str(slot_number).upper().startswith("EV") else "regular"
+
+
+def _as_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def bucket_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+# Function to split [start, end) into (hour bucket, seconds) pieces
+def hour_overlaps(start, end):
+    pieces = []
+    bucket = bucket_start(start)
+    while bucket < end:
+        next_bucket = bucket + BUCKET
+        seconds = (min(end, next_bucket) - max(start, bucket)).total_seconds()
+        if seconds > 0:
+            pieces.append((bucket, int(seconds)))
+        bucket = next_bucket
+    return pieces
+
+
+# Functions producing rollup deltas: (lot_id, bucket_start, zone, entries, exits, occupied_seconds, dwell_seconds)
+def entry_deltas(slot_number, entry_time, lot_id=None):
+    return [(lot_id or LOT_ID, bucket_start(_as_datetime(entry_time)), zone_of(slot_number), 1, 0, 0, 0)]
+
+
+def exit_deltas(slot_number, entry_time, exit_time, lot_id=None):
+    entry_time, exit_time = _as_datetime(entry_time), _as_datetime(exit_time)
+    lot_id, zone = lot_id or LOT_ID, zone_of(slot_number)
+    deltas = [(lot_id, bucket, zone, 0, 0, seconds, 0) for bucket, seconds in hour_overlaps(entry_time, exit_time)]
+    dwell = max(0, int((exit_time - entry_time).total_seconds()))
+    deltas.append((lot_id, bucket_start(exit_time), zone, 0, 1, 0, dwell))
+    return deltas
+
+
+def apply_deltas(cursor, deltas):
+    """Upsert rollup deltas inside the caller's transaction."""
+    if deltas:
+        cursor.executemany(ROLLUP_UPSERT, deltas)
+
+
+def record_entry(cursor, slot_number, entry_time, lot_id=None):
+    apply_deltas(cursor, entry_deltas(slot_number, entry_time, lot_id))
+
+
+def record_exit(cursor, slot_number, entry_time, exit_time, lot_id=None):
+    apply_deltas(cursor, exit_deltas(slot_number, entry_time, exit_time, lot_id))
+
+
+# Function to turn raw bucket rows (+ live stays) into the API response
+def summarise(rows, active_stays, start, end, now=None, capacity=None):
+    """rows: (bucket_start, zone, entries, exits, occupied_seconds, dwell_seconds).
+
+    Active stays contribute their elapsed time so far; there are only a few
+    hundred of them, so the work stays proportional to buckets, not history.
+    Rows from several lots are summed; `capacity` is the matching zone_capacity().
+    """
+    now = now or datetime.now()
+    capacity = capacity or zone_capacity()
+    buckets = defaultdict(lambda: [0, 0, 0, 0])
+    for bucket, zone, entries, exits, occupied, dwell in rows:
+        totals = buckets[(bucket, zone)]
+        totals[0] += entries
+        totals[1] += exits
+        totals[2] += occupied
+        totals[3] += dwell
+
+    for slot_number, entry_time in active_stays:
+        live_start, live_end = max(entry_time, start), min(now, end)
+        if live_start < live_end:
+            for bucket, seconds in hour_overlaps(live_start, live_end):
+                buckets[(bucket, zone_of(slot_number))][2] += seconds
+
+    result = []
+    for (bucket, zone), (entries, exits, occupied, dwell) in sorted(buckets.items()):
+        slots = capacity.get(zone) or 1
+        result.append({
+            "bucket_start": bucket.isoformat(),
+            "zone": zone,
+            "entries": entries,
+            "exits": exits,
+            "avg_occupancy": round(occupied / BUCKET.total_seconds(), 3),
+            "occupancy_rate": round(occupied / BUCKET.total_seconds() / slots, 3),
+            "turnover": round(exits / slots, 3),
+            "avg_dwell_minutes": round(dwell / exits / 60, 1) if exits else None,
+        })
+    return result
+
+
+ROLLUP_SELECT = (
+    "SELECT bucket_start, zone, entries, exits, occupied_seconds, dwell_seconds FROM OccupancyRollup "
+    "WHERE bucket_start >= %s AND bucket_start < %s"
+)
+ACTIVE_SELECT = "SELECT slot_number, entry_time FROM SmartParking WHERE exit_time IS NULL AND entry_time < %s"
+
+
+def rollup_query(start, end, zone=None, lot_id=None):
+    """Return (rollup sql, params, active sql, params) for an optional zone and lot."""
+    sql, params = ROLLUP_SELECT, [start, end]
+    active_sql, active_params = ACTIVE_SELECT, [end]
+    if zone:
+        sql += " AND zone = %s"
+        params.append(zone)
+    if lot_id:
+        sql += " AND lot_id = %s"
+        params.append(lot_id)
+        active_sql += " AND lot_id = %s"
+        active_params.append(lot_id)
+    return sql, params, active_sql, active_params
+
+
+def parse_range(start=None, end=None, default_hours=24):
+    end = datetime.fromisoformat(end) if end else bucket_start(datetime.now()) + BUCKET
+    start = datetime.fromisoformat(start) if start else end - timedelta(hours=default_hours)
+    return bucket_start(start), end
+
+
+# Function to read rollups for [start, end) in O(buckets)
+def read_rollups(cursor, start, end, zone=None, lot_id=None):
+    sql, params, active_sql, active_params = rollup_query(start, end, zone, lot_id)
+    cursor.execute(sql, params)
+    rows = [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in cursor.fetchall()]
+    cursor.execute(active_sql, active_params)
+    active = [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in cursor.fetchall()]
+    if zone:
+        active = [stay for stay in active if zone_of(stay[0]) == zone]
+    return summarise(rows, active, start, end, capacity=zone_capacity(lot_id))
+
+
+# Function to rebuild rollups from history (and active entries)
+def backfill(connection, since=None):
+    """Recompute OccupancyRollup from SmartParkingHistory and SmartParking.
+
+    Deltas are aggregated in memory per bucket (a year is ~17k rows), then
+    written in one transaction that replaces the affected range.
+    """
+    since = bucket_start(_as_datetime(since)) if since else None
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+
+    def add(deltas):
+        for lot_id, bucket, zone, entries, exits, occupied, dwell in deltas:
+            if since and bucket < since:
+                continue
+            t = totals[(lot_id, bucket, zone)]
+            t[0] += entries
+            t[1] += exits
+            t[2] += occupied
+            t[3] += dwell
+
+    cursor = connection.cursor(buffered=False)
+    where = " WHERE exit_time >= %s" if since else ""
+    cursor.execute(f"SELECT lot_id, slot_number, entry_time, exit_time FROM SmartParkingHistory{where}",
+                   (since,) if since else ())
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        for lot_id, slot_number, entry_time, exit_time in rows:
+            add(entry_deltas(slot_number, entry_time, lot_id))
+            add(exit_deltas(slot_number, entry_time, exit_time, lot_id))
+    cursor.close()
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT lot_id, slot_number, entry_time FROM SmartParking WHERE exit_time IS NULL")
+    for lot_id, slot_number, entry_time in cursor.fetchall():
+        add(entry_deltas(slot_number, entry_time, lot_id))
+
+    cursor.execute(ROLLUP_SCHEMA)
+    connection.start_transaction()
+    if since:
+        cursor.execute("DELETE FROM OccupancyRollup WHERE bucket_start >= %s", (since,))
+    else:
+        cursor.execute("DELETE FROM OccupancyRollup")
+    apply_deltas(cursor, [(lot, b, z, *t) for (lot, b, z), t in sorted(totals.items())])
+    connection.commit()
+    cursor.close()
+    return len(totals)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain hourly occupancy rollups.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--since", help="Only rebuild buckets from this time (YYYY-MM-DD[ HH:MM:SS])")
+    args = parser.parse_args()
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        buckets = backfill(connection, args.since)
+        connection.close()
+        print(f"✅ Rebuilt {buckets} rollup bucket(s)")
+    except mysql.connector.Error as err:
+        print(f"❌ Database error: {err}")
@@ -1,11 +1,20 @@
-from flask import Flask, request, jsonify, send_file, g
+from collections import defaultdict
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import mysql.connector
 from datetime import datetime
 import os
+import occupancy_log
+from parking_archive import archive_slot_exit, migrate
+from parking_db import READ_ERRORS, ReadRouter
+import parking_rollups
+from parking_lots import lot_slots, resolve_lot
+from response_cache import EncodedPayload, PayloadCache, STATUS_FINGERPRINT_SQL, conditional_response, static_payload
+import sampling_profiler
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+sampling_profiler.register_profile_route(app)  # GET /admin/profile?seconds=N
 
 # Load MySQL credentials from environment variables
 DB_CONFIG = {
@@ -22,41 +31,70 @@ def get_db_connection():
         g.db_cursor = g.db_conn.cursor(dictionary=True)
     return g.db_conn, g.db_cursor
 
+# The slot map's reads go to the replica or read snapshot (DB_READ_FROM); update_slot stays on the primary
+reads = ReadRouter(DB_CONFIG)
+
+def get_read_cursor():
+    if 'read_conn' not in g:
+        g.read_conn = reads.connect(active_only=True)
+        g.read_cursor = g.read_conn.cursor(dictionary=True)
+    return g.read_cursor
+
 # Close database connection after each request
 @app.teardown_appcontext
 def close_db_connection(exception=None):
-    db_conn = g.pop('db_conn', None)
-    db_cursor = g.pop('db_cursor', None)
-    if db_cursor:
-        db_cursor.close()
-    if db_conn:
-        db_conn.close()
+    for conn_key, cursor_key in (('db_conn', 'db_cursor'), ('read_conn', 'read_cursor')):
+        db_conn = g.pop(conn_key, None)
+        db_cursor = g.pop(cursor_key, None)
+        if db_cursor:
+            db_cursor.close()
+        if db_conn:
+            db_conn.close()
+
+# Pre-encoded status payload per lot, rebuilt only when that lot's active stays change
+status_caches = defaultdict(PayloadCache)
+
+# Lot for this request: ?lot=<id> or "lot_id" in the JSON body, else PARKING_LOT
+def request_lot(data=None):
+    return resolve_lot((data or {}).get('lot_id') or request.args.get('lot'))
 
 # Serve the HTML file
 @app.route('/')
 def index():
-    return send_file('pslot.html')
+    return conditional_response(static_payload('pslot.html'), request.headers)
+
+def status_fingerprint(lot_id):
+    cursor = get_read_cursor()
+    cursor.execute(STATUS_FINGERPRINT_SQL, (lot_id,))
+    return tuple(cursor.fetchone().values())
+
+def build_status_payload(lot_id):
+    cursor = get_read_cursor()
+    cursor.execute("SELECT entry_id, slot_number, is_ev, vehicle_number, entry_time, exit_time FROM SmartParking WHERE lot_id = %s AND exit_time IS NULL", (lot_id,))
+    results = cursor.fetchall()
+
+    parking_status = {
+        row['slot_number']: {
+            'entry_id': row['entry_id'],
+            'is_ev': bool(row['is_ev']),
+            'status': 'available' if row['exit_time'] else 'occupied',
+            'vehicle_number': row['vehicle_number'],
+            'entry_time': row['entry_time'].isoformat() if row['entry_time'] else None,
+            'exit_time': row['exit_time'].isoformat() if row['exit_time'] else None
+        } for row in results
+    }
+    return EncodedPayload.from_json(parking_status)
 
 # Get parking status from database
 @app.route('/get_parking_status', methods=['GET'])
 def get_parking_status():
     try:
-        conn, cursor = get_db_connection()
-        cursor.execute("SELECT entry_id, slot_number, is_ev, vehicle_number, entry_time, exit_time FROM SmartParking")
-        results = cursor.fetchall()
-
-        parking_status = {
-            row['slot_number']: {
-                'entry_id': row['entry_id'],
-                'is_ev': bool(row['is_ev']),
-                'status': 'available' if row['exit_time'] else 'occupied',
-                'vehicle_number': row['vehicle_number'],
-                'entry_time': row['entry_time'].isoformat() if row['entry_time'] else None,
-                'exit_time': row['exit_time'].isoformat() if row['exit_time'] else None
-            } for row in results
-        }
-        return jsonify(parking_status)
-    except mysql.connector.Error as err:
+        lot_id = request_lot()
+        payload = status_caches[lot_id].get(lambda: status_fingerprint(lot_id), lambda: build_status_payload(lot_id))
+        return conditional_response(payload, request.headers)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 404
+    except READ_ERRORS as err:
         return jsonify({'error': str(err)}), 500
 
 # Update parking slot status
@@ -71,33 +109,48 @@ def update_slot():
 
         if not slot_number or not action:
             return jsonify({'error': 'Missing required fields'}), 400
+        try:
+            lot_id = request_lot(data)
+        except ValueError as err:
+            return jsonify({'error': str(err)}), 404
+        if slot_number not in lot_slots(lot_id):
+            return jsonify({'error': f'Unknown slot {slot_number} in lot {lot_id}'}), 400
 
         conn, cursor = get_db_connection()
         current_time = datetime.now()
 
         if action == 'entry':
-            cursor.execute("SELECT slot_number, exit_time FROM SmartParking WHERE slot_number = %s AND exit_time IS NULL", (slot_number,))
+            cursor.execute("SELECT slot_number, exit_time FROM SmartParking WHERE lot_id = %s AND slot_number = %s AND exit_time IS NULL FOR UPDATE", (lot_id, slot_number))
             if cursor.fetchone():
                 return jsonify({'error': 'Slot is already occupied'}), 400
 
             cursor.execute(
-                "INSERT INTO SmartParking (slot_number, is_ev, vehicle_number, entry_time, exit_time) VALUES (%s, %s, %s, %s, NULL)",
-                (slot_number, is_ev, vehicle_number, current_time)
+                "INSERT INTO SmartParking (lot_id, slot_number, is_ev, vehicle_number, entry_time, exit_time) VALUES (%s, %s, %s, %s, %s, NULL)",
+                (lot_id, slot_number, is_ev, vehicle_number, current_time)
             )
+            entry_id = cursor.lastrowid
+            parking_rollups.record_entry(cursor, slot_number, current_time, lot_id)
+            occupancy_log.record_entry(cursor, entry_id, lot_id, slot_number, vehicle_number, is_ev, current_time)
 
         elif action == 'exit':
-            cursor.execute("SELECT entry_id FROM SmartParking WHERE slot_number = %s AND exit_time IS NULL", (slot_number,))
-            if not cursor.fetchone():
+            # Move the stay to SmartParkingHistory (locks, copies and deletes in one transaction)
+            if not archive_slot_exit(cursor, slot_number, current_time, lot_id):
+                conn.rollback()
                 return jsonify({'error': 'No vehicle found in this slot'}), 400
 
-            cursor.execute("UPDATE SmartParking SET exit_time = %s WHERE slot_number = %s AND exit_time IS NULL", (current_time, slot_number))
-
         conn.commit()
+        status_caches[lot_id].invalidate()
         return jsonify({'success': True})
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 500
 
 if __name__ == '__main__':
     from waitress import serve
+    sampling_profiler.install()
+    try:
+        migrate(DB_CONFIG)
+    except mysql.connector.Error as err:
+        print(f"⚠️ Schema check failed ({err}); entry and exit writes need it")
+    reads.start()
     print("🚀 Server running on http://localhost:9854")
     serve(app, host='0.0.0.0', port=9854)
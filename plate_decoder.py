@@ -0,0 +1,189 @@
+import math
+import os
+from collections import defaultdict
+import cv2
+import numpy as np
+from plate_utils import DIGITS, LETTERS, PLATE_TEMPLATES, template_chars
+
+PLATE_CHARS = LETTERS + DIGITS
+BLANK = 0  # column 0 of the merged probability matrix is the CTC blank
+
+DECODER_CONFIG = {
+    "beam_width": int(os.getenv("PLATE_BEAM_WIDTH", "16")),
+    "min_char_prob": float(os.getenv("PLATE_MIN_CHAR_PROB", "1e-4")),  # rarer extensions are not explored
+    "accept_confidence": float(os.getenv("PLATE_ACCEPT_CONFIDENCE", "0.6")),  # stop OCR-ing further crops
+    "input_height": 64,  # easyocr recognizer line height
+}
+
+NEG_INF = float("-inf")
+
+
+def _logaddexp(a, b):
+    if a == NEG_INF:
+        return b
+    if b == NEG_INF:
+        return a
+    if a > b:
+        return a + math.log1p(math.exp(b - a))
+    return b + math.log1p(math.exp(a - b))
+
+
+class PlateGrammar:
+    """Prefix automaton over PLATE_TEMPLATES.
+
+    A state is the set of templates still consistent with the prefix read
+    so far; transitions are memoised, so each (state, position) is worked
+    out once per process.
+    """
+
+    def __init__(self, templates=PLATE_TEMPLATES):
+        self.templates = tuple(templates)
+        self.start = frozenset(range(len(self.templates)))
+        self._allowed = {}
+        self._next = {}
+
+    def allowed(self, state, position):
+        key = (state, position)
+        if key not in self._allowed:
+            chars = set()
+            for i in state:
+                if position < len(self.templates[i]):
+                    chars.update(template_chars(self.templates[i][position]))
+            self._allowed[key] = frozenset(chars)
+        return self._allowed[key]
+
+    def advance(self, state, position, char):
+        key = (state, position, char)
+        if key not in self._next:
+            self._next[key] = frozenset(
+                i for i in state
+                if position < len(self.templates[i]) and char in template_chars(self.templates[i][position])
+            )
+        return self._next[key]
+
+    def complete(self, state, length):
+        return any(len(self.templates[i]) == length for i in state)
+
+
+GRAMMAR = PlateGrammar()
+
+
+# Function to find the most probable grammar-valid plate in a CTC output
+def constrained_ctc_decode(probs, beam_width=None, min_char_prob=None, grammar=GRAMMAR):
+    """CTC prefix beam search restricted to strings the plate grammar accepts.
+
+    `probs` is a (time, 1 + len(PLATE_CHARS)) matrix of per-frame
+    probabilities with the blank in column 0. Only prefixes the grammar
+    allows are ever extended, so every surviving beam is a valid plate
+    prefix and no post-hoc correction is needed.
+
+    Returns (text, confidence) where confidence is the share of the final
+    beam mass held by the winning string, or (None, 0.0) if no complete
+    plate survives.
+    """
+    beam_width = beam_width or DECODER_CONFIG["beam_width"]
+    min_log = math.log(min_char_prob if min_char_prob is not None else DECODER_CONFIG["min_char_prob"])
+    char_index = {c: i + 1 for i, c in enumerate(PLATE_CHARS)}
+
+    # prefix -> [log P(ends in blank), log P(ends in char)], grammar state
+    beams = {"": [0.0, NEG_INF]}
+    states = {"": grammar.start}
+
+    for row in probs:
+        logs = [math.log(p) if p > 0 else NEG_INF for p in row]
+        candidates = {c for c, i in char_index.items() if logs[i] >= min_log}
+        step = defaultdict(lambda: [NEG_INF, NEG_INF])
+
+        for prefix, (p_blank, p_char) in beams.items():
+            total = _logaddexp(p_blank, p_char)
+            entry = step[prefix]
+            entry[0] = _logaddexp(entry[0], total + logs[BLANK])
+            last = prefix[-1] if prefix else None
+            if last is not None:
+                # Same character held over consecutive frames collapses into one
+                entry[1] = _logaddexp(entry[1], p_char + logs[char_index[last]])
+
+            state = states[prefix]
+            for char in candidates & grammar.allowed(state, len(prefix)):
+                extended = prefix + char
+                if extended not in states:
+                    states[extended] = grammar.advance(state, len(prefix), char)
+                # A repeated character needs a blank in between
+                source = p_blank if char == last else total
+                target = step[extended]
+                target[1] = _logaddexp(target[1], source + logs[char_index[char]])
+
+        ranked = sorted(step.items(), key=lambda item: _logaddexp(*item[1]), reverse=True)
+        beams = dict(ranked[:beam_width])
+
+    scored = [(_logaddexp(*scores), prefix) for prefix, scores in beams.items()]
+    valid = [(score, prefix) for score, prefix in scored if grammar.complete(states[prefix], len(prefix))]
+    if not valid:
+        return None, 0.0
+    best_score, best = max(valid)
+    mass = NEG_INF
+    for score, _ in scored:
+        mass = _logaddexp(mass, score)
+    return best, math.exp(best_score - mass)
+
+
+# Function to fold an easyocr character set onto the plate alphabet
+def merge_columns(character):
+    """Return, per PLATE_CHARS entry, the recognizer columns that read as that character.
+
+    Lower-case letters are folded onto upper case; punctuation, spaces and
+    other symbols are dropped.
+    """
+    columns = defaultdict(list)
+    for i, c in enumerate(character):
+        if i == BLANK:
+            continue
+        columns[c.upper()].append(i)
+    return [columns.get(c, []) for c in PLATE_CHARS]
+
+
+class PlateDecoder:
+    """Reads a plate crop with easyocr's recognizer and decodes it against the plate grammar.
+
+    The crop is treated as one text line (the detector already isolated
+    it), so easyocr's CRAFT text detection is skipped and the recognizer's
+    per-frame character distribution is decoded directly.
+    """
+
+    def __init__(self, reader, beam_width=None, min_char_prob=None):
+        self.reader = reader
+        self.beam_width = beam_width
+        self.min_char_prob = min_char_prob
+        self._columns = merge_columns(reader.converter.character)
+
+    def char_probs(self, image):
+        """Return the (time, 1 + len(PLATE_CHARS)) probability matrix for a crop."""
+        import torch  # only needed once a reader exists
+
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        height = DECODER_CONFIG["input_height"]
+        width = max(height, int(math.ceil(image.shape[1] * height / image.shape[0])))
+        line = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+
+        tensor = torch.from_numpy(line).float().div_(255.0).sub_(0.5).div_(0.5)
+        tensor = tensor.unsqueeze(0).unsqueeze(0).to(self.reader.device)
+        text_for_pred = torch.zeros((1, 1), dtype=torch.long, device=self.reader.device)
+        with torch.no_grad():
+            preds = self.reader.recognizer(tensor, text_for_pred)
+        frames = torch.softmax(preds, dim=2)[0].cpu().numpy()
+
+        merged = np.zeros((frames.shape[0], 1 + len(PLATE_CHARS)), np.float32)
+        merged[:, BLANK] = frames[:, BLANK]
+        for j, columns in enumerate(self._columns, start=1):
+            if columns:
+                merged[:, j] = frames[:, columns].sum(axis=1)
+        merged /= merged.sum(axis=1, keepdims=True)
+        return merged
+
+    def read(self, image):
+        """Return (plate text, confidence), or (None, 0.0) if no valid plate is found."""
+        if image is None or image.size == 0:
+            return None, 0.0
+        probs = self.char_probs(image)
+        return constrained_ctc_decode(probs.tolist(), self.beam_width, self.min_char_prob)
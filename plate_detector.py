@@ -0,0 +1,130 @@
+import os
+import cv2
+import numpy as np
+
+# Plate detector configuration (select the backend with PLATE_DETECTOR=haar|dnn)
+DETECTOR_CONFIG = {
+    "backend": os.getenv("PLATE_DETECTOR", "haar"),
+    "cascade_path": os.getenv("PLATE_CASCADE", "haarcascade_russian_plate_number.xml"),
+    "model_path": os.getenv("PLATE_DNN_MODEL", "plate_detector.onnx"),
+    "runtime": os.getenv("PLATE_DNN_RUNTIME", "opencv"),  # "opencv" or "onnxruntime"
+    "input_size": int(os.getenv("PLATE_DNN_INPUT", "320")),
+    "conf_threshold": float(os.getenv("PLATE_DNN_CONF", "0.4")),
+    "nms_threshold": float(os.getenv("PLATE_DNN_NMS", "0.45")),
+}
+
+
+class HaarPlateDetector:
+    """Haar cascade plate detector (the default backend)."""
+
+    name = "haar"
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5,
+                 min_size=(100, 50), flags=0):
+        self.cascade = cv2.CascadeClassifier(cascade_path or DETECTOR_CONFIG["cascade_path"])
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.flags = flags
+
+    def detect(self, frame, gray=None):
+        """Return a list of (x, y, w, h) plate boxes for a BGR frame."""
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        plates = self.cascade.detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=self.min_size,
+            flags=self.flags,
+        )
+        return [tuple(int(v) for v in box) for box in plates]
+
+
+class DnnPlateDetector:
+    """Single-class ONNX plate detector run through OpenCV DNN or onnxruntime.
+
+    The model is expected to output rows of [cx, cy, w, h, score, ...] in
+    input-pixel coordinates (YOLO-style export; a (1, 5, N) layout is
+    transposed automatically). INT8 (QDQ) models load the same way.
+    """
+
+    name = "dnn"
+
+    def __init__(self, model_path=None, runtime=None, input_size=None,
+                 conf_threshold=None, nms_threshold=None, min_size=(100, 50)):
+        self.model_path = model_path or DETECTOR_CONFIG["model_path"]
+        self.runtime = runtime or DETECTOR_CONFIG["runtime"]
+        self.input_size = input_size or DETECTOR_CONFIG["input_size"]
+        self.conf_threshold = conf_threshold if conf_threshold is not None else DETECTOR_CONFIG["conf_threshold"]
+        self.nms_threshold = nms_threshold if nms_threshold is not None else DETECTOR_CONFIG["nms_threshold"]
+        self.min_size = min_size
+
+        if self.runtime == "onnxruntime":
+            import onnxruntime as ort  # optional dependency, only needed for this runtime
+            self.session = ort.InferenceSession(self.model_path, providers=["CPUExecutionProvider"])
+            self.input_name = self.session.get_inputs()[0].name
+            self.net = None
+        else:
+            self.net = cv2.dnn.readNetFromONNX(self.model_path)
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            self.session = None
+
+    def _infer(self, blob):
+        if self.session is not None:
+            return self.session.run(None, {self.input_name: blob})[0]
+        self.net.setInput(blob)
+        return self.net.forward()
+
+    def detect(self, frame, gray=None):
+        """Return a list of (x, y, w, h) plate boxes for a BGR frame."""
+        frame_h, frame_w = frame.shape[:2]
+        size = self.input_size
+        blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (size, size), swapRB=True, crop=False)
+
+        output = np.squeeze(self._infer(blob))
+        if output.ndim != 2:
+            return []
+        if output.shape[0] < output.shape[1]:
+            output = output.T
+
+        scores = output[:, 4]
+        keep = scores >= self.conf_threshold
+        if not np.any(keep):
+            return []
+        rows, scores = output[keep], scores[keep]
+
+        fx, fy = frame_w / size, frame_h / size
+        w = rows[:, 2] * fx
+        h = rows[:, 3] * fy
+        x = rows[:, 0] * fx - w / 2
+        y = rows[:, 1] * fy - h / 2
+        boxes = np.stack([x, y, w, h], axis=1).round().astype(int).tolist()
+
+        indices = cv2.dnn.NMSBoxes(boxes, scores.tolist(), self.conf_threshold, self.nms_threshold)
+        plates = []
+        for i in np.array(indices).flatten():
+            bx, by, bw, bh = boxes[i]
+            # Clip both corners to the frame so the crop is exactly the visible part of the box
+            x2, y2 = min(frame_w, bx + bw), min(frame_h, by + bh)
+            bx, by = max(bx, 0), max(by, 0)
+            bw, bh = x2 - bx, y2 - by
+            if bw >= self.min_size[0] and bh >= self.min_size[1]:
+                plates.append((bx, by, bw, bh))
+        return plates
+
+
+# Function to build the configured plate detector
+def create_plate_detector(backend=None, **haar_params):
+    """Create the plate detector selected by `backend` or PLATE_DETECTOR.
+
+    `haar_params` (scale_factor, min_neighbors, min_size, flags) tune the Haar
+    backend; `min_size` is also honoured by the DNN backend.
+    """
+    backend = (backend or DETECTOR_CONFIG["backend"]).lower()
+    if backend == "haar":
+        return HaarPlateDetector(**haar_params)
+    if backend == "dnn":
+        return DnnPlateDetector(min_size=haar_params.get("min_size", (100, 50)))
+    raise ValueError(f"Unknown plate detector backend: {backend}")
@@ -0,0 +1,107 @@
+import os
+import cv2
+import numpy as np
+
+# easyocr's recognizer works on 64 px high line images
+OCR_INPUT_HEIGHT = int(os.getenv("PLATE_OCR_HEIGHT", "64"))
+
+# Named strategy chains; a spec may also be a comma-separated list of steps
+PRESETS = {
+    "equalize": ["blur", "equalize"],   # entry01.py / EXIT.py / exit01.py
+    "adaptive": ["adaptive"],           # ENTRYWomen.py
+    "clahe": ["clahe"],
+    "none": [],
+}
+
+_clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 8))
+
+# Each step reads `src` and writes into the preallocated `dst`
+STEPS = {
+    "blur": lambda src, dst: cv2.GaussianBlur(src, (3, 3), 0, dst=dst),
+    "equalize": lambda src, dst: cv2.equalizeHist(src, dst=dst),
+    "adaptive": lambda src, dst: cv2.adaptiveThreshold(
+        src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2, dst=dst),
+    "clahe": lambda src, dst: _clahe.apply(src, dst=dst),
+}
+
+
+# Function to turn a strategy spec ("equalize", "blur,adaptive", ...) into steps
+def parse_strategy(spec):
+    if isinstance(spec, (list, tuple)):
+        steps = list(spec)
+    elif spec in PRESETS:
+        steps = PRESETS[spec]
+    else:
+        steps = [s.strip() for s in spec.split(",") if s.strip()]
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing step(s): {', '.join(unknown)}")
+    return steps
+
+
+class PlatePreprocessor:
+    """Normalise plate crops to OCR_INPUT_HEIGHT and run a chain of steps.
+
+    With `scale` set, crops are resized by that factor instead (ENTRYWomen.py
+    keeps its original 1.5x upscale). Output buffers are preallocated per
+    output size (widths rounded to 8 px at a fixed height) and reused.
+    """
+
+    def __init__(self, strategy="equalize", height=OCR_INPUT_HEIGHT, max_buffers=32, scale=None):
+        self.steps = parse_strategy(strategy)
+        self.strategy = ",".join(self.steps) or "none"
+        self.height = height
+        self.scale = scale
+        self.max_buffers = max_buffers
+        self._buffers = {}
+
+    def _get_buffers(self, height, width):
+        buffers = self._buffers.get((height, width))
+        if buffers is None:
+            if len(self._buffers) >= self.max_buffers:
+                self._buffers.clear()
+            buffers = (
+                np.empty((height, width, 3), np.uint8),  # resized colour crop
+                np.empty((height, width), np.uint8),     # ping
+                np.empty((height, width), np.uint8),     # pong
+            )
+            self._buffers[(height, width)] = buffers
+        return buffers
+
+    def process(self, plate):
+        """Return the preprocessed grayscale crop, or None for an empty crop.
+
+        The result is one of this preprocessor's reused buffers: the next call
+        with the same output size overwrites it. Copy it to keep it longer.
+        """
+        if plate is None or plate.size == 0:
+            return None
+
+        h, w = plate.shape[:2]
+        if self.scale:
+            height, width = max(1, round(h * self.scale)), max(1, round(w * self.scale))
+        else:
+            height, width = self.height, max(8, int(round(w * self.height / h / 8)) * 8)
+        resized, src, dst = self._get_buffers(height, width)
+
+        interpolation = cv2.INTER_AREA if h > height else cv2.INTER_CUBIC
+        if plate.ndim == 2:
+            cv2.resize(plate, (width, height), dst=src, interpolation=interpolation)
+        else:
+            cv2.resize(plate, (width, height), dst=resized, interpolation=interpolation)
+            cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst=src)
+
+        for step in self.steps:
+            STEPS[step](src, dst)
+            src, dst = dst, src
+        return src
+
+
+# Function to build the preprocessor configured for a camera
+def create_preprocessor(default="equalize", camera=0, **options):
+    """Strategy comes from PLATE_PREPROCESS_<camera>, then PLATE_PREPROCESS, then `default`.
+
+    `options` (height, scale, max_buffers) go to PlatePreprocessor.
+    """
+    spec = os.getenv(f"PLATE_PREPROCESS_{camera}") or os.getenv("PLATE_PREPROCESS") or default
+    return PlatePreprocessor(spec, **options)
@@ -0,0 +1,95 @@
+import heapq
+import itertools
+import cv2
+import numpy as np
+
+# Indian plates: single-row 500x120 mm (~4.2:1), two-row 340x200 mm (1.7:1)
+PLATE_ASPECT_RATIOS = (500 / 120, 340 / 200)
+
+QUALITY_CONFIG = {
+    "sharpness_ref": 300.0,   # Laplacian variance treated as "fully sharp"
+    "contrast_ref": 60.0,     # gray-level std treated as "full contrast"
+    "min_width": 100,         # crops narrower than this score 0 on size
+    "good_width": 240,        # crops at least this wide score 1 on size
+    "min_score": 0.35,        # crops below this are never sent to OCR
+    "top_k": 3,               # crops sent to OCR per vehicle
+}
+
+
+# Function to compute a cheap quality score for a plate crop
+def score_plate(plate, gray=None):
+    """Return (score, components) with every component and the score in [0, 1]."""
+    if plate is None or plate.size == 0:
+        return 0.0, {}
+
+    h, w = plate.shape[:2]
+    if gray is None:
+        gray = plate if plate.ndim == 2 else cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY)
+
+    # Measure sharpness on a fixed-height copy so it does not depend on crop size
+    small = cv2.resize(gray, (max(1, w * 48 // h), 48), interpolation=cv2.INTER_AREA)
+    sharpness = min(1.0, cv2.Laplacian(small, cv2.CV_16S).var() / QUALITY_CONFIG["sharpness_ref"])
+    contrast = min(1.0, float(small.std()) / QUALITY_CONFIG["contrast_ref"])
+
+    size = (w - QUALITY_CONFIG["min_width"]) / (QUALITY_CONFIG["good_width"] - QUALITY_CONFIG["min_width"])
+    size = float(np.clip(size, 0.0, 1.0))
+
+    aspect = w / h
+    aspect_error = min(abs(np.log(aspect / ref)) for ref in PLATE_ASPECT_RATIOS)
+    aspect_score = float(max(0.0, 1.0 - aspect_error / 0.7))
+
+    components = {
+        "sharpness": sharpness,
+        "contrast": contrast,
+        "size": size,
+        "aspect": aspect_score,
+    }
+    # Geometric mean: one bad component (e.g. a blurry crop) sinks the score
+    score = float(np.prod([max(v, 1e-3) for v in components.values()]) ** (1 / len(components)))
+    return score, components
+
+
+class CropSelector:
+    """Keep only the top-K crops for one vehicle, ranked by quality score."""
+
+    def __init__(self, top_k=None, min_score=None):
+        self.top_k = top_k or QUALITY_CONFIG["top_k"]
+        self.min_score = min_score if min_score is not None else QUALITY_CONFIG["min_score"]
+        self._heap = []
+        self._counter = itertools.count()
+        self.seen = 0
+        self.dropped = 0
+
+    def offer(self, plate, gray=None, **info):
+        """Score a crop and keep it if it is among the best so far. Returns the score.
+
+        Kept crops and any image passed in `info` (e.g. frame=) are copied,
+        so boxes the gate draws on the live frame afterwards never reach
+        the stored evidence.
+        """
+        self.seen += 1
+        score, _ = score_plate(plate, gray)
+        if score < self.min_score:
+            self.dropped += 1
+            return score
+        if len(self._heap) >= self.top_k and score < self._heap[0][0]:
+            self.dropped += 1
+            return score
+
+        info = {key: value.copy() if isinstance(value, np.ndarray) else value for key, value in info.items()}
+        entry = (score, next(self._counter), plate.copy(), info)
+        if len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heappushpop(self._heap, entry)
+            self.dropped += 1
+        return score
+
+    def best(self):
+        """Return [(score, crop, info), ...] best first."""
+        return [(s, crop, info) for s, _, crop, info in sorted(self._heap, reverse=True)]
+
+    def clear(self):
+        self._heap.clear()
+        self.seen = 0
+        self.dropped = 0
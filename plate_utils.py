@@ -0,0 +1,85 @@
+import re
+import cv2
+import numpy as np
+
+# Plate text and colour helpers shared by the gate scripts.
+# Kept free of easyocr/torch so tools can import them cheaply.
+
+# Indian plate layouts: "A" = letter, "0" = digit, anything else is literal
+PLATE_TEMPLATES = (
+    "AA00AA0000",   # state, district, two-letter series, number   e.g. KA01AB1234
+    "AA00A0000",    # single-letter series                          e.g. DL03C1234
+    "00BH0000AA",   # Bharat series: year, BH, number, letters      e.g. 22BH1234AB
+    "00BH0000A",
+)
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+DIGITS = "0123456789"
+
+
+def template_chars(symbol):
+    """Characters allowed at a template position."""
+    if symbol == "A":
+        return LETTERS
+    if symbol == "0":
+        return DIGITS
+    return symbol
+
+
+def _template_pattern(template):
+    return "".join("[A-Z]" if s == "A" else "[0-9]" if s == "0" else s for s in template)
+
+
+PLATE_PATTERN = re.compile("^(?:" + "|".join(_template_pattern(t) for t in PLATE_TEMPLATES) + ")$")
+
+
+def validate_plate_format(text):
+    """Strict validation for Indian formats: AA00BB0000, AA00B0000 and BH series"""
+    return bool(PLATE_PATTERN.match(text))
+
+
+# Function to correct common misreads of characters
+def correct_character(char, position):
+    """Correct common misreads of characters."""
+    correction_map = {
+        0: {'0':'D', '1':'D', '4':'A', '7':'D', '8':'B'},
+        1: {'0':'L', '1':'I', '2':'Z', '4':'A', '5':'S', '7':'Z', '8':'B'},
+        2: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
+        3: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
+        4: {'0':'D', '1':'I', '2':'Z', '4':'A', '5':'S', '7':'Z', '8':'B'},
+        5: {'0':'D', '1':'I', '2':'Z', '4':'A', '5':'S', '7':'Z', '8':'B'},
+        6: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
+        7: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
+        8: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'},
+        9: {'O':'0', 'I':'1', 'Z':'2', 'A':'4', 'S':'5', 'G':'6', 'Z':'7', 'B':'8'}
+    }
+    return correction_map[position].get(char, char)
+
+
+# Function to apply corrections to the entire plate text
+def correct_plate_text(text):
+    """Apply character corrections to the plate text based on position."""
+    if len(text) != 10:
+        return text
+
+    corrected_text = ""
+    for i, char in enumerate(text):
+        corrected_text += correct_character(char, i)
+
+    return corrected_text
+
+
+# Function to check if a plate is green (EV detection)
+def is_green_plate(plate):
+    if plate is None or plate.size == 0:
+        return False
+
+    hsv = cv2.cvtColor(plate, cv2.COLOR_BGR2HSV)
+    lower_green = np.array([30, 40, 40])
+    upper_green = np.array([90, 255, 255])
+
+    mask = cv2.inRange(hsv, lower_green, upper_green)
+    green_pixels = np.sum(mask == 255)
+    total_pixels = plate.shape[0] * plate.shape[1]
+
+    return (green_pixels / total_pixels) > 0.3
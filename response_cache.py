@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli  # optional: br variants are only produced when installed
+except ImportError:
+    brotli = None
+
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "86400"))
+MIN_COMPRESS_SIZE = 512  # smaller bodies are served as-is
+
+
+class EncodedPayload:
+    """A response body pre-encoded once, with its compressed variants and validators."""
+
+    def __init__(self, body, content_type, last_modified=None, cache_control="no-cache"):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.last_modified = int(last_modified or time.time())
+        self.variants = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=5)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(json.dumps(data, separators=(",", ":")).encode(), "application/json")
+
+
+def _accepts(accept_encoding, coding):
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() == coding:
+            return "q=0" not in params.replace(" ", "")
+    return False
+
+
+def _not_modified(payload, if_none_match, if_modified_since):
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or payload.etag in tags
+    if if_modified_since:
+        try:
+            return payload.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# Function to answer a request from a pre-encoded payload (works for Flask and Quart)
+def conditional_response(payload, request_headers):
+    """Return (body, status, headers): 304 on a validator match, else the best encoding."""
+    headers = {
+        "ETag": payload.etag,
+        "Last-Modified": formatdate(payload.last_modified, usegmt=True),
+        "Cache-Control": payload.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(payload, request_headers.get("If-None-Match"), request_headers.get("If-Modified-Since")):
+        return b"", 304, headers
+
+    body = payload.body
+    accept_encoding = request_headers.get("Accept-Encoding")
+    for coding in ("br", "gzip"):
+        if coding in payload.variants and _accepts(accept_encoding, coding):
+            body = payload.variants[coding]
+            headers["Content-Encoding"] = coding
+            break
+    headers["Content-Type"] = payload.content_type
+    headers["Content-Length"] = str(len(body))
+    return body, 200, headers
+
+
+class PayloadCache:
+    """Keeps one pre-encoded payload and rebuilds it only when the data changes.
+
+    `fingerprint()` must be much cheaper than `build()`; it is called at most
+    once per `check_interval`, so polls in between cost only an ETag compare.
+    """
+
+    def __init__(self, check_interval=0.5):
+        self.check_interval = check_interval
+        self.payload = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._fingerprint = None
+            self._checked_at = 0.0
+
+    def get(self, fingerprint, build):
+        payload = self.payload
+        if payload is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return payload
+        with self._lock:
+            if self.payload is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self.payload
+            current = fingerprint()
+            if self.payload is None or current != self._fingerprint:
+                self.payload = build()
+                self._fingerprint = current
+            self._checked_at = time.monotonic()
+            return self.payload
+
+
+_static_cache = {}
+_static_lock = threading.Lock()
+
+
+# Function to serve a static HTML file with long-lived caching and precompressed variants
+def static_payload(path, content_type="text/html; charset=utf-8", max_age=None):
+    """Re-read the file only when its mtime changes."""
+    max_age = STATIC_MAX_AGE if max_age is None else max_age
+    mtime = os.stat(path).st_mtime
+    cached = _static_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        payload = EncodedPayload(f.read(), content_type, last_modified=mtime,
+                                 cache_control=f"public, max-age={max_age}")
+    with _static_lock:
+        _static_cache[path] = (mtime, payload)
+    return payload
+
+
+# Cheap change detector for one lot's partition of the hot SmartParking table
+STATUS_FINGERPRINT_SQL = (
+    "SELECT COUNT(*), COALESCE(MAX(entry_id), 0), COALESCE(SUM(entry_id), 0) "
+    "FROM SmartParking WHERE lot_id = %s AND exit_time IS NULL"
+)
@@ -0,0 +1,201 @@
+import argparse
+import hmac
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_CONFIG = {
+    "interval": float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,  # time between stack samples
+    "seconds": float(os.getenv("PROFILE_SECONDS", "30")),              # length of a signal-triggered profile
+    "max_seconds": float(os.getenv("PROFILE_MAX_SECONDS", "120")),
+    "output_dir": os.getenv("PROFILE_DIR", "profiles"),
+    "token": os.getenv("PROFILE_TOKEN", ""),  # required by /admin/profile when set; else loopback only
+}
+
+# Without an explicit stage(), a sample is tagged by the innermost frame from one of these modules
+STAGE_RULES = (
+    ("ocr", ("easyocr", "plate_decoder", "ocr_cache", "torch")),
+    ("cascade", ("plate_detector",)),
+    ("db", ("mysql", "aiomysql", "pymysql", "sqlite3", "gate_journal")),
+    ("capture", ("camera_capture",)),
+    ("encode", ("evidence_store", "response_cache", "parking_export")),
+)
+
+# Samples of untagged threads parked in one of these are idle workers, not work
+IDLE_LEAVES = {"threading:wait", "threading:_wait_for_tstate_lock", "selectors:select", "selectors:poll",
+               "queue:get", "socket:accept"}
+
+_stages = {}  # thread ident -> [stage, ...], innermost last
+
+
+@contextmanager
+def stage(name):
+    """Tag samples taken on this thread inside the block, e.g. `with stage("ocr"): ...`."""
+    stack = _stages.setdefault(threading.get_ident(), [])
+    stack.append(name)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack on a timer and writes folded stacks.
+
+    Nothing is traced between samples, so a running profile costs one
+    sys._current_frames() walk per interval and an idle profiler costs
+    nothing. Output is one "thread;[stage];module:function;... count" line
+    per distinct stack, the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=None, output_dir=None, process_name=None):
+        self.interval = interval or PROFILE_CONFIG["interval"]
+        self.output_dir = output_dir or PROFILE_CONFIG["output_dir"]
+        self.process_name = process_name or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+        self._thread = None
+        self._lock = threading.Lock()
+        self._labels = {}  # code object -> (label, stage or None)
+        self.last_path = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _label(self, code):
+        cached = self._labels.get(code)
+        if cached is None:
+            path = code.co_filename
+            module = os.path.splitext(os.path.basename(path))[0]
+            tagged = next((name for name, needles in STAGE_RULES if any(n in path for n in needles)), None)
+            cached = self._labels[code] = (f"{module}:{code.co_name}", tagged)
+        return cached
+
+    def _fold(self, ident, frame, thread_names):
+        labels, tagged = [], None
+        while frame is not None:
+            label, frame_stage = self._label(frame.f_code)
+            labels.append(label)
+            if tagged is None:
+                tagged = frame_stage
+            frame = frame.f_back
+        explicit = _stages.get(ident)
+        if explicit:
+            tagged = explicit[-1]
+        elif labels and labels[0] in IDLE_LEAVES:
+            return None
+        labels.reverse()
+        return ";".join([thread_names.get(ident, str(ident)), f"[{tagged or 'other'}]", *labels])
+
+    def _sample(self, seconds):
+        counts = Counter()
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while time.monotonic() < deadline:
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    folded = self._fold(ident, frame, thread_names)
+                    if folded:
+                        counts[folded] += 1
+            next_sample += self.interval
+            time.sleep(max(0.0, next_sample - time.monotonic()))
+        return counts
+
+    def _write(self, counts):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{self.process_name}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, "w") as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+    # Function to profile for `seconds` on the calling thread and return the output path
+    def profile(self, seconds=None):
+        seconds = min(seconds or PROFILE_CONFIG["seconds"], PROFILE_CONFIG["max_seconds"])
+        counts = self._sample(seconds)
+        self.last_path = self._write(counts)
+        stages = Counter()
+        for stack, count in counts.items():
+            stages[stack.split(";", 2)[1]] += count
+        summary = ", ".join(f"{name} {count / max(1, sum(stages.values())):.0%}" for name, count in stages.most_common())
+        print(f"🔬 Profile written to {self.last_path} ({sum(counts.values())} samples: {summary or 'none'})")
+        return self.last_path
+
+    def start(self, seconds=None):
+        """Profile in the background. Returns False if a profile is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self._thread = threading.Thread(target=self.profile, args=(seconds,), name="sampling-profiler",
+                                            daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        """Wait for the running profile and return its output path."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.last_path
+
+
+PROFILER = SamplingProfiler()
+
+
+# Function to let `kill -USR2 <pid>` start a profile (POSIX only)
+def install(profiler=None):
+    profiler = profiler or PROFILER
+    sig = getattr(signal, "SIGUSR2", None)
+    if sig is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(sig, lambda signum, frame: profiler.start())
+    print(f"🔬 Sampling profiler ready: kill -USR2 {os.getpid()} records {PROFILE_CONFIG['seconds']:.0f}s "
+          f"to {profiler.output_dir}/")
+    return True
+
+
+def authorised(remote_addr, headers, args):
+    """Admin profiling needs PROFILE_TOKEN when set, otherwise a loopback client."""
+    if PROFILE_CONFIG["token"]:
+        supplied = headers.get("X-Admin-Token") or args.get("token") or ""
+        return hmac.compare_digest(supplied, PROFILE_CONFIG["token"])
+    return remote_addr in ("127.0.0.1", "::1")
+
+
+# Function to add GET /admin/profile?seconds=N to a Flask app
+def register_profile_route(app, profiler=None):
+    """Blocks one worker thread for N seconds, then returns the folded stacks as a download."""
+    from flask import Response, jsonify, request
+
+    profiler = profiler or PROFILER
+
+    @app.route('/admin/profile', methods=['GET'])
+    def admin_profile():
+        if not authorised(request.remote_addr, request.headers, request.args):
+            return jsonify({"error": "forbidden"}), 403
+        try:
+            seconds = float(request.args.get('seconds', 10))
+        except ValueError:
+            return jsonify({"error": "seconds must be a number"}), 400
+        if not profiler.start(seconds):
+            return jsonify({"error": "a profile is already running"}), 409
+        path = profiler.wait()
+        with open(path, "rb") as f:
+            body = f.read()
+        return Response(body, mimetype="text/plain",
+                        headers={"Content-Disposition": f"attachment; filename={os.path.basename(path)}"})
+
+    return admin_profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ask a running gate or server to record a profile.")
+    parser.add_argument("pid", type=int)
+    args = parser.parse_args()
+    os.kill(args.pid, signal.SIGUSR2)
+    print(f"🔬 Profile requested from {args.pid}; it will be written to its {PROFILE_CONFIG['output_dir']}/")
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from camera_capture import open_capture
+from parking_lots import LOT_ID
+
+# MySQL Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "..."),
+    "database": os.getenv("DB_NAME", "smart_parking"),
+}
+
+OCCUPANCY_CONFIG = {
+    "process_width": 640,     # frames are downscaled to this width before feature extraction
+    "edge_threshold": 0.08,   # fraction of edge pixels above which a slot looks occupied
+    "diff_threshold": 28.0,   # mean |frame - empty reference| above which a slot looks occupied
+    "stable_frames": 3,       # consecutive frames a new state must hold before it is published
+}
+
+OCCUPANCY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SlotOccupancy (
+    lot_id VARCHAR(32) NOT NULL DEFAULT 'main',
+    slot_number VARCHAR(10) NOT NULL,
+    occupied TINYINT(1) NOT NULL,
+    edge_density FLOAT NOT NULL,
+    mean_diff FLOAT NULL,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (lot_id, slot_number)
+)
+"""
+
+
+# Function to load the per-slot polygon config: {"frame_size": [w, h], "slots": {"A1": [[x, y], ...], ...}}
+def load_slot_polygons(path, frame_size=None):
+    """Points are drawn on a `frame_size` image; they are rescaled to the camera's actual (w, h) when given."""
+    with open(path) as f:
+        config = json.load(f)
+    polygons = config.get("slots", config)
+    polygons = {slot: np.array(points, np.float32) for slot, points in polygons.items() if slot != "frame_size"}
+    drawn_size = config.get("frame_size")
+    if drawn_size and frame_size and tuple(drawn_size) != tuple(frame_size):
+        sx, sy = frame_size[0] / drawn_size[0], frame_size[1] / drawn_size[1]
+        if abs(sx - sy) > 0.01:
+            print(f"⚠️ Slot polygons were drawn at {drawn_size[0]}x{drawn_size[1]} but the camera delivers "
+                  f"{frame_size[0]}x{frame_size[1]} (different aspect ratio); check the regions.")
+        polygons = {slot: points * np.float32([sx, sy]) for slot, points in polygons.items()}
+    return polygons
+
+
+class SlotOccupancyDetector:
+    """Classifies every slot polygon as occupied or free in one vectorised pass.
+
+    Instead of a (slots x H x W) stack of boolean masks, the polygons are
+    rasterised once into a single label image (0 = background, i = slot i).
+    Per-slot sums of any per-pixel feature are then one np.bincount over
+    that image, so the cost is O(pixels) regardless of the slot count.
+    """
+
+    def __init__(self, polygons, frame_size, reference=None, config=None):
+        self.config = dict(OCCUPANCY_CONFIG, **(config or {}))
+        self.slots = list(polygons)
+        frame_w, frame_h = frame_size
+        self.scale = min(1.0, self.config["process_width"] / frame_w)
+        self.size = (int(round(frame_w * self.scale)), int(round(frame_h * self.scale)))
+
+        labels = np.zeros((self.size[1], self.size[0]), np.int32)
+        for i, slot in enumerate(self.slots, start=1):
+            points = np.round(polygons[slot] * self.scale).astype(np.int32)
+            cv2.fillPoly(labels, [points], i)
+        self.labels = labels.ravel()
+        self.counts = np.bincount(self.labels, minlength=len(self.slots) + 1)[1:].astype(np.float32)
+        self.counts[self.counts == 0] = 1.0
+
+        self.reference = self._gray(reference) if reference is not None else None
+        self._gray_buffer = np.empty((self.size[1], self.size[0]), np.uint8)
+        self.state = np.zeros(len(self.slots), bool)
+        self._pending = np.zeros(len(self.slots), np.int32)
+
+    def _gray(self, frame, dst=None):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=dst)
+        return small
+
+    def _slot_means(self, values):
+        sums = np.bincount(self.labels, weights=values.ravel(), minlength=len(self.slots) + 1)[1:]
+        return sums / self.counts
+
+    def features(self, frame):
+        """Return (edge_density, mean_diff or None) arrays, one value per slot."""
+        gray = self._gray(frame, self._gray_buffer)
+        edges = cv2.Canny(gray, 60, 160)
+        edge_density = self._slot_means(edges > 0)
+        mean_diff = None
+        if self.reference is not None:
+            mean_diff = self._slot_means(cv2.absdiff(gray, self.reference))
+        return edge_density, mean_diff
+
+    def classify(self, frame):
+        """Return (occupied array, edge_density, mean_diff) for the raw per-frame decision."""
+        edge_density, mean_diff = self.features(frame)
+        occupied = edge_density > self.config["edge_threshold"]
+        if mean_diff is not None:
+            occupied |= mean_diff > self.config["diff_threshold"]
+        return occupied, edge_density, mean_diff
+
+    def update(self, frame):
+        """Classify a frame and return the list of debounced changes as dicts."""
+        occupied, edge_density, mean_diff = self.classify(frame)
+        differs = occupied != self.state
+        self._pending = np.where(differs, self._pending + 1, 0)
+        flipped = np.flatnonzero(self._pending >= self.config["stable_frames"])
+        self.state[flipped] = occupied[flipped]
+        self._pending[flipped] = 0
+        return [{
+            "slot_number": self.slots[i],
+            "occupied": bool(self.state[i]),
+            "edge_density": float(edge_density[i]),
+            "mean_diff": float(mean_diff[i]) if mean_diff is not None else None,
+        } for i in flipped]
+
+
+# Function to publish occupancy changes to the SlotOccupancy table
+def publish_changes(connection, changes, lot_id=None):
+    if not changes:
+        return
+    now = datetime.now()
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO SlotOccupancy (lot_id, slot_number, occupied, edge_density, mean_diff, updated_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE occupied = VALUES(occupied), "
+        "edge_density = VALUES(edge_density), mean_diff = VALUES(mean_diff), updated_at = VALUES(updated_at)",
+        [(lot_id or LOT_ID, c["slot_number"], int(c["occupied"]), c["edge_density"], c["mean_diff"], now)
+         for c in changes],
+    )
+    connection.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overhead-camera slot occupancy detector.")
+    parser.add_argument("--camera", default="0", help="Camera index or stream URL")
+    parser.add_argument("--config", default="slot_polygons.json", help="Slot polygon config")
+    parser.add_argument("--reference", help="Image of the empty lot (enables the difference feature)")
+    parser.add_argument("--fps", type=float, default=5.0, help="Maximum frames processed per second")
+    parser.add_argument("--lot", default=LOT_ID, help="Parking lot the camera watches (default: PARKING_LOT)")
+    parser.add_argument("--dry-run", action="store_true", help="Print changes instead of writing to MySQL")
+    args = parser.parse_args()
+
+    cap = open_capture(int(args.camera) if args.camera.isdigit() else args.camera, fps=args.fps)
+    ret, frame = cap.read()
+    if not ret:
+        print("⚠️ Error: Could not read frame from camera.")
+        return
+
+    reference = cv2.imread(args.reference) if args.reference else None
+    frame_size = (frame.shape[1], frame.shape[0])
+    detector = SlotOccupancyDetector(load_slot_polygons(args.config, frame_size), frame_size, reference)
+
+    connection = None
+    if not args.dry_run:
+        import mysql.connector
+        connection = mysql.connector.connect(**DB_CONFIG)
+        cursor = connection.cursor()
+        cursor.execute(OCCUPANCY_SCHEMA)
+        cursor.close()
+
+    print(f"🅿️ Watching {len(detector.slots)} slots at up to {args.fps:.0f} fps")
+    interval = 1.0 / args.fps
+    frames, window_start = 0, time.perf_counter()
+    try:
+        while True:
+            started = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            changes = detector.update(frame)
+            for change in changes:
+                print(f"{'🚗' if change['occupied'] else '✅'} {change['slot_number']} "
+                      f"{'occupied' if change['occupied'] else 'free'}")
+            if connection is not None:
+                publish_changes(connection, changes, args.lot)
+
+            frames += 1
+            if time.perf_counter() - window_start >= 10:
+                print(f"⏱ {frames / (time.perf_counter() - window_start):.1f} fps")
+                frames, window_start = 0, time.perf_counter()
+            time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import time
+from exit_matcher import ExitMatcher
+
+
+def make_matcher(active):
+    matcher = ExitMatcher({}, max_distance=2.0, min_margin=1.0, refresh_interval=3600)
+    matcher.active = dict(active)
+    matcher.loaded_at = time.monotonic()  # skip the MySQL load
+    return matcher
+
+
+def test_lone_vehicle_rejects_two_edit_misread():
+    matcher = make_matcher({"KA01AB1234": "A1"})
+    match = matcher.match(["KA01AB9934"])
+    assert match.vehicle_number == "KA01AB1234"
+    assert match.distance == 2.0
+    assert not match.accepted
+
+
+def test_lone_vehicle_accepts_close_read():
+    matcher = make_matcher({"KA01AB1234": "A1"})
+    assert matcher.match(["KA01AB1234"]).accepted
+    assert matcher.match(["KA0IAB1234"]).accepted  # one look-alike swap
+    assert matcher.match(["KA01AB1239"]).accepted  # one substitution
+
+
+def test_runner_up_margin_still_decides():
+    matcher = make_matcher({"KA01AB1234": "A1", "KA01AB1235": "A2"})
+    assert not matcher.match(["KA01AB123"]).accepted  # one deletion from both plates
+    matcher = make_matcher({"KA01AB1234": "A1", "MH12CD5678": "A2"})
+    assert matcher.match(["KA01AB1239"]).accepted
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from plate_detector import DnnPlateDetector
+
+
+def make_detector(rows, input_size=320):
+    """A DnnPlateDetector whose model returns fixed [cx, cy, w, h, score] rows in input pixels."""
+    detector = DnnPlateDetector.__new__(DnnPlateDetector)
+    detector.input_size = input_size
+    detector.conf_threshold = 0.4
+    detector.nms_threshold = 0.45
+    detector.min_size = (10, 5)
+    output = np.array([rows], dtype=np.float32)
+    detector._infer = lambda blob: output
+    return detector
+
+
+def test_boxes_overlapping_the_frame_edges_are_clipped_to_it():
+    frame = np.zeros((320, 640, 3), dtype=np.uint8)   # fx = 2, fy = 1
+    detector = make_detector([
+        [10, 100, 60, 40, 0.9],    # x from -40 to 80 (frame pixels)
+        [300, 300, 60, 60, 0.9],   # x from 540 to 660, y from 270 to 330
+    ])
+    plates = sorted(detector.detect(frame))
+    assert plates == [(0, 80, 80, 40), (540, 270, 100, 50)]
+    for x, y, w, h in plates:
+        assert x >= 0 and y >= 0
+        assert x + w <= frame.shape[1] and y + h <= frame.shape[0]
+
+
+def test_boxes_inside_the_frame_are_unchanged():
+    frame = np.zeros((320, 320, 3), dtype=np.uint8)
+    detector = make_detector([[160, 160, 100, 40, 0.9]])
+    assert detector.detect(frame) == [(110, 140, 100, 40)]
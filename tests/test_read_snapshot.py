@@ -0,0 +1,72 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mysql.connector")
+
+from parking_db import ReadSnapshot
+
+ROW = (1, "main", "KA01AB1234", 0, "A1", datetime(2026, 10, 19, 9, 0), None)
+
+
+class FakeCursor:
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchall(self):
+        return [ROW]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self, **kwargs):
+        return FakeCursor()
+
+    def close(self):
+        pass
+
+
+def counting_source(calls):
+    def source():
+        calls.append(time.monotonic())
+        return FakeConnection(), 0.0
+    return source
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_only_one_server_refreshes_a_shared_snapshot(tmp_path):
+    path = str(tmp_path / "read_snapshot.db")
+    owner_calls, follower_calls = [], []
+    owner = ReadSnapshot(path, counting_source(owner_calls), interval=0.05)
+    follower = ReadSnapshot(path, counting_source(follower_calls), interval=0.05)
+    owner.start()
+    follower.start()
+    try:
+        assert wait_for(lambda: len(owner_calls) >= 3)
+        assert follower_calls == []
+        assert follower.age() < 1
+        assert follower.fetch_all("SELECT vehicle_number FROM SmartParking") == [{"vehicle_number": "KA01AB1234"}]
+        with pytest.raises(sqlite3.OperationalError):
+            follower.connect().cursor().execute("DELETE FROM SmartParking")
+
+        # The follower takes over once the owner stops
+        owner.stop()
+        assert wait_for(lambda: len(follower_calls) >= 1)
+    finally:
+        owner.stop()
+        follower.stop()
+
+
+def test_age_is_infinite_before_the_first_refresh(tmp_path):
+    snapshot = ReadSnapshot(str(tmp_path / "missing.db"), counting_source([]))
+    assert snapshot.age() == float("inf")
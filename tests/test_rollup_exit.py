@@ -0,0 +1,234 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mysql.connector")
+
+import parking_rollups
+from parking_archive import archive_statements
+from parking_lots import LOT_ID, lot_slots
+
+LOT = LOT_ID
+SLOT = lot_slots(LOT_ID, "regular")[0]
+
+
+class FakeDB:
+    """Just enough of SmartParking and OccupancyRollup for the entry and exit routes."""
+
+    def __init__(self):
+        self.active = {}   # entry_id -> (lot_id, slot_number, entry_time)
+        self.rollups = defaultdict(lambda: [0, 0, 0, 0])
+        self.next_id = 1
+        self.archived_at = None
+
+    def execute(self, sql, params=()):
+        """Returns (rows, rowcount, lastrowid)."""
+        if sql == parking_rollups.ROLLUP_UPSERT:
+            lot_id, bucket, zone, *deltas = params
+            totals = self.rollups[(lot_id, bucket, zone)]
+            for i, delta in enumerate(deltas):
+                totals[i] += delta
+            return [], 1, None
+        if sql.startswith("SELECT COUNT(*) FROM SmartParking"):
+            lot_id, slot_number = params
+            taken = [e for e, stay in self.active.items() if stay[:2] == (lot_id, slot_number)]
+            return [(len(taken),)], 1, None
+        if sql.startswith("INSERT INTO SmartParking ("):
+            lot_id, _, slot_number, entry_time, _ = params
+            entry_id, self.next_id = self.next_id, self.next_id + 1
+            self.active[entry_id] = (lot_id, slot_number, entry_time)
+            return [], 1, entry_id
+        if sql.startswith("SELECT entry_id, slot_number, entry_time FROM SmartParking"):
+            lot_id, entry_id = params
+            stay = self.active.get(entry_id)
+            rows = [(entry_id, stay[1], stay[2])] if stay and stay[0] == lot_id else []
+            return rows, len(rows), None
+        if sql.startswith("DELETE FROM SmartParking "):
+            lot_id, *entry_ids = params
+            gone = [e for e in entry_ids if self.active.get(e, (None,))[0] == lot_id]
+            for entry_id in gone:
+                del self.active[entry_id]
+            return [], len(gone), None
+        if sql.startswith("INSERT INTO SmartParkingHistory"):
+            self.archived_at = params[0]
+        return [], 1, None   # occupancy log writes
+
+    def summary(self, start, end, now):
+        rows = [(bucket, zone, *totals) for (_, bucket, zone), totals in self.rollups.items()]
+        active = [(slot, entry_time) for _, slot, entry_time in self.active.values()]
+        return parking_rollups.summarise(rows, active, start, end, now=now)
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows, self.rowcount, self.lastrowid = [], 0, None
+
+    def execute(self, sql, params=()):
+        self.rows, self.rowcount, lastrowid = self.db.execute(sql, params)
+        self.lastrowid = lastrowid or self.lastrowid
+
+    def executemany(self, sql, seq):
+        for params in seq:
+            self.execute(sql, params)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncCursor(FakeCursor):
+    async def execute(self, sql, params=()):
+        FakeCursor.execute(self, sql, params)
+
+    async def executemany(self, sql, seq):
+        for params in seq:
+            await self.execute(sql, params)
+
+    async def fetchone(self):
+        return FakeCursor.fetchone(self)
+
+    async def fetchall(self):
+        return FakeCursor.fetchall(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class AsyncConnection(FakeConnection):
+    def cursor(self, **kwargs):
+        return AsyncCursor(self.db)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class AsyncPool:
+    def __init__(self, db):
+        self.db = db
+
+    def acquire(self):
+        return AsyncConnection(self.db)
+
+
+def expected_summary(entry_time, exit_time, start, end, now):
+    """What the rollups hold for one stay that entered and exited."""
+    rows = [(bucket, zone, entries, exits, occupied, dwell) for _, bucket, zone, entries, exits, occupied, dwell in
+            parking_rollups.entry_deltas(SLOT, entry_time, LOT)
+            + parking_rollups.exit_deltas(SLOT, entry_time, exit_time, LOT)]
+    return parking_rollups.summarise(rows, [], start, end, now=now)
+
+
+def window(moment):
+    start = parking_rollups.bucket_start(moment) - timedelta(hours=2)
+    return start, start + timedelta(hours=4)
+
+
+def test_archive_statements_apply_the_exit_delta():
+    db = FakeDB()
+    entry_time = datetime(2026, 10, 19, 9, 40)
+    exit_time = entry_time + timedelta(minutes=50)
+    entry_id = db.execute("INSERT INTO SmartParking (lot_id, vehicle_number, slot_number, entry_time, is_ev) "
+                          "VALUES (%s, %s, %s, %s, %s)", (LOT, "KA01AB1234", SLOT, entry_time, False))[2]
+    for params in parking_rollups.entry_deltas(SLOT, entry_time, LOT):
+        db.execute(parking_rollups.ROLLUP_UPSERT, params)
+    for sql, params in archive_statements(LOT, [(entry_id, SLOT, entry_time)], exit_time):
+        db.execute(sql, params)
+
+    start, end = window(exit_time)
+    summary = db.summary(start, end, exit_time)
+    assert summary == expected_summary(entry_time, exit_time, start, end, exit_time)
+    assert sum(bucket["exits"] for bucket in summary) == 1
+
+
+def entry_and_exit(post, delete):
+    """Run POST then DELETE /parking-entries and compare summarise() with the deltas of that stay."""
+    db = FakeDB()
+    assert post(db) == 201
+    (entry_id, (_, _, entry_time)), = db.active.items()
+    assert delete(db, entry_id) == 200
+    assert not db.active
+    assert db.archived_at is not None
+
+    start, end = window(entry_time)
+    summary = db.summary(start, end, db.archived_at)
+    assert summary == expected_summary(entry_time, db.archived_at, start, end, db.archived_at)
+    assert sum(bucket["exits"] for bucket in summary) == 1
+
+
+def test_dashboard_entry_and_exit_update_rollups(monkeypatch):
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_cors")
+    import dashboard
+
+    db = None
+    monkeypatch.setattr(dashboard.mysql.connector, "connect", lambda **config: FakeConnection(db))
+    client = dashboard.app.test_client()
+
+    def post(fake):
+        nonlocal db
+        db = fake
+        return client.post("/parking-entries", json={"vehicle_number": "KA01AB1234", "slot_number": SLOT,
+                                                     "lot_id": LOT}).status_code
+
+    def delete(fake, entry_id):
+        return client.delete(f"/parking-entries/{entry_id}?lot={LOT}").status_code
+
+    entry_and_exit(post, delete)
+
+
+def test_async_api_entry_and_exit_update_rollups(monkeypatch):
+    pytest.importorskip("quart")
+    pytest.importorskip("quart_cors")
+    pytest.importorskip("aiomysql")
+    import parking_api
+
+    client = parking_api.app.test_client()
+
+    def post(db):
+        monkeypatch.setattr(parking_api, "db_pool", AsyncPool(db))
+        response = asyncio.run(client.post("/parking-entries", json={"vehicle_number": "KA01AB1234",
+                                                                     "slot_number": SLOT, "lot_id": LOT}))
+        return response.status_code
+
+    def delete(db, entry_id):
+        response = asyncio.run(client.delete(f"/parking-entries/{entry_id}?lot={LOT}"))
+        return response.status_code
+
+    entry_and_exit(post, delete)
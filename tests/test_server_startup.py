@@ -0,0 +1,27 @@
+import os
+import runpy
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_vehicle_search_server_starts_without_mysql(monkeypatch):
+    """The __main__ path survives a failed schema check and reaches serve()."""
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_cors")
+    waitress = pytest.importorskip("waitress")
+    import mysql.connector
+    import parking_archive
+
+    seen = {}
+
+    def migrate(config):
+        seen["config"] = config
+        raise mysql.connector.Error("MySQL is not running")
+
+    monkeypatch.setattr(parking_archive, "migrate", migrate)
+    monkeypatch.setattr(waitress, "serve", lambda app, **kwargs: seen.update(kwargs))
+    runpy.run_path(os.path.join(ROOT, "vehicle_search_server.py"), run_name="__main__")
+
+    assert seen["config"]["database"] == "smart_parking"
+    assert seen["port"] == 9871
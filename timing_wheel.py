@@ -0,0 +1,87 @@
+import math
+import time
+
+
+class TimingWheel:
+    """Hierarchical timing wheel: O(1) schedule and cancel, amortised O(1) per expiry.
+
+    Level 0 has `slots` buckets of one tick each, level 1 buckets of
+    `slots` ticks, and so on. A timer sits in the lowest level whose
+    parent block it shares with the current tick, and drops one level
+    each time the wheel reaches its bucket, so it is touched at most
+    `levels` times before it fires. Deadlines past the top level wait in
+    an overflow bucket that is re-sorted whenever the top level moves on.
+    """
+
+    def __init__(self, tick=1.0, slots=64, levels=4, start=None):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.now_tick = int((time.time() if start is None else start) // tick)
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow = {}
+        self._where = {}  # key -> bucket dict holding it
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def _place(self, key, deadline_tick, payload):
+        bucket = None
+        for level in range(self.levels):
+            shift = self.bits * (level + 1)
+            if deadline_tick >> shift == self.now_tick >> shift:
+                bucket = self.wheels[level][(deadline_tick >> (self.bits * level)) & self.mask]
+                break
+        if bucket is None:
+            bucket = self.overflow
+        bucket[key] = (deadline_tick, payload)
+        self._where[key] = bucket
+
+    def schedule(self, key, deadline, payload=None):
+        """Fire `payload` under `key` at `deadline` (unix seconds); replaces a timer with the same key."""
+        self.cancel(key)
+        deadline_tick = max(math.ceil(deadline / self.tick), self.now_tick + 1)
+        self._place(key, deadline_tick, payload)
+
+    def cancel(self, key):
+        bucket = self._where.pop(key, None)
+        if bucket is None:
+            return False
+        del bucket[key]
+        return True
+
+    def _cascade(self, bucket):
+        timers = list(bucket.items())
+        bucket.clear()
+        for key, (deadline_tick, payload) in timers:
+            self._place(key, deadline_tick, payload)
+
+    # Function to move the wheel forward to `now` and collect everything that expired
+    def advance(self, now=None):
+        """Returns [(key, payload, deadline), ...] in deadline order."""
+        target = int((time.time() if now is None else now) // self.tick)
+        expired = []
+        while self.now_tick < target:
+            self.now_tick += 1
+            t = self.now_tick
+            # Entering a new span of the whole wheel re-sorts the overflow (also with a single level)
+            if t & ((1 << (self.bits * self.levels)) - 1) == 0:
+                self._cascade(self.overflow)
+            # Entering a new block at level L pulls that block's timers down, highest level first
+            for level in range(self.levels - 1, 0, -1):
+                if t & ((1 << (self.bits * level)) - 1) == 0:
+                    self._cascade(self.wheels[level][(t >> (self.bits * level)) & self.mask])
+            bucket = self.wheels[0][t & self.mask]
+            if bucket:
+                for key, (deadline_tick, payload) in bucket.items():
+                    del self._where[key]
+                    expired.append((key, payload, deadline_tick * self.tick))
+                bucket.clear()
+        return expired
@@ -1,12 +1,18 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 import mysql.connector
 from datetime import datetime
 from waitress import serve
 import os
+from parking_archive import migrate
+from parking_db import READ_ERRORS, ReadRouter
+from parking_lots import resolve_lot
+from response_cache import conditional_response, static_payload
+import sampling_profiler
 
 app = Flask(__name__)
 CORS(app)
+sampling_profiler.register_profile_route(app)  # GET /admin/profile?seconds=N
 
 # Database configuration
 db_config = {
@@ -16,19 +22,22 @@ db_config = {
     'database': 'smart_parking'
 }
 
-def get_db_connection():
-    """Create and return a connection to the database"""
+# Every endpoint here is read-only: replica or read snapshot (DB_READ_FROM), else the primary
+reads = ReadRouter(db_config)
+
+def get_db_connection(active_only=False):
+    """Create and return a read connection; active_only queries may be answered by the snapshot"""
     try:
-        conn = mysql.connector.connect(**db_config)
+        conn = reads.connect(active_only)
         return conn, conn.cursor(dictionary=True)
-    except mysql.connector.Error as err:
+    except READ_ERRORS as err:
         print(f"Error connecting to MySQL database: {err}")
         return None, None
 
 @app.route('/')
 def home():
     """Render the home page with search form"""
-    return render_template('vsearch.html')
+    return conditional_response(static_payload(os.path.join(app.root_path, app.template_folder, 'vsearch.html')), request.headers)
 
 @app.route('/search', methods=['POST'])
 def search_vehicle():
@@ -37,24 +46,42 @@ def search_vehicle():
     
     if not vehicle_number:
         return jsonify({'error': 'Vehicle number is required'}), 400
+
+    # Searches every lot unless one is given
+    lot_id = request.form.get('lot_id') or request.args.get('lot')
+    try:
+        lot_id = resolve_lot(lot_id) if lot_id else None
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 404
+    lot_filter = " AND lot_id = %s" if lot_id else ""
+    params = (vehicle_number, lot_id) if lot_id else (vehicle_number,)
     
     conn, cursor = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        query = "SELECT * FROM SmartParking WHERE vehicle_number = %s"
-        cursor.execute(query, (vehicle_number,))
+        # Active stay from the hot table plus finished stays from history
+        query = f"""
+            SELECT entry_id, lot_id, vehicle_number, is_ev, slot_number, entry_time, exit_time
+            FROM SmartParking WHERE vehicle_number = %s{lot_filter}
+            UNION ALL
+            SELECT entry_id, lot_id, vehicle_number, is_ev, slot_number, entry_time, exit_time
+            FROM SmartParkingHistory WHERE vehicle_number = %s{lot_filter}
+            ORDER BY entry_time DESC
+        """
+        cursor.execute(query, params * 2)
         results = cursor.fetchall()
         
         # Format timestamps for JSON response
         for result in results:
-            if 'entry_time' in result and isinstance(result['entry_time'], datetime):
-                result['entry_time'] = result['entry_time'].strftime('%Y-%m-%d %H:%M:%S')
+            for key in ('entry_time', 'exit_time'):
+                if isinstance(result.get(key), datetime):
+                    result[key] = result[key].strftime('%Y-%m-%d %H:%M:%S')
                 
         return jsonify({'results': results})
     
-    except mysql.connector.Error as err:
+    except READ_ERRORS as err:
         return jsonify({'error': f'Database error: {err}'}), 500
     
     finally:
@@ -65,14 +92,21 @@ def search_vehicle():
 
 @app.route('/api/vehicles', methods=['GET'])
 def get_all_vehicles():
-    """Get all vehicles (for initial display)"""
-    conn, cursor = get_db_connection()
+    """Get all vehicles (for initial display), optionally for one lot with ?lot="""
+    lot_id = request.args.get('lot')
+    try:
+        lot_id = resolve_lot(lot_id) if lot_id else None
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 404
+    conn, cursor = get_db_connection(active_only=True)
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        query = "SELECT * FROM SmartParking ORDER BY entry_time DESC LIMIT 100"
-        cursor.execute(query)
+        if lot_id:
+            cursor.execute("SELECT * FROM SmartParking WHERE lot_id = %s ORDER BY entry_time DESC LIMIT 100", (lot_id,))
+        else:
+            cursor.execute("SELECT * FROM SmartParking ORDER BY entry_time DESC LIMIT 100")
         results = cursor.fetchall()
         
         # Format timestamps for JSON response
@@ -82,7 +116,7 @@ def get_all_vehicles():
         
         return jsonify({'results': results})
     
-    except mysql.connector.Error as err:
+    except READ_ERRORS as err:
         return jsonify({'error': f'Database error: {err}'}), 500
     
     finally:
@@ -92,5 +126,11 @@ def get_all_vehicles():
             conn.close()
 
 if __name__ == '__main__':
+    sampling_profiler.install()
+    try:
+        migrate(db_config)
+    except mysql.connector.Error as err:
+        print(f"⚠️ Schema check failed ({err}); entry and exit writes need it")
+    reads.start()
     print("🚀 Server running on http://localhost:9871")
     serve(app, host='0.0.0.0', port=9871)
\ No newline at end of file